@@ -606,6 +606,76 @@ inputs = {
         options = local.options
       }
 
+      "/upload/multipart-initiate" = {
+        post = {
+          security = [{ CognitoAuthorizer = [] }]
+          x-amazon-apigateway-integration = {
+            type = "AWS_PROXY"
+            httpMethod = "POST"
+            uri = "arn:aws:apigateway:us-east-1:lambda:path/2015-03-31/functions/arn:aws:lambda:us-east-1:496860676881:function:gildarck-upload-handler-v2-dev/invocations"
+            passthroughBehavior = "WHEN_NO_MATCH"
+          }
+          responses = local.responses
+        }
+        options = local.options
+      }
+
+      "/upload/multipart-part-urls" = {
+        post = {
+          security = [{ CognitoAuthorizer = [] }]
+          x-amazon-apigateway-integration = {
+            type = "AWS_PROXY"
+            httpMethod = "POST"
+            uri = "arn:aws:apigateway:us-east-1:lambda:path/2015-03-31/functions/arn:aws:lambda:us-east-1:496860676881:function:gildarck-upload-handler-v2-dev/invocations"
+            passthroughBehavior = "WHEN_NO_MATCH"
+          }
+          responses = local.responses
+        }
+        options = local.options
+      }
+
+      "/upload/multipart-parts" = {
+        post = {
+          security = [{ CognitoAuthorizer = [] }]
+          x-amazon-apigateway-integration = {
+            type = "AWS_PROXY"
+            httpMethod = "POST"
+            uri = "arn:aws:apigateway:us-east-1:lambda:path/2015-03-31/functions/arn:aws:lambda:us-east-1:496860676881:function:gildarck-upload-handler-v2-dev/invocations"
+            passthroughBehavior = "WHEN_NO_MATCH"
+          }
+          responses = local.responses
+        }
+        options = local.options
+      }
+
+      "/upload/multipart-complete" = {
+        post = {
+          security = [{ CognitoAuthorizer = [] }]
+          x-amazon-apigateway-integration = {
+            type = "AWS_PROXY"
+            httpMethod = "POST"
+            uri = "arn:aws:apigateway:us-east-1:lambda:path/2015-03-31/functions/arn:aws:lambda:us-east-1:496860676881:function:gildarck-upload-handler-v2-dev/invocations"
+            passthroughBehavior = "WHEN_NO_MATCH"
+          }
+          responses = local.responses
+        }
+        options = local.options
+      }
+
+      "/upload/multipart-abort" = {
+        post = {
+          security = [{ CognitoAuthorizer = [] }]
+          x-amazon-apigateway-integration = {
+            type = "AWS_PROXY"
+            httpMethod = "POST"
+            uri = "arn:aws:apigateway:us-east-1:lambda:path/2015-03-31/functions/arn:aws:lambda:us-east-1:496860676881:function:gildarck-upload-handler-v2-dev/invocations"
+            passthroughBehavior = "WHEN_NO_MATCH"
+          }
+          responses = local.responses
+        }
+        options = local.options
+      }
+
       "/media/list" = {
         get = {
           security = [{ CognitoAuthorizer = [] }]
@@ -0,0 +1,45 @@
+include "root" {
+  path = find_in_parent_folders()
+}
+
+terraform {
+  source = "git::https://github.com/terraform-aws-modules/terraform-aws-dynamodb-table.git?ref=v4.0.1"
+}
+
+locals {
+  environment_vars = read_terragrunt_config(find_in_parent_folders("env.hcl"))
+  environment = local.environment_vars.locals.environment
+  name = "gildarck-media-hashes-${local.environment}"
+}
+
+inputs = {
+  name           = local.name
+  hash_key       = "user_hash"
+  billing_mode   = "PAY_PER_REQUEST"
+  
+  attributes = [
+    {
+      name = "user_hash"
+      type = "S"
+    }
+  ]
+  
+  tags = {
+    Environment = local.environment
+    Service     = "dynamodb"
+    Name        = local.name
+  }
+}
+
+# Índice de deduplicación por usuario: upload-handler-v2 lo lee con batch_get_item
+# (100 hashes por llamada) en lugar de una Query a FileHashIndex por hash.
+# Lo escribe media-processor al guardar cada archivo; media-backfill (job "file_hash")
+# lo rellena para los archivos anteriores.
+# Schema:
+# {
+#   "user_hash": "user_id#sha256",
+#   "user_id": "uuid",
+#   "file_hash": "sha256",
+#   "file_id": "uuid",  // último archivo del usuario con ese hash
+#   "updated_at": "2025-10-27T20:00:00"
+# }
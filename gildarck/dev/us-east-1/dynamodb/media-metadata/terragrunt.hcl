@@ -38,6 +38,18 @@ inputs = {
     {
       name = "location_lat_lng"
       type = "S"
+    },
+    {
+      name = "trash_date"
+      type = "S"
+    },
+    {
+      name = "s3_key"
+      type = "S"
+    },
+    {
+      name = "trash_shard"
+      type = "S"
     }
   ]
   
@@ -58,6 +70,23 @@ inputs = {
       hash_key        = "user_id"
       range_key       = "location_lat_lng"
       projection_type = "ALL"
+    },
+    {
+      name            = "TrashIndex"
+      hash_key        = "user_id"
+      range_key       = "trash_date"
+      projection_type = "ALL"
+    },
+    {
+      name            = "S3KeyIndex"
+      hash_key        = "s3_key"
+      projection_type = "KEYS_ONLY"
+    },
+    {
+      name            = "TrashExpiryIndex"
+      hash_key        = "trash_shard"
+      range_key       = "trash_date"
+      projection_type = "KEYS_ONLY"
     }
   ]
   
@@ -76,7 +105,7 @@ inputs = {
 #   "filename": "original_name.jpg",
 #   "file_type": "image/jpeg",
 #   "file_size": 1024000,
-#   "s3_key": "user_id/media/images/file_id.jpg",
+#   "s3_key": "user_id/originals/2025/10/file_id.jpg", // GSI key: ubicación actual del original
 #   "created_date": "2025-10-24T09:43:00Z",
 #   "modified_date": "2025-10-24T09:43:00Z",
 #   "upload_date": "2025-10-24T09:43:00Z",
@@ -131,7 +160,11 @@ inputs = {
 #     "medium": "s3_key_thumb_500.jpg", 
 #     "large": "s3_key_thumb_1000.jpg"
 #   },
-#   "processing_status": "completed|processing|failed",
+#   "processing_status": "completed|processing|failed|trashed",
+#   "trash_date": "2025-10-24T09:43:00", // GSI key, solo en la papelera
+#   "trash_shard": "0-15", // GSI key (TrashExpiryIndex), solo en la papelera
+#   "trash_mode": "metadata", // papelera sin mover objetos; created_date y location_lat_lng
+#                             // se guardan como trashed_created_date / trashed_location_lat_lng
 #   "ai_analysis": {
 #     "scene": "outdoor",
 #     "activity": "beach volleyball",
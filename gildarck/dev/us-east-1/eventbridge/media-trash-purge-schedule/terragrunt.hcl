@@ -0,0 +1,56 @@
+terraform {
+  source = "${include.envcommon.locals.base_source_url}"
+}
+
+include "root" {
+  path = find_in_parent_folders()
+}
+
+include "envcommon" {
+  path   = "${dirname(find_in_parent_folders())}/_envcommon/aws/eventbridge/rule.hcl"
+  expose = true
+}
+
+locals {
+  vars         = read_terragrunt_config(find_in_parent_folders("env.hcl")).locals
+  name         = "gildarck-media-trash-purge-schedule"
+  service_vars = read_terragrunt_config(find_in_parent_folders("service.hcl"))
+  tags         = merge(local.service_vars.locals.tags, { Name = local.name })
+}
+
+dependencies {
+  paths = [
+    "../../lambda/media-trash-purge"
+  ]
+}
+
+dependency "lambda" {
+  config_path = "../../lambda/media-trash-purge"
+}
+
+inputs = {
+  create_bus         = false
+  create_role        = false
+  create_permissions = true
+  create_targets     = true
+  
+  rules = {
+    (local.name) = {
+      name                = local.name
+      description         = "Hourly purge of media trash older than 30 days (resumes from checkpoints)"
+      schedule_expression = "rate(1 hour)"
+      state               = "ENABLED"
+    }
+  }
+  
+  targets = {
+    (local.name) = [
+      {
+        name = "lambda-target"
+        arn  = dependency.lambda.outputs.lambda_function_arn
+      }
+    ]
+  }
+
+  tags = local.tags
+}
@@ -9,16 +9,18 @@ import os
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
-import logging
 from botocore.exceptions import ClientError
+from sigv4_presigner import S3Presigner
+from structured_logging import current_request, get_logger, logged_handler
 
-# Configure logging
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+# Structured JSON logging (bundled structured_logging.py); per-file lines need LOG_DEBUG_DETAIL=true
+logger = get_logger(__name__)
 
 # AWS clients
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+session = boto3.session.Session()
+dynamodb = session.resource('dynamodb')
+# Presigned URLs are signed locally (bundled sigv4_presigner.py), not through botocore
+presigner = S3Presigner(session.get_credentials(), session.region_name or 'us-east-1')
 
 # Environment variables
 BUCKET_NAME = os.environ['BUCKET_NAME']
@@ -29,20 +31,24 @@ ENABLE_THROTTLING = os.environ.get('ENABLE_THROTTLING', 'true').lower() == 'true
 # DynamoDB table
 batch_table = dynamodb.Table(BATCH_TABLE_NAME)
 
+@logged_handler
 def lambda_handler(event, context):
     """Main Lambda handler for SQS events"""
     try:
-        logger.info(f"Processing {len(event.get('Records', []))} SQS messages")
-        
         results = []
         for record in event.get('Records', []):
             try:
                 result = process_sqs_message(record)
                 results.append(result)
             except Exception as e:
-                logger.error(f"Error processing SQS record: {str(e)}")
+                logger.exception("Error processing SQS record", error=str(e))
                 results.append({'success': False, 'error': str(e)})
         
+        current_request().set(
+            messages=len(results),
+            successful=sum(1 for r in results if r.get('success')),
+            failed=sum(1 for r in results if not r.get('success'))
+        )
         return {
             'statusCode': 200,
             'body': json.dumps({
@@ -53,7 +59,7 @@ def lambda_handler(event, context):
         }
         
     except Exception as e:
-        logger.error(f"Error in lambda_handler: {str(e)}")
+        logger.exception("Error in lambda_handler", error=str(e))
         return {
             'statusCode': 500,
             'body': json.dumps({'error': str(e)})
@@ -72,10 +78,17 @@ def process_sqs_message(record: Dict) -> Dict[str, Any]:
         files = message_body.get('files', [])
         strategy = message_body.get('strategy', {})
         
-        logger.info(f"Processing batch {batch_id} with {len(files)} files")
-        
-        # Update batch status to processing
-        update_batch_status(batch_id, 'processing', 0)
+        # Update batch status to processing (skip redelivered chunks that already completed)
+        if not mark_batch_processing(batch_id):
+            logger.info("Batch already completed, skipping duplicate delivery", batch_id=batch_id)
+            # The previous delivery may have stopped before counting the chunk on the master batch
+            if master_batch_id:
+                update_master_batch_progress(batch_id, master_batch_id)
+            return {
+                'success': True,
+                'batch_id': batch_id,
+                'duplicate': True
+            }
         
         # Process files and generate presigned URLs
         upload_urls = generate_batch_upload_urls(files, user_id, strategy)
@@ -85,9 +98,10 @@ def process_sqs_message(record: Dict) -> Dict[str, Any]:
         
         # Update master batch if applicable
         if master_batch_id:
-            update_master_batch_progress(master_batch_id)
+            update_master_batch_progress(batch_id, master_batch_id, len(upload_urls))
         
-        logger.info(f"Batch {batch_id} completed successfully with {len(upload_urls)} URLs")
+        logger.info("Batch completed", batch_id=batch_id, master_batch_id=master_batch_id,
+                    files=len(files), urls=len(upload_urls))
         
         return {
             'success': True,
@@ -96,7 +110,7 @@ def process_sqs_message(record: Dict) -> Dict[str, Any]:
         }
         
     except Exception as e:
-        logger.error(f"Error processing batch: {str(e)}")
+        logger.exception("Error processing batch", error=str(e))
         
         # Update batch status to failed
         batch_id = message_body.get('batch_id') if 'message_body' in locals() else 'unknown'
@@ -105,6 +119,10 @@ def process_sqs_message(record: Dict) -> Dict[str, Any]:
         except:
             pass
         
+        master_batch_id = message_body.get('master_batch_id') if 'message_body' in locals() else None
+        if master_batch_id:
+            record_master_chunk_failure(master_batch_id)
+        
         return {
             'success': False,
             'batch_id': batch_id,
@@ -116,12 +134,8 @@ def generate_batch_upload_urls(files: List[Dict], user_id: str, strategy: Dict)
     upload_urls = []
     
     try:
-        logger.info(f"Files type: {type(files)}, Files content: {files[:2] if files else 'empty'}")
-        
         for i, file_info in enumerate(files):
             try:
-                logger.info(f"File {i} type: {type(file_info)}, content: {file_info}")
-                
                 # 🔧 FIX: Handle both string and object formats
                 if isinstance(file_info, str):
                     # If it's a string, treat it as filename
@@ -133,25 +147,19 @@ def generate_batch_upload_urls(files: List[Dict], user_id: str, strategy: Dict)
                     content_type = file_info.get('contentType', 'application/octet-stream')
                 else:
                     # Skip invalid entries
-                    logger.warning(f"Skipping invalid file_info at index {i}: {type(file_info)}")
+                    logger.warning("Skipping invalid file_info", index=i, type=type(file_info).__name__)
+                    current_request().incr('files_skipped')
                     continue
                 
-                logger.info(f"Processing file {i}: {filename} ({content_type})")
-                
                 # Generate S3 key with date organization
                 s3_key = generate_s3_key(user_id, filename)
                 
-                logger.info(f"Generated S3 key for {filename}: {s3_key}")
-                
                 # Generate presigned URL
-                presigned_url = s3_client.generate_presigned_url(
-                    'put_object',
-                    Params={
-                        'Bucket': BUCKET_NAME,
-                        'Key': s3_key,
-                        'ContentType': content_type
-                    },
-                    ExpiresIn=3600  # 1 hour
+                presigned_url = presigner.presign_put_object(
+                    BUCKET_NAME,
+                    s3_key,
+                    expires_in=3600,  # 1 hour
+                    content_type=content_type
                 )
                 
                 upload_urls.append({
@@ -161,11 +169,12 @@ def generate_batch_upload_urls(files: List[Dict], user_id: str, strategy: Dict)
                     's3_key': s3_key,
                     'content_type': content_type
                 })
-                
-                logger.info(f"Generated upload URL for {filename}")
+                current_request().incr('urls_signed')
+                logger.detail("Generated upload URL", filename=filename, s3_key=s3_key, content_type=content_type)
                 
             except Exception as e:
-                logger.error(f"Error processing file {i} ({file_info}): {str(e)}")
+                logger.error("Error processing file", index=i, file_info=file_info, error=str(e))
+                current_request().incr('files_failed')
                 # Continue with next file instead of failing entire batch
                 continue
             
@@ -176,7 +185,7 @@ def generate_batch_upload_urls(files: List[Dict], user_id: str, strategy: Dict)
         return upload_urls
         
     except Exception as e:
-        logger.error(f"Error generating upload URLs: {str(e)}")
+        logger.error("Error generating upload URLs", error=str(e))
         raise
 
 def update_batch_status(batch_id: str, status: str, processed_files: int, error: str = None):
@@ -201,10 +210,32 @@ def update_batch_status(batch_id: str, status: str, processed_files: int, error:
             ExpressionAttributeNames=expression_names
         )
         
-        logger.info(f"Updated batch {batch_id} status to {status}")
+        logger.info("Updated batch status", batch_id=batch_id, status=status)
         
     except Exception as e:
-        logger.error(f"Error updating batch status: {str(e)}")
+        logger.error("Error updating batch status", batch_id=batch_id, error=str(e))
+
+def mark_batch_processing(batch_id: str) -> bool:
+    """Set batch status to processing unless it already completed; False for completed batches"""
+    try:
+        batch_table.update_item(
+            Key={'batch_id': batch_id},
+            UpdateExpression="SET #status = :status, processed_files = :processed, updated_at = :updated",
+            ConditionExpression='attribute_not_exists(#status) OR #status <> :completed',
+            ExpressionAttributeValues={
+                ':status': 'processing',
+                ':processed': 0,
+                ':completed': 'completed',
+                ':updated': datetime.utcnow().isoformat()
+            },
+            ExpressionAttributeNames={'#status': 'status'}
+        )
+        return True
+        
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
 
 def update_batch_completion(batch_id: str, successful_urls: int, total_files: int):
     """Update batch with completion data (without storing URLs to avoid size limit)"""
@@ -221,63 +252,113 @@ def update_batch_completion(batch_id: str, successful_urls: int, total_files: in
             ExpressionAttributeNames={'#status': 'status'}
         )
         
-        logger.info(f"Batch {batch_id} completed with {successful_urls} URLs generated")
-        
     except Exception as e:
-        logger.error(f"Error updating batch completion: {str(e)}")
+        logger.error("Error updating batch completion", batch_id=batch_id, error=str(e))
         raise
 
-def update_master_batch_progress(master_batch_id: str):
-    """Update master batch progress"""
+def update_master_batch_progress(batch_id: str, master_batch_id: str, urls_generated: Optional[int] = None):
+    """Count one completed chunk against the master batch (redeliveries read urls_generated from the chunk)"""
     try:
-        # Get master batch info
-        response = batch_table.get_item(Key={'batch_id': master_batch_id})
-        if 'Item' not in response:
-            logger.warning(f"Master batch {master_batch_id} not found")
-            return
-        
-        master_batch = response['Item']
-        
-        # Query all chunks for this master batch
-        chunks_response = batch_table.scan(
-            FilterExpression='master_batch_id = :master_id',
-            ExpressionAttributeValues={':master_id': master_batch_id}
+        if urls_generated is None:
+            chunk = batch_table.get_item(Key={'batch_id': batch_id}, ConsistentRead=True).get('Item', {})
+            urls_generated = int(chunk.get('successful_urls', 0))
+        count_chunk_on_master(batch_id, master_batch_id, urls_generated)
+    except Exception as e:
+        logger.error("Error updating master batch progress", master_batch_id=master_batch_id, error=str(e))
+
+def count_chunk_on_master(batch_id: str, master_batch_id: str, urls_generated: int):
+    """Add the chunk to the master counters exactly once, then complete the master if it was the last.
+    
+    The chunk's master_counted flag and the master counters are written in one transaction, so a
+    redelivered chunk retries the count when an earlier delivery stopped before it, and never counts twice.
+    """
+    now = datetime.utcnow().isoformat()
+    transact_items = [
+        {'Update': {
+            'TableName': BATCH_TABLE_NAME,
+            'Key': {'batch_id': batch_id},
+            'UpdateExpression': "SET master_counted = :updated",
+            'ConditionExpression': 'attribute_not_exists(master_counted)',
+            'ExpressionAttributeValues': {':updated': now}
+        }},
+        {'Update': {
+            'TableName': BATCH_TABLE_NAME,
+            'Key': {'batch_id': master_batch_id},
+            # processed_files on the master counts files media-processor finished; this is URL issuance
+            'UpdateExpression': "ADD completed_chunks :one, urls_generated :generated SET updated_at = :updated",
+            'ConditionExpression': 'attribute_exists(batch_id)',
+            'ExpressionAttributeValues': {
+                ':one': 1,
+                ':generated': urls_generated,
+                ':updated': now
+            }
+        }}
+    ]
+    
+    # The resource's client serializes plain Python values, like Table does
+    for attempt in range(MAX_RETRY_ATTEMPTS):
+        try:
+            dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+            logger.info("Chunk counted on master batch", batch_id=batch_id, master_batch_id=master_batch_id)
+            break
+        except ClientError as e:
+            # One reason per transact item: [chunk, master]
+            reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+            if reasons[:1] == ['ConditionalCheckFailed']:
+                logger.info("Chunk already counted on master batch", batch_id=batch_id, master_batch_id=master_batch_id)
+                break
+            if reasons[1:2] == ['ConditionalCheckFailed']:
+                logger.warning("Master batch not found", master_batch_id=master_batch_id)
+                return
+            # Concurrent chunks of the same master conflict (TransactionConflict); back off and retry
+            if attempt + 1 == MAX_RETRY_ATTEMPTS:
+                raise
+            time.sleep(0.05 * 2 ** attempt)
+    
+    # Also re-run when the chunk was already counted: the earlier delivery may have stopped before this
+    complete_master_batch(master_batch_id)
+
+def complete_master_batch(master_batch_id: str):
+    """Flip the master batch to completed once every chunk has been counted"""
+    try:
+        batch_table.update_item(
+            Key={'batch_id': master_batch_id},
+            UpdateExpression="SET #status = :completed, updated_at = :updated",
+            ConditionExpression='completed_chunks >= total_chunks AND #status <> :completed',
+            ExpressionAttributeValues={
+                ':completed': 'completed',
+                ':updated': datetime.utcnow().isoformat()
+            },
+            ExpressionAttributeNames={'#status': 'status'}
         )
         
-        chunks = chunks_response.get('Items', [])
-        completed_chunks = sum(1 for chunk in chunks if chunk.get('status') == 'completed')
-        failed_chunks = sum(1 for chunk in chunks if chunk.get('status') == 'failed')
-        total_chunks = master_batch.get('total_chunks', 0)
-        
-        # Calculate total progress
-        total_files = sum(chunk.get('total_files', 0) for chunk in chunks)
-        processed_files = sum(chunk.get('processed_files', 0) for chunk in chunks)
-        
-        # Determine master status
-        if completed_chunks == total_chunks:
-            master_status = 'completed'
-        elif failed_chunks > 0:
-            master_status = 'partial_failure'
-        else:
-            master_status = 'processing'
+        logger.info("Master batch completed", master_batch_id=master_batch_id)
         
-        # Update master batch
+    except ClientError as e:
+        # Another chunk already made the transition
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+def record_master_chunk_failure(master_batch_id: str):
+    """Count one failed chunk against the master batch"""
+    try:
         batch_table.update_item(
             Key={'batch_id': master_batch_id},
-            UpdateExpression="SET #status = :status, processed_files = :processed, completed_chunks = :completed, updated_at = :updated",
+            UpdateExpression="ADD failed_chunks :one SET #status = :status, updated_at = :updated",
+            ConditionExpression='attribute_exists(batch_id) AND #status <> :completed',
             ExpressionAttributeValues={
-                ':status': master_status,
-                ':processed': processed_files,
-                ':completed': completed_chunks,
+                ':one': 1,
+                ':status': 'partial_failure',
+                ':completed': 'completed',
                 ':updated': datetime.utcnow().isoformat()
             },
             ExpressionAttributeNames={'#status': 'status'}
         )
         
-        logger.info(f"Master batch {master_batch_id}: {completed_chunks}/{total_chunks} chunks completed, status: {master_status}")
+        logger.info("Master batch marked as partial_failure", master_batch_id=master_batch_id)
         
     except Exception as e:
-        logger.error(f"Error updating master batch progress: {str(e)}")
+        logger.error("Error recording chunk failure on master batch", master_batch_id=master_batch_id, error=str(e))
 
 def generate_s3_key(user_id: str, filename: str) -> str:
     """Generate S3 key with date-based organization"""
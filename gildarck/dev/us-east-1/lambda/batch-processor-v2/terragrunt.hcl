@@ -85,6 +85,9 @@ inputs = {
     BATCH_TABLE_NAME = "gildarck-batch-uploads-dev"
     MAX_RETRY_ATTEMPTS = "3"
     ENABLE_THROTTLING = "true"
+    LOG_LEVEL = "INFO"
+    LOG_SAMPLE_RATE = "0.01"
+    LOG_DEBUG_DETAIL = "false"
   }
 
   tags = merge(local.tags, {
@@ -0,0 +1,415 @@
+"""
+Media Backfill - resumable maintenance jobs over gildarck-media-metadata
+Walks the table with a parallel scan (one worker per segment), writes at a
+bounded rate and checkpoints every page so a run can be stopped and resumed.
+
+Invoke manually until the returned status is 'completed':
+    {"job": "created_date", "total_segments": 8, "max_writes_per_second": 50}
+    {"job": "s3_key", "total_segments": 8, "max_writes_per_second": 50}
+    {"job": "trash_shard", "total_segments": 8, "max_writes_per_second": 50}
+    {"job": "file_hash", "total_segments": 8, "max_writes_per_second": 50}
+Pass "reset": true to discard the checkpoints and start over.
+"""
+
+import json
+import boto3
+import os
+import threading
+import time
+import logging
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Environment variables
+TABLE_NAME = os.environ.get('TABLE_NAME', 'gildarck-media-metadata-dev')
+CHECKPOINT_TABLE_NAME = os.environ.get('CHECKPOINT_TABLE_NAME', 'GlobalConfigurationTable')
+TOTAL_SEGMENTS = int(os.environ.get('TOTAL_SEGMENTS', '8'))
+MAX_WRITES_PER_SECOND = float(os.environ.get('MAX_WRITES_PER_SECOND', '50'))
+SCAN_PAGE_SIZE = int(os.environ.get('SCAN_PAGE_SIZE', '200'))
+BUCKET_NAME = os.environ.get('BUCKET_NAME', 'gildarck-media-dev')
+FILE_HASH_TABLE = os.environ.get('FILE_HASH_TABLE', 'gildarck-media-hashes-dev')
+
+# Must match media-delete's TRASH_SHARDS (TrashExpiryIndex partitions)
+TRASH_SHARDS = 16
+
+# Stop picking up new pages when less than this is left of the invocation
+TIME_BUFFER_MS = 60000
+
+# boto3 resources are not thread-safe, so every segment worker gets its own
+_local = threading.local()
+
+def get_tables():
+    """Return (metadata table, checkpoint table) for the calling thread"""
+    if not hasattr(_local, 'tables'):
+        dynamodb = boto3.session.Session().resource('dynamodb')
+        _local.tables = (dynamodb.Table(TABLE_NAME), dynamodb.Table(CHECKPOINT_TABLE_NAME))
+    return _local.tables
+
+
+def get_file_hash_table():
+    if not hasattr(_local, 'file_hash_table'):
+        _local.file_hash_table = boto3.session.Session().resource('dynamodb').Table(FILE_HASH_TABLE)
+    return _local.file_hash_table
+
+
+def get_s3():
+    if not hasattr(_local, 's3'):
+        _local.s3 = boto3.session.Session().client('s3')
+    return _local.s3
+
+
+class RateLimiter:
+    """Token bucket shared by all segment workers to cap total write throughput"""
+
+    def __init__(self, rate_per_second: float):
+        self.rate = max(rate_per_second, 0.1)
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def build_created_date(capture_date: datetime, file_id: str) -> str:
+    """Build the DateIndex sort key - must match media-processor's build_created_date"""
+    return f"{capture_date.strftime('%Y-%m-%dT%H:%M:%S')}#{file_id}"
+
+
+def created_date_for_item(item: Dict) -> Optional[str]:
+    """Derive created_date for a legacy item from upload_date or its organized year/month"""
+    file_id = item['file_id']
+    
+    # media-processor stores the EXIF/capture date as upload_date when it has one
+    upload_date = item.get('upload_date')
+    if upload_date:
+        try:
+            return build_created_date(datetime.fromisoformat(upload_date.replace('Z', '+00:00')), file_id)
+        except ValueError:
+            logger.warning(f"Unparseable upload_date for {file_id}: {upload_date}")
+    
+    file_info = item.get('file_info') or {}
+    try:
+        return build_created_date(datetime(int(file_info['year']), int(file_info['month']), 1), file_id)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def backfill_created_date(item: Dict) -> bool:
+    """Write created_date on a single item; False if it was skipped"""
+    created_date = created_date_for_item(item)
+    if not created_date:
+        logger.warning(f"No date available for {item['user_id']}/{item['file_id']}, skipping")
+        return False
+    
+    table, _ = get_tables()
+    try:
+        table.update_item(
+            Key={'user_id': item['user_id'], 'file_id': item['file_id']},
+            UpdateExpression='SET created_date = :created_date',
+            # Never overwrite a value media-processor wrote meanwhile, never resurrect deleted items,
+            # never put a trashed item back into DateIndex (media-delete keeps it as trashed_created_date)
+            ConditionExpression='attribute_exists(file_id) AND attribute_not_exists(created_date) AND attribute_not_exists(trash_mode)',
+            ExpressionAttributeValues={':created_date': created_date}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def object_exists(key: str) -> bool:
+    try:
+        get_s3().head_object(Bucket=BUCKET_NAME, Key=key)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+
+def list_user_originals(user_id: str) -> Dict[str, Optional[str]]:
+    """file_id -> key for every object under the user's originals/ (all pages); None when ambiguous"""
+    # Scan segments return a user's items together, so the last listing per worker is enough
+    cached = getattr(_local, 'originals', None)
+    if cached and cached[0] == user_id:
+        return cached[1]
+    
+    originals = {}
+    paginator = get_s3().get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix=f"{user_id}/originals/"):
+        for obj in page.get('Contents', []):
+            # media-processor names originals <file_id>.<extension>
+            file_id = obj['Key'].rsplit('/', 1)[-1].split('.')[0]
+            originals[file_id] = None if file_id in originals else obj['Key']
+    
+    _local.originals = (user_id, originals)
+    return originals
+
+
+def resolve_s3_key(item: Dict) -> Optional[str]:
+    """The original's actual key: recorded paths first, then an exact file_id match in the user's listing"""
+    user_id, file_id = item['user_id'], item['file_id']
+    file_info = item.get('file_info') or {}
+    candidates = [(item.get('s3_paths') or {}).get('original'), item.get('s3_key')]
+    if file_info.get('year') and file_info.get('month') and file_info.get('extension'):
+        candidates.append(f"{user_id}/originals/{file_info['year']}/{file_info['month']}/{file_id}.{file_info['extension']}")
+    
+    for key in dict.fromkeys(key for key in candidates if key):
+        if object_exists(key):
+            return key
+    return list_user_originals(user_id).get(file_id)
+
+
+def other_key_owner(key: str, item: Dict) -> Optional[tuple]:
+    """(user_id, file_id) of another item already holding this s3_key, via S3KeyIndex"""
+    table, _ = get_tables()
+    response = table.query(IndexName='S3KeyIndex', KeyConditionExpression=Key('s3_key').eq(key))
+    for owner in response.get('Items', []):
+        if (owner['user_id'], owner['file_id']) != (item['user_id'], item['file_id']):
+            return owner['user_id'], owner['file_id']
+    return None
+
+
+def reconcile_s3_key(item: Dict) -> bool:
+    """Set s3_key (and s3_paths.original) to where the original really is; False if it was skipped"""
+    key = resolve_s3_key(item)
+    if not key:
+        logger.warning(f"No object found for {item['user_id']}/{item['file_id']}, skipping")
+        return False
+    
+    owner = other_key_owner(key, item)
+    if owner:
+        logger.warning(f"{key} already belongs to {owner[0]}/{owner[1]}, skipping {item['file_id']}")
+        return False
+    
+    if key == item.get('s3_key') and key == (item.get('s3_paths') or {}).get('original'):
+        return False
+    
+    if 's3_paths' in item:
+        update_expression = 'SET s3_key = :key, s3_paths.original = :key'
+        values = {':key': key}
+    else:
+        update_expression = 'SET s3_key = :key, s3_paths = :s3_paths'
+        values = {':key': key, ':s3_paths': {'original': key}}
+    
+    table, _ = get_tables()
+    try:
+        table.update_item(
+            Key={'user_id': item['user_id'], 'file_id': item['file_id']},
+            UpdateExpression=update_expression,
+            # The item must be unchanged since the scan read it (media-delete may have moved it meanwhile)
+            ConditionExpression=Attr('file_id').exists() & (
+                Attr('s3_key').eq(item['s3_key']) if 's3_key' in item else Attr('s3_key').not_exists()),
+            ExpressionAttributeValues=values
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def trash_shard_for(file_id: str) -> str:
+    """TrashExpiryIndex partition - must match media-delete's get_trash_shard"""
+    return str(zlib.crc32(file_id.encode('utf-8')) % TRASH_SHARDS)
+
+
+def backfill_trash_shard(item: Dict) -> bool:
+    """Put an item trashed before TrashExpiryIndex existed into it, so the purge worker finds it"""
+    table, _ = get_tables()
+    try:
+        table.update_item(
+            Key={'user_id': item['user_id'], 'file_id': item['file_id']},
+            UpdateExpression='SET trash_shard = :shard',
+            # Still trashed (not restored or deleted meanwhile) and not indexed yet
+            ConditionExpression='processing_status = :trashed AND attribute_exists(trash_date) AND attribute_not_exists(trash_shard)',
+            ExpressionAttributeValues={':shard': trash_shard_for(item['file_id']), ':trashed': 'trashed'}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def backfill_file_hash(item: Dict) -> bool:
+    """Add the user_id#file_hash dedup entry media-processor writes for new files"""
+    try:
+        get_file_hash_table().put_item(
+            Item={
+                'user_hash': f"{item['user_id']}#{item['file_hash']}",
+                'user_id': item['user_id'],
+                'file_hash': item['file_hash'],
+                'file_id': item['file_id'],
+                'updated_at': datetime.utcnow().isoformat()
+            },
+            # An entry media-processor wrote meanwhile points at the newer file
+            ConditionExpression='attribute_not_exists(user_hash)'
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+# Registered jobs: which items to visit and how to fix each one
+JOBS = {
+    'created_date': {
+        'filter': Attr('created_date').not_exists() & Attr('trash_mode').not_exists(),
+        'projection': 'user_id, file_id, upload_date, file_info',
+        'apply': backfill_created_date
+    },
+    # Items whose canonical s3_key is missing or disagrees with s3_paths (legacy items)
+    's3_key': {
+        'filter': 'attribute_not_exists(s3_key) OR attribute_not_exists(s3_paths.original) OR s3_key <> s3_paths.original',
+        'projection': 'user_id, file_id, s3_key, s3_paths, file_info',
+        'apply': reconcile_s3_key
+    },
+    'trash_shard': {
+        'filter': Attr('processing_status').eq('trashed') & Attr('trash_date').exists() & Attr('trash_shard').not_exists(),
+        'projection': 'user_id, file_id',
+        'apply': backfill_trash_shard
+    },
+    'file_hash': {
+        'filter': Attr('file_hash').exists(),
+        'projection': 'user_id, file_id, file_hash',
+        'apply': backfill_file_hash
+    }
+}
+
+
+def checkpoint_id(job: str, segment: int, total_segments: int) -> str:
+    return f"media-backfill#{job}#{total_segments}#{segment}"
+
+
+def load_checkpoint(job: str, segment: int, total_segments: int) -> Dict:
+    _, checkpoint_table = get_tables()
+    response = checkpoint_table.get_item(
+        Key={'id': checkpoint_id(job, segment, total_segments)},
+        ConsistentRead=True
+    )
+    return response.get('Item', {})
+
+
+def save_checkpoint(job: str, segment: int, total_segments: int, last_key: Optional[Dict], stats: Dict):
+    _, checkpoint_table = get_tables()
+    checkpoint_table.put_item(
+        Item={
+            'id': checkpoint_id(job, segment, total_segments),
+            'last_evaluated_key': json.dumps(last_key, default=str) if last_key else None,
+            'done': last_key is None,
+            'scanned': stats['scanned'],
+            'updated': stats['updated'],
+            'updated_at': datetime.utcnow().isoformat()
+        }
+    )
+
+
+def reset_checkpoints(job: str, total_segments: int):
+    _, checkpoint_table = get_tables()
+    for segment in range(total_segments):
+        checkpoint_table.delete_item(Key={'id': checkpoint_id(job, segment, total_segments)})
+    logger.info(f"Reset {total_segments} checkpoints for job {job}")
+
+
+def run_segment(job: str, segment: int, total_segments: int, limiter: RateLimiter, context) -> Dict[str, Any]:
+    """Scan one segment from its checkpoint until it is exhausted or time runs out"""
+    spec = JOBS[job]
+    table, _ = get_tables()
+    checkpoint = load_checkpoint(job, segment, total_segments)
+    stats = {
+        'scanned': int(checkpoint.get('scanned', 0)),
+        'updated': int(checkpoint.get('updated', 0))
+    }
+    
+    if checkpoint.get('done'):
+        return {'segment': segment, 'done': True, **stats}
+    
+    last_key = json.loads(checkpoint['last_evaluated_key']) if checkpoint.get('last_evaluated_key') else None
+    
+    while context.get_remaining_time_in_millis() > TIME_BUFFER_MS:
+        scan_kwargs = {
+            'Segment': segment,
+            'TotalSegments': total_segments,
+            'Limit': SCAN_PAGE_SIZE,
+            'FilterExpression': spec['filter'],
+            'ProjectionExpression': spec['projection']
+        }
+        if last_key:
+            scan_kwargs['ExclusiveStartKey'] = last_key
+        
+        response = table.scan(**scan_kwargs)
+        stats['scanned'] += response.get('ScannedCount', 0)
+        
+        for item in response.get('Items', []):
+            limiter.acquire()
+            if spec['apply'](item):
+                stats['updated'] += 1
+        
+        last_key = response.get('LastEvaluatedKey')
+        save_checkpoint(job, segment, total_segments, last_key, stats)
+        
+        if not last_key:
+            logger.info(f"Segment {segment}/{total_segments} finished: {stats}")
+            return {'segment': segment, 'done': True, **stats}
+    
+    logger.info(f"Segment {segment}/{total_segments} paused for time: {stats}")
+    return {'segment': segment, 'done': False, **stats}
+
+
+def lambda_handler(event, context):
+    """Run (or resume) a backfill job across all scan segments in parallel"""
+    try:
+        job = event.get('job', 'created_date')
+        if job not in JOBS:
+            return {'statusCode': 400, 'body': json.dumps({'error': f'Unknown job: {job}'})}
+        
+        total_segments = int(event.get('total_segments', TOTAL_SEGMENTS))
+        limiter = RateLimiter(float(event.get('max_writes_per_second', MAX_WRITES_PER_SECOND)))
+        
+        if event.get('reset'):
+            reset_checkpoints(job, total_segments)
+        
+        logger.info(f"Running backfill job {job} over {total_segments} segments")
+        
+        with ThreadPoolExecutor(max_workers=total_segments) as pool:
+            segments = list(pool.map(
+                lambda segment: run_segment(job, segment, total_segments, limiter, context),
+                range(total_segments)
+            ))
+        
+        completed = all(s['done'] for s in segments)
+        summary = {
+            'job': job,
+            'status': 'completed' if completed else 'in_progress',
+            'scanned': sum(s['scanned'] for s in segments),
+            'updated': sum(s['updated'] for s in segments),
+            'segments': segments
+        }
+        logger.info(f"Backfill job {job} {summary['status']}: scanned={summary['scanned']}, updated={summary['updated']}")
+        
+        return {'statusCode': 200, 'body': json.dumps(summary)}
+        
+    except Exception as e:
+        logger.error(f"Error in media backfill: {str(e)}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
@@ -0,0 +1,96 @@
+terraform {
+  source = "${include.envcommon.locals.base_source_url}"
+}
+
+include "root" {
+  path = find_in_parent_folders()
+}
+
+include "envcommon" {
+  path   = "${dirname(find_in_parent_folders())}/_envcommon/aws/lambda/function.hcl"
+  expose = true
+}
+
+locals {
+  vars         = read_terragrunt_config(find_in_parent_folders("env.hcl")).locals
+  name         = "gildarck-media-backfill"
+  service_vars = read_terragrunt_config(find_in_parent_folders("service.hcl"))
+  tags         = merge(local.service_vars.locals.tags, { name = local.name })
+}
+
+inputs = {
+  function_name  = "${local.name}"
+  description    = "Resumable backfill jobs over the media metadata table"
+  handler        = "index.lambda_handler"
+  runtime        = "python3.12"
+  architectures  = ["arm64"]
+  timeout        = 900
+  memory_size    = 512
+  create_package = false
+  publish        = true
+
+  local_existing_package = "lambda.zip"
+  
+  attach_policy_statements = true
+  policy_statements = {
+    dynamodb_access = {
+      effect = "Allow"
+      actions = [
+        "dynamodb:Scan",
+        "dynamodb:Query",
+        "dynamodb:UpdateItem"
+      ]
+      resources = [
+        "arn:aws:dynamodb:us-east-1:496860676881:table/gildarck-media-metadata-dev",
+        "arn:aws:dynamodb:us-east-1:496860676881:table/gildarck-media-metadata-dev/index/S3KeyIndex"
+      ]
+    }
+    # s3_key job: checks recorded paths and lists a user's originals/
+    s3_object_access = {
+      effect = "Allow"
+      actions = [
+        "s3:GetObject"
+      ]
+      resources = ["arn:aws:s3:::gildarck-media-dev/*"]
+    }
+    s3_bucket_access = {
+      effect = "Allow"
+      actions = [
+        "s3:ListBucket"
+      ]
+      resources = ["arn:aws:s3:::gildarck-media-dev"]
+    }
+    file_hash_access = {
+      effect = "Allow"
+      actions = [
+        "dynamodb:PutItem"
+      ]
+      resources = [
+        "arn:aws:dynamodb:us-east-1:496860676881:table/gildarck-media-hashes-dev"
+      ]
+    }
+    checkpoint_access = {
+      effect = "Allow"
+      actions = [
+        "dynamodb:GetItem",
+        "dynamodb:PutItem",
+        "dynamodb:DeleteItem"
+      ]
+      resources = [
+        "arn:aws:dynamodb:us-east-1:496860676881:table/GlobalConfigurationTable"
+      ]
+    }
+  }
+  
+  environment_variables = {
+    TABLE_NAME            = "gildarck-media-metadata-dev"
+    CHECKPOINT_TABLE_NAME = "GlobalConfigurationTable"
+    TOTAL_SEGMENTS        = "8"
+    MAX_WRITES_PER_SECOND = "50"
+    SCAN_PAGE_SIZE        = "200"
+    BUCKET_NAME           = "gildarck-media-dev"
+    FILE_HASH_TABLE       = "gildarck-media-hashes-dev"
+  }
+
+  tags = local.tags
+}
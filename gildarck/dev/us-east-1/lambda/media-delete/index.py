@@ -1,9 +1,17 @@
 import json
+import os
+import random
+import time
 import boto3
 import logging
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Callable, Optional
 from boto3.dynamodb.conditions import Key
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from decimal import Decimal
 
 # Custom JSON encoder for Decimal values
@@ -17,12 +25,48 @@ class DecimalEncoder(json.JSONEncoder):
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Bulk operations: S3 requests for a whole selection run through one bounded pool
+S3_CONCURRENCY = int(os.environ.get('S3_CONCURRENCY', '32'))
+DELETE_OBJECTS_MAX_KEYS = 1000
+BATCH_GET_MAX_KEYS = 100
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_MAX_ATTEMPTS = 8
+THUMBNAIL_SIZES = ['small', 'medium', 'large']
+
+# 'metadata': trash is a status change (objects stay where they are); 'move': legacy copy into /trash/
+TRASH_MODE = os.environ.get('TRASH_MODE', 'metadata')
+# Sort keys of DateIndex and LocationIndex; a trashed item keeps them as trashed_<name> so it leaves both indexes
+TRASH_HIDDEN_ATTRIBUTES = ['created_date', 'location_lat_lng']
+TRASH_INDEX = 'TrashIndex'
+# Sparse index of trashed items across users (trash_shard + trash_date), read by the purge worker.
+# The shard count is part of the stored data: media-backfill's trash_shard job computes the same value.
+TRASH_EXPIRY_INDEX = 'TrashExpiryIndex'
+TRASH_SHARDS = 16
+
+# Scheduled purge (purge_handler, deployed as gildarck-media-trash-purge with this package)
+TRASH_RETENTION_DAYS = int(os.environ.get('TRASH_RETENTION_DAYS', '30'))
+PURGE_MAX_DELETES_PER_SECOND = float(os.environ.get('PURGE_MAX_DELETES_PER_SECOND', '50'))
+PURGE_SHARD_CONCURRENCY = int(os.environ.get('PURGE_SHARD_CONCURRENCY', '4'))
+PURGE_PAGE_SIZE = 100
+CHECKPOINT_TABLE_NAME = os.environ.get('CHECKPOINT_TABLE_NAME', 'GlobalConfigurationTable')
+# Stop picking up new pages when less than this is left of the invocation
+PURGE_TIME_BUFFER_MS = 60000
+
+# Metrics are written as CloudWatch embedded metric format log lines (no PutMetricData call)
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'Gildarck/Media')
+
 # Initialize AWS clients
-s3_client = boto3.client('s3')
+s3_client = boto3.client('s3', config=Config(
+    max_pool_connections=S3_CONCURRENCY,
+    retries={'mode': 'adaptive', 'max_attempts': 5}
+))
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table('gildarck-media-metadata-dev')
+# Clients are thread-safe (resources are not); the resource's client still takes plain Python values
+dynamodb_client = dynamodb.meta.client
 
 BUCKET_NAME = 'gildarck-media-dev'
+TABLE_NAME = 'gildarck-media-metadata-dev'
 
 def extract_cognito_sub(event):
     """Extract cognito sub from API Gateway authorizer context"""
@@ -75,7 +119,7 @@ def lambda_handler(event, context):
         action = body.get('action')  # 'trash', 'delete', 'restore', 'list_trash'
         file_ids = body.get('file_ids', [])  # List of file IDs
         
-        logger.info(f"Processing {action} for user {user_id}, files: {file_ids}")
+        logger.info(f"Processing {action} for user {user_id}, {len(file_ids)} files")
         
         results = []
         
@@ -128,122 +172,194 @@ def error_response(error_message):
     }
 
 def move_to_trash(user_id: str, file_ids: List[str]) -> List[Dict]:
-    """Move files to trash (soft delete) - Google Photos style"""
-    results = []
+    """Move files to trash (soft delete) - Google Photos style, as one bulk operation
+    
+    With TRASH_MODE=metadata this is one conditional UpdateItem per file and no S3 request;
+    TRASH_MODE=move keeps the legacy copy of every object into /trash/.
+    """
+    file_ids = list(dict.fromkeys(file_ids))
+    items = load_items(user_id, file_ids)
+    trashed_at = datetime.utcnow().isoformat()
+    results = {}
+    copies = []
+    metadata_updates = []
     
     for file_id in file_ids:
-        try:
-            # Get file metadata
-            response = table.get_item(
-                Key={'user_id': user_id, 'file_id': file_id}
-            )
-            
-            if 'Item' not in response:
-                results.append({'file_id': file_id, 'success': False, 'error': 'File not found in database'})
-                continue
-            
-            item = response['Item']
-            
-            # Check if already in trash
-            if item.get('processing_status') == 'trashed':
-                results.append({'file_id': file_id, 'success': False, 'error': 'File already in trash'})
-                continue
-            
-            # Get original path from s3_paths structure (consistent with media-processor)
-            s3_paths = item.get('s3_paths', {})
-            original_path = s3_paths.get('original', '')
-            
-            if not original_path:
-                # Fallback to legacy s3_key field
-                original_path = item.get('s3_key', '')
-            
-            if not original_path:
-                # Try to construct path from file_id and filename
-                filename = item.get('filename', file_id)
-                original_path = f"{user_id}/originals/{filename}"
-                logger.info(f"Constructed path for {file_id}: {original_path}")
-            
-            logger.info(f"Attempting to move {file_id} from path: {original_path}")
-            
-            # Find the actual file in S3 with multiple fallback strategies
-            actual_path = find_actual_s3_path(user_id, file_id, original_path, item)
-            
+        item = items.get(file_id)
+        if item is None:
+            results[file_id] = {'file_id': file_id, 'success': False, 'error': 'File not found in database'}
+            continue
+        
+        # Check if already in trash
+        if item.get('processing_status') == 'trashed':
+            results[file_id] = {'file_id': file_id, 'success': False, 'error': 'File already in trash'}
+            continue
+        
+        if TRASH_MODE == 'metadata':
+            metadata_updates.append(get_metadata_trash_update(user_id, file_id, item, trashed_at))
+            continue
+        
+        copies.append({
+            'file_id': file_id,
+            'role': 'original',
+            'run': copy_original_to_trash,
+            'user_id': user_id,
+            'item': item,
+            'source': get_original_path(user_id, file_id, item),
+            'trashed_at': trashed_at
+        })
+        thumbnails = item.get('thumbnails', {})
+        for size in THUMBNAIL_SIZES:
+            copies.append({
+                'file_id': file_id,
+                'role': size,
+                'run': copy_if_exists,
+                'source': thumbnails.get(size, f"{user_id}/thumbnails/{size}/{file_id}_{size[0]}.webp"),
+                'dest': f"{user_id}/trash/thumbnails/{size}/{file_id}_{size[0]}.webp"
+            })
+    
+    # Phase 1: every copy of the selection (originals and thumbnails) through one pool
+    outcomes = run_copies(copies)
+    
+    # Phase 2: delete the copied sources with delete_objects
+    sources = {}
+    orphans = []
+    for file_id, outcome in outcomes.items():
+        original = outcome['original']
+        copied_thumbnails = [outcome[size] for size in THUMBNAIL_SIZES if isinstance(outcome.get(size), dict)]
+        if isinstance(original, Exception):
+            results[file_id] = {'file_id': file_id, 'success': False, 'error': str(original)}
+            # Thumbnails already copied for a file that stays put
+            orphans.extend(copy['dest'] for copy in copied_thumbnails)
+            continue
+        sources[file_id] = [original['source']] + [copy['source'] for copy in copied_thumbnails]
+    
+    delete_errors = delete_keys([key for keys in sources.values() for key in keys] + orphans)
+    
+    # Phase 3: metadata updates for files whose original left its old location
+    updates = metadata_updates
+    for file_id, keys in sources.items():
+        if keys[0] in delete_errors:
+            results[file_id] = {'file_id': file_id, 'success': False, 'error': f"Could not remove original: {delete_errors[keys[0]]}"}
+            continue
+        
+        outcome = outcomes[file_id]
+        for size in THUMBNAIL_SIZES:
+            if isinstance(outcome.get(size), Exception):
+                logger.warning(f"Thumbnail {size} of {file_id} could not be moved: {str(outcome[size])}")
+        
+        # Update metadata - mark as trashed with consistent structure
+        updated_s3_paths = dict(items[file_id].get('s3_paths') or {})
+        updated_s3_paths['original'] = outcome['original']['dest']
+        trash_thumbnails = {size: f"{user_id}/trash/thumbnails/{size}/{file_id}_{size[0]}.webp" for size in THUMBNAIL_SIZES}
+        
+        updates.append({
+            'file_id': file_id,
+            'Key': {'user_id': user_id, 'file_id': file_id},
+            'UpdateExpression': 'SET #status = :status, trash_date = :trash_date, trash_shard = :trash_shard, s3_key = :s3_key, s3_paths = :s3_paths, thumbnails = :thumbnails',
+            'ExpressionAttributeNames': {'#status': 'processing_status'},
+            'ExpressionAttributeValues': {
+                ':status': 'trashed',
+                ':trash_date': trashed_at,
+                ':trash_shard': get_trash_shard(file_id),
+                ':s3_key': updated_s3_paths['original'],
+                ':s3_paths': updated_s3_paths,
+                ':thumbnails': trash_thumbnails
+            }
+        })
+    
+    apply_updates(updates, results, 'moved_to_trash')
+    return collect_results(file_ids, results, 'trash')
+
+def get_trash_shard(file_id: str) -> str:
+    """TrashExpiryIndex partition of a trashed file; spreads the purge over TRASH_SHARDS partitions"""
+    return str(zlib.crc32(file_id.encode('utf-8')) % TRASH_SHARDS)
+
+def get_metadata_trash_update(user_id: str, file_id: str, item: Dict, trashed_at: str) -> Dict:
+    """Trash without touching S3: status, trash_date (TrashIndex key) and the index keys moved aside"""
+    sets = ['#status = :trashed', 'trash_date = :trash_date', 'trash_shard = :trash_shard', 'trash_mode = :mode']
+    values = {':trashed': 'trashed', ':trash_date': trashed_at, ':trash_shard': get_trash_shard(file_id), ':mode': 'metadata'}
+    removes = []
+    for name in TRASH_HIDDEN_ATTRIBUTES:
+        if name in item:
+            sets.append(f"trashed_{name} = :{name}")
+            values[f":{name}"] = item[name]
+            removes.append(name)
+    
+    return {
+        'file_id': file_id,
+        'Key': {'user_id': user_id, 'file_id': file_id},
+        'UpdateExpression': 'SET ' + ', '.join(sets) + (' REMOVE ' + ', '.join(removes) if removes else ''),
+        # Guards against a concurrent trash (or a permanent delete) between the read and this write
+        'ConditionExpression': 'attribute_exists(file_id) AND (attribute_not_exists(#status) OR #status <> :trashed)',
+        'ExpressionAttributeNames': {'#status': 'processing_status'},
+        'ExpressionAttributeValues': values,
+        'condition_error': 'File already in trash'
+    }
+
+def get_metadata_restore_update(user_id: str, file_id: str, item: Dict) -> Dict:
+    """Undo get_metadata_trash_update: the item reappears in DateIndex/LocationIndex and leaves TrashIndex"""
+    sets = ['#status = :completed']
+    values = {':completed': 'completed', ':trashed': 'trashed', ':mode': 'metadata'}
+    removes = ['trash_date', 'trash_shard', 'trash_mode']
+    for name in TRASH_HIDDEN_ATTRIBUTES:
+        if f"trashed_{name}" in item:
+            sets.append(f"{name} = :{name}")
+            values[f":{name}"] = item[f"trashed_{name}"]
+            removes.append(f"trashed_{name}")
+    
+    return {
+        'file_id': file_id,
+        'Key': {'user_id': user_id, 'file_id': file_id},
+        'UpdateExpression': 'SET ' + ', '.join(sets) + ' REMOVE ' + ', '.join(removes),
+        'ConditionExpression': '#status = :trashed AND trash_mode = :mode',
+        'ExpressionAttributeNames': {'#status': 'processing_status'},
+        'ExpressionAttributeValues': values,
+        'condition_error': 'File not in trash'
+    }
+
+def get_original_path(user_id: str, file_id: str, item: Dict) -> str:
+    """Recorded location of the original (s3_paths, canonical s3_key, or a constructed guess)"""
+    # Get original path from s3_paths structure (consistent with media-processor)
+    original_path = (item.get('s3_paths') or {}).get('original', '')
+    
+    if not original_path:
+        # s3_key: written at ingest by media-processor, repaired for legacy items by media-backfill
+        original_path = item.get('s3_key', '')
+    
+    if not original_path:
+        # Try to construct path from file_id and filename
+        filename = item.get('filename', file_id)
+        original_path = f"{user_id}/originals/{filename}"
+    
+    return original_path
+
+def get_trash_path(user_id: str, file_id: str, actual_path: str) -> str:
+    # Create trash path maintaining date structure
+    if '/originals/' in actual_path:
+        return actual_path.replace('/originals/', '/trash/')
+    # Fallback for files not in originals folder
+    return f"{user_id}/trash/{file_id}"
+
+def copy_original_to_trash(copy: Dict) -> Dict:
+    """Copy an original into trash; other locations are only probed when the recorded path is missing"""
+    user_id, file_id = copy['user_id'], copy['file_id']
+    actual_path = copy['source']
+    
+    for attempt in range(2):
+        if attempt:
+            # Rare once media-backfill's s3_key job has reconciled legacy items; the metric shows if not
+            logger.warning(f"Recorded path {copy['source']} of {file_id} is missing, probing other locations")
+            emit_metrics({'PathProbeFallback': 1}, Operation='trash')
+            actual_path = find_actual_s3_path(user_id, file_id, copy['source'], copy['item'])
             if not actual_path:
-                results.append({'file_id': file_id, 'success': False, 'error': 'File not found in S3'})
-                continue
-            
-            # Create trash path maintaining date structure
-            if '/originals/' in actual_path:
-                trash_path = actual_path.replace('/originals/', '/trash/')
-            else:
-                # Fallback for files not in originals folder
-                trash_path = f"{user_id}/trash/{file_id}"
-            
-            logger.info(f"Moving {actual_path} to {trash_path}")
-            
-            # Copy to trash
-            s3_client.copy_object(
-                Bucket=BUCKET_NAME,
-                CopySource={'Bucket': BUCKET_NAME, 'Key': actual_path},
-                Key=trash_path,
-                Metadata={
-                    'trashed-date': datetime.utcnow().isoformat(),
-                    'original-path': actual_path
-                },
-                MetadataDirective='REPLACE'
-            )
-            
-            # Delete from originals
-            s3_client.delete_object(Bucket=BUCKET_NAME, Key=actual_path)
-            
-            # Move thumbnails to trash (handle missing thumbnails gracefully)
-            thumbnails = item.get('thumbnails', {})
-            trash_thumbnails = {}
-            
-            for size in ['small', 'medium', 'large']:
-                thumb_path = thumbnails.get(size, f"{user_id}/thumbnails/{size}/{file_id}_{size[0]}.webp")
-                trash_thumb_path = f"{user_id}/trash/thumbnails/{size}/{file_id}_{size[0]}.webp"
-                
-                try:
-                    # Check if thumbnail exists before trying to move it
-                    s3_client.head_object(Bucket=BUCKET_NAME, Key=thumb_path)
-                    s3_client.copy_object(
-                        Bucket=BUCKET_NAME,
-                        CopySource={'Bucket': BUCKET_NAME, 'Key': thumb_path},
-                        Key=trash_thumb_path
-                    )
-                    s3_client.delete_object(Bucket=BUCKET_NAME, Key=thumb_path)
-                    trash_thumbnails[size] = trash_thumb_path
-                    logger.info(f"Moved thumbnail {thumb_path} to trash")
-                except Exception as thumb_error:
-                    logger.warning(f"Thumbnail {thumb_path} not found or could not be moved: {str(thumb_error)}")
-                    # Create placeholder path for consistency
-                    trash_thumbnails[size] = trash_thumb_path
-            
-            # Update metadata - mark as trashed with consistent structure
-            updated_s3_paths = s3_paths.copy() if s3_paths else {}
-            updated_s3_paths['original'] = trash_path
-            
-            table.update_item(
-                Key={'user_id': user_id, 'file_id': file_id},
-                UpdateExpression='SET #status = :status, trash_date = :trash_date, s3_paths = :s3_paths, thumbnails = :thumbnails',
-                ExpressionAttributeNames={'#status': 'processing_status'},
-                ExpressionAttributeValues={
-                    ':status': 'trashed',
-                    ':trash_date': datetime.utcnow().isoformat(),
-                    ':s3_paths': updated_s3_paths,
-                    ':thumbnails': trash_thumbnails
-                }
-            )
-            
-            results.append({'file_id': file_id, 'success': True, 'action': 'moved_to_trash'})
-            logger.info(f"Successfully moved {file_id} to trash")
-            
-        except Exception as e:
-            logger.error(f"Error moving {file_id} to trash: {str(e)}")
-            results.append({'file_id': file_id, 'success': False, 'error': str(e)})
+                break
+        trash_path = get_trash_path(user_id, file_id, actual_path)
+        metadata = {'trashed-date': copy['trashed_at'], 'original-path': actual_path}
+        if copy_object(actual_path, trash_path, metadata):
+            return {'source': actual_path, 'dest': trash_path}
     
-    return results
+    raise FileNotFoundError('File not found in S3')
 
 def find_actual_s3_path(user_id: str, file_id: str, original_path: str, item: Dict) -> str:
     """Find the actual S3 path for a file using multiple strategies"""
@@ -348,178 +464,306 @@ def find_actual_s3_path(user_id: str, file_id: str, original_path: str, item: Di
     return None
 
 def permanent_delete(user_id: str, file_ids: List[str]) -> List[Dict]:
-    """Permanently delete files - Google Photos style"""
-    results = []
+    """Permanently delete files - Google Photos style, as one bulk operation"""
+    file_ids = list(dict.fromkeys(file_ids))
+    items = load_items(user_id, file_ids)
+    results = {}
     
     for file_id in file_ids:
-        try:
-            # Get file metadata
-            response = table.get_item(
-                Key={'user_id': user_id, 'file_id': file_id}
-            )
-            
-            if 'Item' not in response:
-                results.append({'file_id': file_id, 'success': False, 'error': 'File not found'})
-                continue
-            
-            item = response['Item']
-            
-            # Get current path (could be in originals or trash)
-            s3_paths = item.get('s3_paths', {})
-            current_path = s3_paths.get('original', '')
-            
-            if not current_path:
-                current_path = item.get('s3_key', '')
-            
-            # Delete from S3 (original or trash location)
-            if current_path:
-                try:
-                    s3_client.delete_object(Bucket=BUCKET_NAME, Key=current_path)
-                    logger.info(f"Deleted original file: {current_path}")
-                except Exception as e:
-                    logger.warning(f"Could not delete original {current_path}: {str(e)}")
-            
-            # Delete all thumbnails (both active and trash locations)
-            thumbnails = item.get('thumbnails', {})
-            
-            for size in ['small', 'medium', 'large']:
-                # Try current thumbnail path
-                thumb_path = thumbnails.get(size, f"{user_id}/thumbnails/{size}/{file_id}_{size[0]}.webp")
-                trash_thumb_path = f"{user_id}/trash/thumbnails/{size}/{file_id}_{size[0]}.webp"
-                
-                for path in [thumb_path, trash_thumb_path]:
-                    try:
-                        s3_client.delete_object(Bucket=BUCKET_NAME, Key=path)
-                        logger.info(f"Deleted thumbnail: {path}")
-                    except Exception as e:
-                        logger.warning(f"Could not delete thumbnail {path}: {str(e)}")
-            
-            # Delete compressed version if exists
-            compressed_path = s3_paths.get('compressed', f"{user_id}/compressed/{file_id}_compressed.jpg")
-            try:
-                s3_client.delete_object(Bucket=BUCKET_NAME, Key=compressed_path)
-                logger.info(f"Deleted compressed: {compressed_path}")
-            except Exception as e:
-                logger.warning(f"Could not delete compressed {compressed_path}: {str(e)}")
-            
-            # Delete metadata from DynamoDB
-            table.delete_item(
-                Key={'user_id': user_id, 'file_id': file_id}
-            )
-            
-            results.append({'file_id': file_id, 'success': True, 'action': 'permanently_deleted'})
-            logger.info(f"Permanently deleted {file_id}")
-            
-        except Exception as e:
-            logger.error(f"Error permanently deleting {file_id}: {str(e)}")
-            results.append({'file_id': file_id, 'success': False, 'error': str(e)})
+        if file_id not in items:
+            results[file_id] = {'file_id': file_id, 'success': False, 'error': 'File not found'}
+    
+    delete_files(user_id, [items[file_id] for file_id in file_ids if file_id in items], results)
+    return collect_results(file_ids, results, 'delete')
+
+def delete_files(user_id: str, items: List[Dict], results: Dict[str, Dict]):
+    """Delete the objects of loaded items, then the metadata of files whose objects are all gone"""
+    object_keys = {item['file_id']: get_object_keys(item) for item in items}
+    
+    # One DeleteObjects request per 1,000 keys for the whole selection
+    delete_errors = delete_keys([key for keys in object_keys.values() for key in keys])
+    
+    # Metadata is only removed for files whose objects are all gone, so a retry still finds them
+    deletes = []
+    for file_id, keys in object_keys.items():
+        failed = [key for key in keys if key in delete_errors]
+        if failed:
+            results[file_id] = {'file_id': file_id, 'success': False, 'error': f"Could not delete {failed[0]}: {delete_errors[failed[0]]}"}
+            continue
+        deletes.append(file_id)
     
-    return results
+    unprocessed = delete_items(user_id, deletes)
+    for file_id in deletes:
+        if file_id in unprocessed:
+            results[file_id] = {'file_id': file_id, 'success': False, 'error': unprocessed[file_id]}
+        else:
+            results[file_id] = {'file_id': file_id, 'success': True, 'action': 'permanently_deleted'}
+
+def get_object_keys(item: Dict) -> List[str]:
+    """The S3 keys the metadata records for a file, at their current location (active or trash)"""
+    s3_paths = item.get('s3_paths') or {}
+    # Trash moves rewrite the top-level thumbnails map; s3_paths.thumbnails keeps the active paths
+    thumbnails = item.get('thumbnails') or s3_paths.get('thumbnails') or {}
+    keys = [item.get('s3_key'), s3_paths.get('original')]
+    keys.extend(thumbnails.get(size) for size in THUMBNAIL_SIZES)
+    keys.append(s3_paths.get('compressed'))
+    return list(dict.fromkeys(key for key in keys if key))
 
 def restore_from_trash(user_id: str, file_ids: List[str]) -> List[Dict]:
-    """Restore files from trash - Google Photos style"""
-    results = []
+    """Restore files from trash - Google Photos style, as one bulk operation"""
+    file_ids = list(dict.fromkeys(file_ids))
+    items = load_items(user_id, file_ids)
+    restored_at = datetime.utcnow().isoformat()
+    results = {}
+    copies = []
+    metadata_updates = []
     
     for file_id in file_ids:
+        item = items.get(file_id)
+        if item is None:
+            results[file_id] = {'file_id': file_id, 'success': False, 'error': 'File not found'}
+            continue
+        
+        # Check if file is actually in trash
+        if item.get('processing_status') != 'trashed':
+            results[file_id] = {'file_id': file_id, 'success': False, 'error': 'File not in trash'}
+            continue
+        
+        # Trashed in metadata mode: the objects never moved (whatever TRASH_MODE is now)
+        if item.get('trash_mode') == 'metadata':
+            metadata_updates.append(get_metadata_restore_update(user_id, file_id, item))
+            continue
+        
+        trash_path = (item.get('s3_paths') or {}).get('original', '')
+        if not trash_path or '/trash/' not in trash_path:
+            results[file_id] = {'file_id': file_id, 'success': False, 'error': 'Invalid trash path'}
+            continue
+        
+        # Restore original file - reconstruct original path from file metadata
+        file_info = item.get('file_info', {})
+        year = file_info.get('year', datetime.now().year)
+        month = file_info.get('month', f"{datetime.now().month:02d}")
+        extension = file_info.get('extension', 'jpg')
+        
+        copies.append({
+            'file_id': file_id,
+            'role': 'original',
+            'run': copy_required,
+            'source': trash_path,
+            'dest': f"{user_id}/originals/{year}/{month}/{file_id}.{extension}",
+            'metadata': {'restored-date': restored_at, 'user-id': user_id, 'file-id': file_id}
+        })
+        for size in THUMBNAIL_SIZES:
+            copies.append({
+                'file_id': file_id,
+                'role': size,
+                'run': copy_if_exists,
+                'source': f"{user_id}/trash/thumbnails/{size}/{file_id}_{size[0]}.webp",
+                'dest': f"{user_id}/thumbnails/{size}/{file_id}_{size[0]}.webp"
+            })
+    
+    # Phase 1: copies back out of trash; phase 2: delete the trash copies
+    outcomes = run_copies(copies)
+    sources = {}
+    orphans = []
+    for file_id, outcome in outcomes.items():
+        original = outcome['original']
+        copied_thumbnails = [outcome[size] for size in THUMBNAIL_SIZES if isinstance(outcome.get(size), dict)]
+        if isinstance(original, Exception):
+            results[file_id] = {'file_id': file_id, 'success': False, 'error': str(original)}
+            orphans.extend(copy['dest'] for copy in copied_thumbnails)
+            continue
+        sources[file_id] = [original['source']] + [copy['source'] for copy in copied_thumbnails]
+    
+    delete_errors = delete_keys([key for keys in sources.values() for key in keys] + orphans)
+    
+    # Phase 3: metadata updates - restore status
+    updates = metadata_updates
+    for file_id, keys in sources.items():
+        if keys[0] in delete_errors:
+            logger.warning(f"Trash copy of {file_id} could not be removed: {delete_errors[keys[0]]}")
+        
+        updated_s3_paths = dict(items[file_id].get('s3_paths') or {})
+        updated_s3_paths['original'] = outcomes[file_id]['original']['dest']
+        # Keep thumbnail paths for consistency even when a trashed thumbnail was missing
+        restored_thumbnails = {size: f"{user_id}/thumbnails/{size}/{file_id}_{size[0]}.webp" for size in THUMBNAIL_SIZES}
+        
+        updates.append({
+            'file_id': file_id,
+            'Key': {'user_id': user_id, 'file_id': file_id},
+            'UpdateExpression': 'SET processing_status = :status, s3_key = :s3_key, s3_paths = :s3_paths, thumbnails = :thumbnails REMOVE trash_date, trash_shard',
+            'ExpressionAttributeValues': {
+                ':status': 'completed',
+                ':s3_key': updated_s3_paths['original'],
+                ':s3_paths': updated_s3_paths,
+                ':thumbnails': restored_thumbnails
+            }
+        })
+    
+    apply_updates(updates, results, 'restored')
+    return collect_results(file_ids, results, 'restore')
+
+def load_items(user_id: str, file_ids: List[str]) -> Dict[str, Dict]:
+    """Metadata for a selection: batch_get_item with 100 keys per request, requests in parallel"""
+    def load_group(group: List[str]) -> List[Dict]:
+        request = {TABLE_NAME: {'Keys': [{'user_id': user_id, 'file_id': file_id} for file_id in group]}}
+        loaded = []
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            response = dynamodb_client.batch_get_item(RequestItems=request)
+            loaded.extend(response['Responses'].get(TABLE_NAME, []))
+            request = response.get('UnprocessedKeys')
+            if not request:
+                return loaded
+            backoff(attempt)
+        raise RuntimeError(f"{len(request[TABLE_NAME]['Keys'])} metadata reads still unprocessed")
+    
+    groups = [file_ids[i:i + BATCH_GET_MAX_KEYS] for i in range(0, len(file_ids), BATCH_GET_MAX_KEYS)]
+    items = {}
+    for outcome in run_parallel(load_group, groups):
+        if isinstance(outcome, Exception):
+            raise outcome
+        items.update((item['file_id'], item) for item in outcome)
+    return items
+
+def run_parallel(func: Callable, tasks: List) -> List:
+    """Run func over tasks in the bounded pool; each result is the return value or the exception raised"""
+    def call(task):
         try:
-            # Get file metadata
-            response = table.get_item(
-                Key={'user_id': user_id, 'file_id': file_id}
-            )
-            
-            if 'Item' not in response:
-                results.append({'file_id': file_id, 'success': False, 'error': 'File not found'})
-                continue
-            
-            item = response['Item']
-            
-            # Check if file is actually in trash
-            if item.get('processing_status') != 'trashed':
-                results.append({'file_id': file_id, 'success': False, 'error': 'File not in trash'})
-                continue
-            
-            s3_paths = item.get('s3_paths', {})
-            trash_path = s3_paths.get('original', '')
-            
-            if not trash_path or '/trash/' not in trash_path:
-                results.append({'file_id': file_id, 'success': False, 'error': 'Invalid trash path'})
-                continue
-            
-            # Restore original file - reconstruct original path from file metadata
-            file_info = item.get('file_info', {})
-            year = file_info.get('year', datetime.now().year)
-            month = file_info.get('month', f"{datetime.now().month:02d}")
-            extension = file_info.get('extension', 'jpg')
-            
-            original_path = f"{user_id}/originals/{year}/{month}/{file_id}.{extension}"
-            
-            # Copy back to originals
-            s3_client.copy_object(
-                Bucket=BUCKET_NAME,
-                CopySource={'Bucket': BUCKET_NAME, 'Key': trash_path},
-                Key=original_path,
-                Metadata={
-                    'restored-date': datetime.utcnow().isoformat(),
-                    'user-id': user_id,
-                    'file-id': file_id
-                },
-                MetadataDirective='REPLACE'
-            )
-            
-            # Delete from trash
-            s3_client.delete_object(Bucket=BUCKET_NAME, Key=trash_path)
-            
-            # Restore thumbnails
-            restored_thumbnails = {}
-            for size in ['small', 'medium', 'large']:
-                trash_thumb_path = f"{user_id}/trash/thumbnails/{size}/{file_id}_{size[0]}.webp"
-                thumb_path = f"{user_id}/thumbnails/{size}/{file_id}_{size[0]}.webp"
-                
-                try:
-                    s3_client.copy_object(
-                        Bucket=BUCKET_NAME,
-                        CopySource={'Bucket': BUCKET_NAME, 'Key': trash_thumb_path},
-                        Key=thumb_path
-                    )
-                    s3_client.delete_object(Bucket=BUCKET_NAME, Key=trash_thumb_path)
-                    restored_thumbnails[size] = thumb_path
-                    logger.info(f"Restored thumbnail: {thumb_path}")
-                except Exception as thumb_error:
-                    logger.warning(f"Could not restore thumbnail {trash_thumb_path}: {str(thumb_error)}")
-                    restored_thumbnails[size] = thumb_path  # Keep path for consistency
-            
-            # Update metadata - restore status
-            updated_s3_paths = s3_paths.copy()
-            updated_s3_paths['original'] = original_path
-            
-            table.update_item(
-                Key={'user_id': user_id, 'file_id': file_id},
-                UpdateExpression='SET processing_status = :status, s3_paths = :s3_paths, thumbnails = :thumbnails REMOVE trash_date',
-                ExpressionAttributeValues={
-                    ':status': 'completed',
-                    ':s3_paths': updated_s3_paths,
-                    ':thumbnails': restored_thumbnails
-                }
-            )
-            
-            results.append({'file_id': file_id, 'success': True, 'action': 'restored'})
-            logger.info(f"Restored {file_id} from trash")
-            
+            return func(task)
         except Exception as e:
-            logger.error(f"Error restoring {file_id}: {str(e)}")
-            results.append({'file_id': file_id, 'success': False, 'error': str(e)})
+            return e
+    
+    if not tasks:
+        return []
+    with ThreadPoolExecutor(max_workers=min(S3_CONCURRENCY, len(tasks))) as pool:
+        return list(pool.map(call, tasks))
+
+def run_copies(copies: List[Dict]) -> Dict[str, Dict]:
+    """Run every copy task of a selection at once; outcomes grouped as {file_id: {role: outcome}}"""
+    outcomes = {}
+    for copy, outcome in zip(copies, run_parallel(lambda copy: copy['run'](copy), copies)):
+        outcomes.setdefault(copy['file_id'], {})[copy['role']] = outcome
+    return outcomes
+
+def copy_object(source: str, dest: str, metadata: Optional[Dict] = None) -> bool:
+    """Server-side copy within the bucket; False when the source does not exist"""
+    params = {
+        'Bucket': BUCKET_NAME,
+        'CopySource': {'Bucket': BUCKET_NAME, 'Key': source},
+        'Key': dest
+    }
+    if metadata is not None:
+        params.update(Metadata=metadata, MetadataDirective='REPLACE')
+    try:
+        s3_client.copy_object(**params)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404', 'NotFound'):
+            return False
+        raise
+
+def copy_if_exists(copy: Dict) -> Optional[Dict]:
+    """Copy task for optional objects (thumbnails): None when there is nothing to copy"""
+    return copy if copy_object(copy['source'], copy['dest'], copy.get('metadata')) else None
+
+def copy_required(copy: Dict) -> Dict:
+    if not copy_object(copy['source'], copy['dest'], copy.get('metadata')):
+        raise FileNotFoundError(f"File not found in S3: {copy['source']}")
+    return copy
+
+def delete_keys(keys: List[str]) -> Dict[str, str]:
+    """delete_objects in requests of up to 1,000 keys, in parallel; returns {key: error} for keys S3 refused"""
+    keys = list(dict.fromkeys(key for key in keys if key))
+    groups = [keys[i:i + DELETE_OBJECTS_MAX_KEYS] for i in range(0, len(keys), DELETE_OBJECTS_MAX_KEYS)]
+    
+    def delete_group(group: List[str]) -> Dict[str, str]:
+        response = s3_client.delete_objects(
+            Bucket=BUCKET_NAME,
+            Delete={'Objects': [{'Key': key} for key in group], 'Quiet': True}
+        )
+        return {error['Key']: error.get('Message', error.get('Code', 'unknown error')) for error in response.get('Errors', [])}
+    
+    errors = {}
+    for group, outcome in zip(groups, run_parallel(delete_group, groups)):
+        if isinstance(outcome, Exception):
+            errors.update((key, str(outcome)) for key in group)
+        else:
+            errors.update(outcome)
+    return errors
+
+def delete_items(user_id: str, file_ids: List[str]) -> Dict[str, str]:
+    """batch_write_item deletes, 25 per request in parallel; returns {file_id: error} for items left undeleted"""
+    def delete_group(group: List[str]) -> List[str]:
+        request = {TABLE_NAME: [{'DeleteRequest': {'Key': {'user_id': user_id, 'file_id': file_id}}} for file_id in group]}
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            response = dynamodb_client.batch_write_item(RequestItems=request)
+            request = response.get('UnprocessedItems')
+            if not request:
+                return []
+            backoff(attempt)
+        return [entry['DeleteRequest']['Key']['file_id'] for entry in request[TABLE_NAME]]
+    
+    groups = [file_ids[i:i + BATCH_WRITE_MAX_ITEMS] for i in range(0, len(file_ids), BATCH_WRITE_MAX_ITEMS)]
+    errors = {}
+    for group, outcome in zip(groups, run_parallel(delete_group, groups)):
+        if isinstance(outcome, Exception):
+            errors.update((file_id, str(outcome)) for file_id in group)
+        else:
+            errors.update((file_id, 'Metadata delete still unprocessed after retries') for file_id in outcome)
+    return errors
+
+def apply_updates(updates: List[Dict], results: Dict[str, Dict], action: str):
+    """Metadata phase: one UpdateItem per file, issued concurrently (DynamoDB has no batch update)"""
+    def update(params: Dict):
+        params = dict(params)
+        params.pop('file_id')
+        params.pop('condition_error', None)
+        dynamodb_client.update_item(TableName=TABLE_NAME, **params)
     
-    return results
+    for params, outcome in zip(updates, run_parallel(update, updates)):
+        file_id = params['file_id']
+        if (isinstance(outcome, ClientError) and params.get('condition_error')
+                and outcome.response['Error']['Code'] == 'ConditionalCheckFailedException'):
+            results[file_id] = {'file_id': file_id, 'success': False, 'error': params['condition_error']}
+        elif isinstance(outcome, Exception):
+            results[file_id] = {'file_id': file_id, 'success': False, 'error': str(outcome)}
+        else:
+            results[file_id] = {'file_id': file_id, 'success': True, 'action': action}
+
+def collect_results(file_ids: List[str], results: Dict[str, Dict], operation: str) -> List[Dict]:
+    """Per-file results in request order, with one summary log line for the operation"""
+    ordered = [results[file_id] for file_id in file_ids]
+    succeeded = sum(1 for result in ordered if result['success'])
+    logger.info(f"Bulk {operation}: {succeeded}/{len(ordered)} files succeeded")
+    return ordered
+
+def emit_metrics(metrics: Dict[str, float], units: Optional[Dict[str, str]] = None, **dimensions):
+    """Write one CloudWatch embedded metric format record; CloudWatch turns it into metrics"""
+    units = units or {}
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [sorted(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': units.get(name, 'Count')} for name in metrics]
+            }]
+        },
+        **dimensions,
+        **metrics
+    }
+    # print, not logger: the runtime's log prefix would stop CloudWatch from parsing the JSON
+    print(json.dumps(record, cls=DecimalEncoder))
+
+def backoff(attempt: int):
+    """Exponential backoff with full jitter between retries of unprocessed batch items"""
+    time.sleep(random.uniform(0, min(2.0, 0.05 * 2 ** attempt)))
 
 def list_trash_items(user_id: str) -> List[Dict]:
     """List all items in trash for user - Google Photos style"""
     try:
-        # Query all user items and filter trashed ones
-        response = table.query(
-            KeyConditionExpression=Key('user_id').eq(user_id)
-        )
-        
-        items = response.get('Items', [])
+        # TrashIndex only holds items with a trash_date, i.e. the user's trash
+        items = query_trash_index(user_id)
         trash_items = []
         
         for item in items:
@@ -561,9 +805,7 @@ def list_trash_items(user_id: str) -> List[Dict]:
                 }
                 trash_items.append(trash_item)
         
-        # Sort by trash date (newest first)
-        trash_items.sort(key=lambda x: x.get('trash_date', ''), reverse=True)
-        
+        # Already newest first (TrashIndex is queried in descending trash_date order)
         return {
             'items': trash_items,
             'count': len(trash_items),
@@ -577,3 +819,150 @@ def list_trash_items(user_id: str) -> List[Dict]:
             'count': 0,
             'error': str(e)
         }
+
+def query_trash_index(user_id: str) -> List[Dict]:
+    """Every trashed item of a user, newest first, following LastEvaluatedKey"""
+    params = {
+        'IndexName': TRASH_INDEX,
+        'KeyConditionExpression': Key('user_id').eq(user_id),
+        'ScanIndexForward': False
+    }
+    items = []
+    while True:
+        response = table.query(**params)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+class RateLimiter:
+    """Token bucket shared by the purge's shard workers; a batch may borrow ahead and then waits it off"""
+
+    def __init__(self, rate_per_second: float):
+        self.rate = max(rate_per_second, 0.1)
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, count: int = 1):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= count
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+def purge_handler(event, context):
+    """
+    Scheduled purge of trash older than TRASH_RETENTION_DAYS (EventBridge rule, not API Gateway)
+    Walks TrashExpiryIndex shard by shard, several shards at a time, and checkpoints every page
+    so a run that runs out of time resumes where it stopped on the next schedule.
+    """
+    try:
+        cutoff = (datetime.utcnow() - timedelta(days=TRASH_RETENTION_DAYS)).isoformat()
+        limiter = RateLimiter(PURGE_MAX_DELETES_PER_SECOND)
+        
+        with ThreadPoolExecutor(max_workers=PURGE_SHARD_CONCURRENCY) as pool:
+            shards = list(pool.map(
+                lambda shard: purge_shard(str(shard), cutoff, limiter, context),
+                range(TRASH_SHARDS)
+            ))
+        
+        summary = {
+            'cutoff': cutoff,
+            'status': 'completed' if all(shard['done'] for shard in shards) else 'in_progress',
+            'purged': sum(shard['purged'] for shard in shards),
+            'failed': sum(shard['failed'] for shard in shards),
+            'reclaimed_bytes': sum(shard['reclaimed_bytes'] for shard in shards)
+        }
+        emit_metrics(
+            {'PurgedFiles': summary['purged'], 'PurgeFailures': summary['failed'], 'ReclaimedBytes': summary['reclaimed_bytes']},
+            units={'ReclaimedBytes': 'Bytes'},
+            Operation='purge'
+        )
+        logger.info(f"Trash purge {summary['status']}: purged={summary['purged']}, failed={summary['failed']}, "
+                    f"reclaimed_bytes={summary['reclaimed_bytes']}")
+        
+        return {'statusCode': 200, 'body': json.dumps(summary)}
+        
+    except Exception as e:
+        logger.error(f"Error in trash purge: {str(e)}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+
+def purge_shard(shard: str, cutoff: str, limiter: RateLimiter, context) -> Dict[str, Any]:
+    """Purge one TrashExpiryIndex partition from its checkpoint until it is exhausted or time runs out"""
+    stats = {'shard': shard, 'done': False, 'purged': 0, 'failed': 0, 'reclaimed_bytes': 0}
+    last_key = load_purge_checkpoint(shard)
+    
+    while context.get_remaining_time_in_millis() > PURGE_TIME_BUFFER_MS:
+        params = {
+            'TableName': TABLE_NAME,
+            'IndexName': TRASH_EXPIRY_INDEX,
+            'KeyConditionExpression': 'trash_shard = :shard AND trash_date < :cutoff',
+            'ExpressionAttributeValues': {':shard': shard, ':cutoff': cutoff},
+            'Limit': PURGE_PAGE_SIZE
+        }
+        if last_key:
+            params['ExclusiveStartKey'] = last_key
+        response = dynamodb_client.query(**params)
+        
+        # The index is keys-only; each user's expired files go through the bulk delete engine together
+        by_user = {}
+        for key in response.get('Items', []):
+            by_user.setdefault(key['user_id'], []).append(key['file_id'])
+        for user_id, file_ids in by_user.items():
+            limiter.acquire(len(file_ids))
+            purged, failed, reclaimed = purge_expired(user_id, file_ids, cutoff)
+            stats['purged'] += purged
+            stats['failed'] += failed
+            stats['reclaimed_bytes'] += reclaimed
+        
+        last_key = response.get('LastEvaluatedKey')
+        save_purge_checkpoint(shard, last_key)
+        if not last_key:
+            # The next run starts over: only expired files that failed to purge are left behind
+            stats['done'] = True
+            return stats
+    
+    logger.info(f"Purge of trash shard {shard} paused for time: {stats}")
+    return stats
+
+def purge_expired(user_id: str, file_ids: List[str], cutoff: str) -> tuple:
+    """Permanently delete the files that are still trashed and expired; (purged, failed, reclaimed bytes)"""
+    items = load_items(user_id, file_ids)
+    # The index is eventually consistent: skip files restored (or re-trashed) since it was read
+    expired = [item for item in items.values()
+               if item.get('processing_status') == 'trashed' and item.get('trash_date', cutoff) < cutoff]
+    
+    results = {}
+    delete_files(user_id, expired, results)
+    purged = [item for item in expired if results[item['file_id']]['success']]
+    for item in expired:
+        if not results[item['file_id']]['success']:
+            logger.warning(f"Could not purge {user_id}/{item['file_id']}: {results[item['file_id']]['error']}")
+    
+    return len(purged), len(expired) - len(purged), int(sum(item.get('file_size', 0) for item in purged))
+
+def purge_checkpoint_id(shard: str) -> str:
+    return f"media-trash-purge#{TRASH_SHARDS}#{shard}"
+
+def load_purge_checkpoint(shard: str) -> Optional[Dict]:
+    response = dynamodb_client.get_item(
+        TableName=CHECKPOINT_TABLE_NAME,
+        Key={'id': purge_checkpoint_id(shard)},
+        ConsistentRead=True
+    )
+    last_key = response.get('Item', {}).get('last_evaluated_key')
+    return json.loads(last_key) if last_key else None
+
+def save_purge_checkpoint(shard: str, last_key: Optional[Dict]):
+    dynamodb_client.put_item(
+        TableName=CHECKPOINT_TABLE_NAME,
+        Item={
+            'id': purge_checkpoint_id(shard),
+            'last_evaluated_key': json.dumps(last_key, cls=DecimalEncoder) if last_key else None,
+            'updated_at': datetime.utcnow().isoformat()
+        }
+    )
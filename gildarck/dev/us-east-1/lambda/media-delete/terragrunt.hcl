@@ -57,6 +57,8 @@ inputs = {
       effect = "Allow"
       actions = [
         "dynamodb:GetItem",
+        "dynamodb:BatchGetItem",
+        "dynamodb:BatchWriteItem",
         "dynamodb:UpdateItem",
         "dynamodb:DeleteItem",
         "dynamodb:Query",
@@ -70,9 +72,12 @@ inputs = {
   }
   
   environment_variables = {
-    BUCKET_NAME = "gildarck-media-dev"
-    TABLE_NAME  = "gildarck-media-metadata-dev"
-    REGION      = "us-east-1"
+    BUCKET_NAME       = "gildarck-media-dev"
+    TABLE_NAME        = "gildarck-media-metadata-dev"
+    REGION            = "us-east-1"
+    S3_CONCURRENCY    = "32"
+    TRASH_MODE        = "metadata"
+    METRICS_NAMESPACE = "Gildarck/Media"
   }
 
   tags = local.tags
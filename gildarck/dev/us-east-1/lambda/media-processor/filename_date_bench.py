@@ -0,0 +1,93 @@
+"""
+Micro-benchmark for parse_filename_date over filename_date_corpus.tsv.
+
+Checks every corpus name against its expected date first (exit status 1 on a mismatch), then
+times the single-pass matcher against the previous seven-regex loop.
+
+    python filename_date_bench.py [--passes 2000] [--repeat 5]
+
+Needs boto3 (index.py creates its clients at import); not bundled into lambda.zip.
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.join(HERE, '..', 'shared')]
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+from index import parse_filename_date
+
+CORPUS_PATH = os.path.join(HERE, 'filename_date_corpus.tsv')
+
+LEGACY_DATE_PATTERNS = [
+    r'IMG_(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})',
+    r'(\d{4})-(\d{2})-(\d{2})[T_\s](\d{2})[:-](\d{2})[:-](\d{2})',
+    r'(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})',
+    r'IMG_(\d{4})(\d{2})(\d{2})',
+    r'(\d{4})-(\d{2})-(\d{2})',
+    r'(\d{4})(\d{2})(\d{2})',
+    r'Screenshot.*(\d{4})-(\d{2})-(\d{2})',
+]
+
+def legacy_parse_filename_date(filename):
+    """The filename fallback of extract_exif_date before the patterns were merged"""
+    for pattern in LEGACY_DATE_PATTERNS:
+        match = re.search(pattern, filename)
+        if match:
+            groups = match.groups()
+            try:
+                if len(groups) >= 6:
+                    year, month, day, hour, minute, second = map(int, groups[:6])
+                    extracted_date = datetime(year, month, day, hour, minute, second)
+                else:
+                    year, month, day = map(int, groups[:3])
+                    extracted_date = datetime(year, month, day)
+                if 2000 <= year <= 2030 and 1 <= month <= 12 and 1 <= day <= 31:
+                    return extracted_date
+            except ValueError:
+                continue
+    return None
+
+def load_corpus():
+    """(filename, expected datetime or None) pairs"""
+    corpus = []
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            filename, expected = line.split('\t')
+            corpus.append((filename, None if expected == '-' else datetime.fromisoformat(expected)))
+    return corpus
+
+def names_per_second(parse, names, passes, repeat):
+    best = min(timeit.repeat(lambda: [parse(name) for name in names], number=passes, repeat=repeat))
+    return passes * len(names) / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--passes', type=int, default=2000, help='passes over the corpus per timing run')
+    parser.add_argument('--repeat', type=int, default=5, help='timing runs; the best one is reported')
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    wrong = [(name, expected, parse_filename_date(name)) for name, expected in corpus
+             if parse_filename_date(name) != expected]
+    for name, expected, actual in wrong:
+        print(f"MISMATCH {name!r}: expected {expected}, got {actual}")
+    legacy_differs = sum(legacy_parse_filename_date(name) != expected for name, expected in corpus)
+
+    names = [name for name, _ in corpus]
+    legacy = names_per_second(legacy_parse_filename_date, names, args.passes, args.repeat)
+    current = names_per_second(parse_filename_date, names, args.passes, args.repeat)
+    print(f"{len(corpus)} names, Python {sys.version.split()[0]}, best of {args.repeat} x {args.passes} passes")
+    print(f"   legacy: {legacy:,.0f} names/s, {legacy_differs} of {len(corpus)} differ from the corpus")
+    print(f"  current: {current:,.0f} names/s ({current / legacy:.1f}x)")
+    return 1 if wrong else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,20 @@
 import json
+import os
+import base64
 import boto3
+from botocore.exceptions import ClientError
 import hashlib
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from urllib.parse import unquote_plus
 from decimal import Decimal
 import re
+import struct
+from structured_logging import current_request, get_logger, logged_handler
+
+# Structured JSON logging (bundled structured_logging.py): one summary line per event
+logger = get_logger(__name__)
 
 s3 = boto3.client('s3')
 dynamodb = boto3.resource('dynamodb')
@@ -14,12 +23,461 @@ sqs = boto3.client('sqs')
 
 # Environment variables
 SQS_QUEUE_URL = 'https://sqs.us-east-1.amazonaws.com/496860676881/gildarck-thumbnail-queue'
+USE_S3_CHECKSUMS = os.environ.get('USE_S3_CHECKSUMS', 'true').lower() == 'true'
+HASH_CHUNK_SIZE = int(os.environ.get('HASH_CHUNK_SIZE', str(8 * 1024 * 1024)))
+
+# Upload progress: upload-handler-v2 maps every issued key to its batch ('key#<s3_key>' items)
+BATCH_TABLE_NAME = os.environ.get('BATCH_TABLE_NAME', 'gildarck-batch-uploads-dev')
+UPLOAD_INDEX_PREFIX = 'key#'
+
+# Per-user dedup index (user_id#file_hash -> file_id) that upload-handler-v2 batch-reads
+FILE_HASH_TABLE = os.environ.get('FILE_HASH_TABLE', 'gildarck-media-hashes-dev')
+
+# Objects above the threshold are copied with parallel UploadPartCopy (CopyObject stops at 5 GB)
+MULTIPART_COPY_THRESHOLD = int(os.environ.get('MULTIPART_COPY_THRESHOLD', str(512 * 1024 * 1024)))
+MULTIPART_COPY_PART_SIZE = int(os.environ.get('MULTIPART_COPY_PART_SIZE', str(256 * 1024 * 1024)))
+MULTIPART_COPY_CONCURRENCY = int(os.environ.get('MULTIPART_COPY_CONCURRENCY', '8'))
+MAX_MULTIPART_PARTS = 10000
+
+# Embedded metadata (EXIF / HEIF / QuickTime) is read with ranged GETs, never the whole object
+METADATA_PROBE_BYTES = int(os.environ.get('METADATA_PROBE_BYTES', str(256 * 1024)))
+MAX_METADATA_BOX_BYTES = 4 * 1024 * 1024
+QUICKTIME_EPOCH = datetime(1904, 1, 1)
+ISO6709_PATTERN = re.compile(r'^([+-]\d+(?:\.\d+)?)([+-]\d+(?:\.\d+)?)')
+HEIF_BRANDS = {b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1', b'avif'}
+
+# TIFF field type -> size in bytes
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8, 11: 4, 12: 8}
+
+# EXIF tags we keep
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_EXPOSURE_TIME = 0x829A
+TAG_F_NUMBER = 0x829D
+TAG_ISO = 0x8827
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME_DIGITIZED = 0x9004
+TAG_FOCAL_LENGTH = 0x920A
+TAG_LENS_MODEL = 0xA434
+
+class RangeReader:
+    """Serves byte ranges of an S3 object from a prefetched probe, fetching more only when needed"""
+    
+    def __init__(self, bucket, key, size):
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self.probe = self.fetch(0, min(METADATA_PROBE_BYTES, size))
+    
+    def fetch(self, start, length):
+        end = min(start + length, self.size) - 1
+        if end < start:
+            return b''
+        response = s3.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{end}")
+        return response['Body'].read()
+    
+    def read(self, start, length):
+        if start + length <= len(self.probe):
+            return self.probe[start:start + length]
+        return self.fetch(start, length)
 
-def extract_exif_date(bucket, key):
-    """Extract date from EXIF data and filename patterns"""
+def read_embedded_metadata(bucket, key, head):
+    """Capture date, camera and GPS from the file's own metadata, using only ranged reads"""
     try:
-        # Get object metadata first
-        response = s3.head_object(Bucket=bucket, Key=key)
+        size = head['ContentLength']
+        if size < 16:
+            return {}
+        
+        reader = RangeReader(bucket, key, size)
+        probe = reader.probe
+        
+        if probe[:2] == b'\xff\xd8':
+            return parse_jpeg_metadata(reader)
+        if probe[:4] in (b'II*\x00', b'MM\x00*'):
+            return parse_tiff_metadata(probe, 0)
+        if probe[4:8] == b'ftyp':
+            if probe[8:12] in HEIF_BRANDS:
+                return parse_heif_metadata(reader)
+            return parse_quicktime_metadata(reader)
+        return {}
+        
+    except Exception as e:
+        logger.warning("Error reading embedded metadata", key=key, error=str(e))
+        return {}
+
+def parse_jpeg_metadata(reader):
+    """Walk JPEG markers up to the first APP1/Exif segment"""
+    data = reader.probe
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return {}
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0xDA or marker == 0xD9:  # Start of scan / end of image: no more metadata
+            return {}
+        segment_length = int.from_bytes(data[pos + 2:pos + 4], 'big')
+        if marker == 0xE1:
+            segment = reader.read(pos + 4, segment_length - 2)
+            if segment[:6] == b'Exif\x00\x00':
+                return parse_tiff_metadata(segment, 6)
+        pos += 2 + segment_length
+    return {}
+
+def read_ifd(data, base, offset, endian):
+    """Read one TIFF IFD into {tag: value}; tags pointing outside the buffer are skipped"""
+    entries = {}
+    start = base + offset
+    if offset <= 0 or start + 2 > len(data):
+        return entries
+    count = int.from_bytes(data[start:start + 2], endian)
+    for i in range(count):
+        entry = start + 2 + i * 12
+        if entry + 12 > len(data):
+            break
+        tag = int.from_bytes(data[entry:entry + 2], endian)
+        field_type = int.from_bytes(data[entry + 2:entry + 4], endian)
+        value_count = int.from_bytes(data[entry + 4:entry + 8], endian)
+        type_size = TIFF_TYPE_SIZES.get(field_type)
+        if not type_size:
+            continue
+        total = type_size * value_count
+        value_pos = entry + 8 if total <= 4 else base + int.from_bytes(data[entry + 8:entry + 12], endian)
+        raw = data[value_pos:value_pos + total]
+        if len(raw) < total:
+            continue
+        
+        if field_type == 2:
+            value = raw.split(b'\x00', 1)[0].decode('utf-8', 'ignore').strip()
+        elif field_type in (5, 10):
+            signed = field_type == 10
+            value = []
+            for j in range(value_count):
+                numerator = int.from_bytes(raw[j * 8:j * 8 + 4], endian, signed=signed)
+                denominator = int.from_bytes(raw[j * 8 + 4:j * 8 + 8], endian, signed=signed)
+                value.append(numerator / denominator if denominator else 0.0)
+        elif field_type in (11, 12):
+            value = list(struct.unpack(('<' if endian == 'little' else '>') + ('f' if field_type == 11 else 'd') * value_count, raw))
+        elif field_type in (3, 4, 9):
+            value = [int.from_bytes(raw[j * type_size:(j + 1) * type_size], endian, signed=field_type == 9)
+                     for j in range(value_count)]
+        else:
+            value = raw
+        
+        if isinstance(value, list) and len(value) == 1:
+            value = value[0]
+        entries[tag] = value
+    return entries
+
+def parse_exif_datetime(value):
+    """EXIF dates look like 'YYYY:MM:DD HH:MM:SS'; placeholders such as '0000:00:00' are ignored"""
+    if not isinstance(value, str) or len(value) < 19:
+        return None
+    try:
+        return datetime.strptime(value[:19], '%Y:%m:%d %H:%M:%S')
+    except ValueError:
+        return None
+
+def gps_to_decimal(dms, ref):
+    if not isinstance(dms, list) or len(dms) != 3:
+        return None
+    degrees = dms[0] + dms[1] / 60 + dms[2] / 3600
+    return -degrees if ref in ('S', 'W') else degrees
+
+def parse_tiff_metadata(data, base):
+    """Parse a TIFF/EXIF block starting at `base` into capture date, camera and GPS"""
+    byte_order = data[base:base + 2]
+    if byte_order == b'II':
+        endian = 'little'
+    elif byte_order == b'MM':
+        endian = 'big'
+    else:
+        return {}
+    
+    ifd0 = read_ifd(data, base, int.from_bytes(data[base + 4:base + 8], endian), endian)
+    exif = read_ifd(data, base, ifd0[TAG_EXIF_IFD], endian) if isinstance(ifd0.get(TAG_EXIF_IFD), int) else {}
+    gps = read_ifd(data, base, ifd0[TAG_GPS_IFD], endian) if isinstance(ifd0.get(TAG_GPS_IFD), int) else {}
+    
+    result = {}
+    
+    capture_date = (parse_exif_datetime(exif.get(TAG_DATETIME_ORIGINAL))
+                    or parse_exif_datetime(exif.get(TAG_DATETIME_DIGITIZED))
+                    or parse_exif_datetime(ifd0.get(TAG_DATETIME)))
+    if capture_date:
+        result['capture_date'] = capture_date
+    
+    settings = {
+        'exposure_time': exif.get(TAG_EXPOSURE_TIME),
+        'f_number': exif.get(TAG_F_NUMBER),
+        'iso': exif.get(TAG_ISO),
+        'focal_length': exif.get(TAG_FOCAL_LENGTH),
+        'lens_model': exif.get(TAG_LENS_MODEL)
+    }
+    camera = {
+        'make': ifd0.get(TAG_MAKE) or None,
+        'model': ifd0.get(TAG_MODEL) or None,
+        'settings': {k: v for k, v in settings.items() if isinstance(v, (str, int, float)) and v != ''}
+    }
+    if camera['make'] or camera['model'] or camera['settings']:
+        result['camera'] = camera
+    
+    latitude = gps_to_decimal(gps.get(2), gps.get(1))
+    longitude = gps_to_decimal(gps.get(4), gps.get(3))
+    if latitude is not None and longitude is not None and (latitude or longitude):
+        result['gps'] = (latitude, longitude)
+    
+    return result
+
+def iter_boxes(data, start=0, end=None):
+    """Yield (type, payload_start, box_end) for ISOBMFF boxes laid out in data[start:end]"""
+    end = len(data) if end is None else min(end, len(data))
+    pos = start
+    while pos + 8 <= end:
+        size = int.from_bytes(data[pos:pos + 4], 'big')
+        box_type = data[pos + 4:pos + 8]
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = int.from_bytes(data[pos + 8:pos + 16], 'big')
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield box_type, pos + header, pos + size
+        pos += size
+
+def find_top_level_box(reader, box_type):
+    """Locate a top-level box by hopping over box headers with small ranged reads"""
+    pos = 0
+    while pos + 8 <= reader.size:
+        header = reader.read(pos, 16)
+        if len(header) < 8:
+            return None
+        size = int.from_bytes(header[:4], 'big')
+        current_type = header[4:8]
+        header_size = 8
+        if size == 1:
+            size = int.from_bytes(header[8:16], 'big')
+            header_size = 16
+        elif size == 0:
+            size = reader.size - pos
+        if size < header_size:
+            return None
+        if current_type == box_type:
+            return pos, header_size, size
+        pos += size
+    return None
+
+def parse_heif_metadata(reader):
+    """HEIC/HEIF keep EXIF as an item: find it through meta/iinf + iloc and parse the TIFF block"""
+    location = find_top_level_box(reader, b'meta')
+    if not location:
+        return {}
+    pos, header_size, size = location
+    meta = reader.read(pos, min(size, MAX_METADATA_BOX_BYTES))
+    
+    exif_item_id = None
+    extents = {}
+    idat_start = None
+    # meta is a full box: skip version/flags
+    for box_type, payload, box_end in iter_boxes(meta, header_size + 4, len(meta)):
+        if box_type == b'iinf':
+            version = meta[payload]
+            entries_start = payload + 4 + (2 if version == 0 else 4)
+            for entry_type, entry_payload, _ in iter_boxes(meta, entries_start, box_end):
+                if entry_type != b'infe' or meta[entry_payload] < 2:
+                    continue
+                id_size = 2 if meta[entry_payload] == 2 else 4
+                item_id = int.from_bytes(meta[entry_payload + 4:entry_payload + 4 + id_size], 'big')
+                item_type = meta[entry_payload + 4 + id_size + 2:entry_payload + 4 + id_size + 6]
+                if item_type == b'Exif':
+                    exif_item_id = item_id
+        elif box_type == b'iloc':
+            extents = parse_iloc(meta, payload)
+        elif box_type == b'idat':
+            idat_start = pos + payload
+    
+    if exif_item_id is None or exif_item_id not in extents:
+        return {}
+    
+    construction_method, offset, length = extents[exif_item_id]
+    if construction_method == 1:
+        if idat_start is None:
+            return {}
+        offset += idat_start
+    elif construction_method != 0:
+        return {}
+    
+    item = reader.read(offset, min(length, MAX_METADATA_BOX_BYTES))
+    if len(item) < 4:
+        return {}
+    # Exif item payload: 4-byte offset to the TIFF header (after the "Exif\0\0" marker)
+    return parse_tiff_metadata(item, 4 + int.from_bytes(item[:4], 'big'))
+
+def parse_iloc(data, payload):
+    """Map item_id -> (construction_method, offset, length) for single-extent items"""
+    version = data[payload]
+    pos = payload + 4
+    offset_size = data[pos] >> 4
+    length_size = data[pos] & 0x0F
+    base_offset_size = data[pos + 1] >> 4
+    index_size = data[pos + 1] & 0x0F if version in (1, 2) else 0
+    pos += 2
+    
+    def read_uint(size):
+        nonlocal pos
+        value = int.from_bytes(data[pos:pos + size], 'big') if size else 0
+        pos += size
+        return value
+    
+    item_count = read_uint(2 if version < 2 else 4)
+    items = {}
+    for _ in range(item_count):
+        item_id = read_uint(2 if version < 2 else 4)
+        construction_method = read_uint(2) & 0x0F if version in (1, 2) else 0
+        read_uint(2)  # data_reference_index
+        base_offset = read_uint(base_offset_size)
+        extent_count = read_uint(2)
+        for extent in range(extent_count):
+            read_uint(index_size)
+            extent_offset = read_uint(offset_size)
+            extent_length = read_uint(length_size)
+            if extent == 0:
+                items[item_id] = (construction_method, base_offset + extent_offset, extent_length)
+    return items
+
+def parse_iso6709(value):
+    """Parse '+40.7128-074.0060+010.0/' style location strings"""
+    match = ISO6709_PATTERN.match(value or '')
+    if not match:
+        return None
+    return float(match.group(1)), float(match.group(2))
+
+
+def parse_quicktime_metadata(reader):
+    """MP4/MOV: creation time from moov/mvhd, make/model/location from udta and Apple mdta keys"""
+    location = find_top_level_box(reader, b'moov')
+    if not location:
+        return {}
+    pos, header_size, size = location
+    # mvhd comes first in moov, so an oversized moov is only read partially
+    moov = reader.read(pos, size if size <= MAX_METADATA_BOX_BYTES else METADATA_PROBE_BYTES)
+    
+    result = {}
+    camera = {}
+    for box_type, payload, box_end in iter_boxes(moov, header_size):
+        if box_type == b'mvhd':
+            version = moov[payload]
+            if version == 1:
+                seconds = int.from_bytes(moov[payload + 4:payload + 12], 'big')
+            else:
+                seconds = int.from_bytes(moov[payload + 4:payload + 8], 'big')
+            if seconds:
+                result['capture_date'] = QUICKTIME_EPOCH + timedelta(seconds=seconds)
+        elif box_type == b'udta':
+            for child_type, child_payload, child_end in iter_boxes(moov, payload, box_end):
+                if child_type == b'\xa9xyz':
+                    # 2-byte length + 2-byte language, then the ISO 6709 string
+                    gps = parse_iso6709(moov[child_payload + 4:child_end].decode('utf-8', 'ignore'))
+                    if gps:
+                        result['gps'] = gps
+                elif child_type == b'meta':
+                    apply_mdta_metadata(read_mdta_items(moov, child_payload + 4, child_end), result, camera)
+        elif box_type == b'meta':
+            apply_mdta_metadata(read_mdta_items(moov, payload, box_end), result, camera)
+    
+    if camera:
+        result['camera'] = {'make': camera.get('make'), 'model': camera.get('model'), 'settings': {}}
+    return result
+
+def read_mdta_items(data, start, end):
+    """Decode Apple 'mdta' metadata (keys + ilst) into {key_name: string value}"""
+    keys = []
+    values = {}
+    for box_type, payload, box_end in iter_boxes(data, start, end):
+        if box_type == b'keys':
+            for key_type, key_payload, key_end in iter_boxes(data, payload + 8, box_end):
+                keys.append(data[key_payload:key_end].decode('utf-8', 'ignore'))
+        elif box_type == b'ilst':
+            for index_type, index_payload, index_end in iter_boxes(data, payload, box_end):
+                key_index = int.from_bytes(index_type, 'big')
+                for data_type, data_payload, data_end in iter_boxes(data, index_payload, index_end):
+                    # data box: 4-byte type indicator + 4-byte locale, then the value (type 1 = UTF-8)
+                    if data_type == b'data' and int.from_bytes(data[data_payload:data_payload + 4], 'big') == 1:
+                        values[key_index] = data[data_payload + 8:data_end].decode('utf-8', 'ignore')
+    return {keys[index - 1]: value for index, value in values.items() if 0 < index <= len(keys)}
+
+def apply_mdta_metadata(items, result, camera):
+    if items.get('com.apple.quicktime.make'):
+        camera['make'] = items['com.apple.quicktime.make']
+    if items.get('com.apple.quicktime.model'):
+        camera['model'] = items['com.apple.quicktime.model']
+    gps = parse_iso6709(items.get('com.apple.quicktime.location.ISO6709'))
+    if gps:
+        result['gps'] = gps
+    creation_date = items.get('com.apple.quicktime.creationdate')
+    if creation_date:
+        try:
+            # Local wall-clock time, like EXIF DateTimeOriginal
+            result['capture_date'] = datetime.strptime(creation_date[:19], '%Y-%m-%dT%H:%M:%S')
+        except ValueError:
+            pass
+
+# Common camera/phone filename dates in one pass: IMG_YYYYMMDD_HHMMSS, YYYYMMDD_HHMMSS,
+# YYYY-MM-DD HH:MM:SS (T/_/space, : or -), YYYY-MM-DD, YYYYMMDD, "Screenshot ... YYYY-MM-DD"
+FILENAME_DATE_PATTERN = re.compile(
+    r'(?P<dashed>(?P<dy>\d{4})-(?P<dmo>\d{2})-(?P<dd>\d{2})'
+    r'(?:[T_\s](?P<dh>\d{2})[:-](?P<dmi>\d{2})[:-](?P<ds>\d{2}))?)'
+    r'|(?P<compact>(?P<cy>\d{4})(?P<cmo>\d{2})(?P<cd>\d{2})'
+    r'(?:_(?P<ch>\d{2})(?P<cmi>\d{2})(?P<cs>\d{2}))?)'
+)
+FILENAME_DATE_GROUPS = {
+    'dashed': ('dy', 'dmo', 'dd', 'dh', 'dmi', 'ds'),
+    'compact': ('cy', 'cmo', 'cd', 'ch', 'cmi', 'cs')
+}
+FILENAME_MIN_YEAR = 2000
+FILENAME_MAX_YEAR = 2030
+DAYS_IN_MONTH = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+def parse_filename_date(filename):
+    """Date from a filename; a full date-time anywhere in the name wins over a date-only match"""
+    date_only = None
+    for match in FILENAME_DATE_PATTERN.finditer(filename):
+        year_group, month_group, day_group, hour_group, minute_group, second_group = FILENAME_DATE_GROUPS[match.lastgroup]
+        year = int(match.group(year_group))
+        month = int(match.group(month_group))
+        day = int(match.group(day_group))
+        
+        # Validate without raising: datetime() is only built for values known to be valid
+        if not (FILENAME_MIN_YEAR <= year <= FILENAME_MAX_YEAR and 1 <= month <= 12 and 1 <= day <= DAYS_IN_MONTH[month]):
+            continue
+        if month == 2 and day == 29 and not (year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)):
+            continue
+        
+        if match.group(hour_group) is not None:
+            hour = int(match.group(hour_group))
+            minute = int(match.group(minute_group))
+            second = int(match.group(second_group))
+            if hour < 24 and minute < 60 and second < 60:
+                return datetime(year, month, day, hour, minute, second)
+        
+        if date_only is None:
+            date_only = (year, month, day)
+    
+    return datetime(*date_only) if date_only else None
+
+def extract_exif_date(bucket, key, head=None, embedded=None):
+    """Extract date from S3 metadata, embedded EXIF/QuickTime metadata and filename patterns"""
+    try:
+        # Get object metadata first (reuse the caller's HEAD when it has one)
+        response = head or s3.head_object(Bucket=bucket, Key=key)
         
         # Check if we can get creation date from S3 metadata
         if 'Metadata' in response:
@@ -27,77 +485,61 @@ def extract_exif_date(bucket, key):
             if 'creation-date' in metadata:
                 return datetime.fromisoformat(metadata['creation-date'])
         
+        # Capture date recorded by the camera itself
+        if embedded is None:
+            embedded = read_embedded_metadata(bucket, key, response)
+        if embedded.get('capture_date'):
+            current_request().set(date_source='embedded')
+            return embedded['capture_date']
+        
         # Try to extract date from filename patterns (common camera formats)
         filename = key.split('/')[-1]
+        extracted_date = parse_filename_date(filename)
+        if extracted_date:
+            current_request().set(date_source='filename')
+            return extracted_date
         
-        # Enhanced date patterns for common camera/phone formats
-        date_patterns = [
-            r'IMG_(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})',  # IMG_YYYYMMDD_HHMMSS
-            r'(\d{4})-(\d{2})-(\d{2})[T_\s](\d{2})[:-](\d{2})[:-](\d{2})',  # YYYY-MM-DD HH:MM:SS
-            r'(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})',      # YYYYMMDD_HHMMSS
-            r'IMG_(\d{4})(\d{2})(\d{2})',                        # IMG_YYYYMMDD
-            r'(\d{4})-(\d{2})-(\d{2})',                          # YYYY-MM-DD
-            r'(\d{4})(\d{2})(\d{2})',                            # YYYYMMDD
-            r'Screenshot.*(\d{4})-(\d{2})-(\d{2})',              # Screenshot YYYY-MM-DD
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, filename)
-            if match:
-                groups = match.groups()
-                try:
-                    if len(groups) >= 6:  # Full datetime
-                        year, month, day, hour, minute, second = map(int, groups[:6])
-                        extracted_date = datetime(year, month, day, hour, minute, second)
-                    elif len(groups) >= 3:  # Date only
-                        year, month, day = map(int, groups[:3])
-                        extracted_date = datetime(year, month, day)
-                    else:
-                        continue
-                    
-                    # Validate date ranges
-                    if 2000 <= year <= 2030 and 1 <= month <= 12 and 1 <= day <= 31:
-                        print(f"Extracted date from filename: {extracted_date}")
-                        return extracted_date
-                except ValueError:
-                    continue
-        
-        print("No valid date found in filename or metadata")
+        current_request().set(date_source=None)
         return None
         
     except Exception as e:
-        print(f"Error extracting EXIF date: {str(e)}")
+        logger.warning("Error extracting EXIF date", key=key, error=str(e))
         return None
 
+@logged_handler
 def lambda_handler(event, context):
     try:
-        print(f"Received event: {json.dumps(event, indent=2)}")
+        logger.debug("Received event", event=event)
         
         # Handle EventBridge event format
         if 'detail' in event:
             bucket = event['detail']['bucket']['name']
             key = unquote_plus(event['detail']['object']['key'])
-            print(f"Processing: bucket={bucket}, key={key}")
+            current_request().set(bucket=bucket, key=key)
         else:
-            print("Invalid event format")
+            logger.warning("Invalid event format", event_keys=list(event))
             return {'statusCode': 400, 'body': 'Invalid event format'}
         
         # Check if this is a temp file that needs reorganization
         if '/temp/' in key:
             return process_temp_file(bucket, key)
-        else:
-            # Regular processing for already organized files
-            return process_organized_file(bucket, key)
+        
+        # Regular processing for already organized files, counted against the batch that issued the URL
+        record_batch_progress(key, 'upload', event['detail']['object'].get('size', 0))
+        try:
+            result = process_organized_file(bucket, key)
+        except Exception:
+            record_batch_progress(key, 'failed')
+            raise
+        record_batch_progress(key, 'processed' if result['statusCode'] == 200 else 'failed')
+        return result
         
     except Exception as e:
-        print(f"Error: {str(e)}")
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception("Error processing media event", error=str(e))
         return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
 
 def process_temp_file(bucket, temp_key):
     """Process file in temp location and move to proper date-based location"""
-    print(f"Processing temp file: {temp_key}")
     
     # Extract user_id and file info
     path_parts = temp_key.split('/')
@@ -106,65 +548,114 @@ def process_temp_file(bucket, temp_key):
     file_id = filename.split('.')[0]
     extension = filename.split('.')[-1].lower() if '.' in filename else ''
     
-    # Download file to extract EXIF (simplified - no PIL for now)
-    file_obj = s3.get_object(Bucket=bucket, Key=temp_key)
-    file_content = file_obj['Body'].read()
+    # Single HEAD for the whole organize + process flow
+    head = s3.head_object(Bucket=bucket, Key=temp_key, ChecksumMode='ENABLED')
     
-    # Try to extract EXIF date
-    actual_date = extract_exif_date(bucket, temp_key)
+    # Try to extract EXIF date (embedded metadata is read once and reused for the metadata item)
+    embedded = read_embedded_metadata(bucket, temp_key, head)
+    actual_date = extract_exif_date(bucket, temp_key, head, embedded)
     
     # Use EXIF date if available, otherwise use current date
     if actual_date:
         year = actual_date.year
         month = f"{actual_date.month:02d}"
-        print(f"Using EXIF date: {year}-{month} from {actual_date}")
+        logger.debug("Using EXIF date", actual_date=actual_date)
     else:
         actual_date = datetime.now()
         year = actual_date.year
         month = f"{actual_date.month:02d}"
-        print(f"No EXIF date found, using current date: {year}-{month}")
+        logger.debug("No EXIF date found, using current date", actual_date=actual_date)
     
     # Create final organized path
     final_key = f"{user_id}/originals/{year}/{month}/{file_id}.{extension}"
     
-    print(f"Moving from temp: {temp_key} -> {final_key}")
-    print(f"Organized by date: {actual_date.isoformat()}")
+    current_request().set(temp_key=temp_key, key=final_key)
     
     # Copy to final location
-    s3.copy_object(
-        Bucket=bucket,
-        CopySource={'Bucket': bucket, 'Key': temp_key},
-        Key=final_key,
-        Metadata={
-            'original-filename': filename,
-            'user-id': user_id,
-            'file-id': file_id,
-            'actual-date': actual_date.isoformat(),
-            'upload-date': datetime.now().isoformat(),
-            'status': 'organized'
-        },
-        MetadataDirective='REPLACE'
-    )
+    metadata = {
+        'original-filename': filename,
+        'user-id': user_id,
+        'file-id': file_id,
+        'actual-date': actual_date.isoformat(),
+        'upload-date': datetime.now().isoformat(),
+        'status': 'organized'
+    }
+    copy_to_organized_path(bucket, temp_key, final_key, head, metadata)
     
     # Delete temp file
     s3.delete_object(Bucket=bucket, Key=temp_key)
     
-    # Process the organized file
-    return process_organized_file(bucket, final_key, file_content, actual_date)
+    # Process the organized file (same bytes, so the temp HEAD still describes it)
+    return process_organized_file(bucket, final_key, actual_date=actual_date, head=head, embedded=embedded)
+
+def copy_to_organized_path(bucket, source_key, dest_key, head, metadata):
+    """Server-side copy that switches to parallel multipart copy for large objects"""
+    size = head['ContentLength']
+    content_type = head.get('ContentType', 'application/octet-stream')
+    
+    if size <= MULTIPART_COPY_THRESHOLD:
+        s3.copy_object(
+            Bucket=bucket,
+            CopySource={'Bucket': bucket, 'Key': source_key},
+            CopySourceIfMatch=head['ETag'],
+            Key=dest_key,
+            ContentType=content_type,
+            Metadata=metadata,
+            MetadataDirective='REPLACE'
+        )
+        return
+    
+    part_size = max(MULTIPART_COPY_PART_SIZE, -(-size // MAX_MULTIPART_PARTS))
+    part_count = -(-size // part_size)
+    current_request().set(copy_parts=part_count)
+    
+    upload_id = s3.create_multipart_upload(
+        Bucket=bucket,
+        Key=dest_key,
+        ContentType=content_type,
+        Metadata=metadata
+    )['UploadId']
+    
+    def copy_part(part_number):
+        start = (part_number - 1) * part_size
+        end = min(start + part_size, size) - 1
+        response = s3.upload_part_copy(
+            Bucket=bucket,
+            Key=dest_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            CopySource={'Bucket': bucket, 'Key': source_key},
+            CopySourceIfMatch=head['ETag'],
+            CopySourceRange=f"bytes={start}-{end}"
+        )
+        return {'PartNumber': part_number, 'ETag': response['CopyPartResult']['ETag']}
+    
+    try:
+        with ThreadPoolExecutor(max_workers=min(MULTIPART_COPY_CONCURRENCY, part_count)) as pool:
+            parts = list(pool.map(copy_part, range(1, part_count + 1)))
+        
+        s3.complete_multipart_upload(
+            Bucket=bucket,
+            Key=dest_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+    except Exception:
+        s3.abort_multipart_upload(Bucket=bucket, Key=dest_key, UploadId=upload_id)
+        raise
 
-def process_organized_file(bucket, key, file_content=None, actual_date=None):
+def process_organized_file(bucket, key, actual_date=None, head=None, embedded=None):
     """Process file in final organized location"""
-    print(f"Processing organized file: {key}")
     
     # Skip thumbnail files - they don't need processing
     path_parts = key.split('/')
     if len(path_parts) >= 2 and path_parts[1] in ['thumbnails', 'compressed', 'trash']:
-        print(f"Skipping non-original file: {key}")
+        current_request().set(skipped='non-original')
         return {'statusCode': 200, 'body': 'Skipped non-original file'}
     
     # Extract info from organized path
     if len(path_parts) < 5 or path_parts[1] != 'originals':
-        print(f"Invalid organized path: {key}")
+        logger.warning("Invalid organized path", key=key)
         return {'statusCode': 400, 'body': 'Invalid organized path'}
     
     user_id = path_parts[0]
@@ -174,19 +665,20 @@ def process_organized_file(bucket, key, file_content=None, actual_date=None):
     file_id = filename.split('.')[0]
     extension = filename.split('.')[-1].lower() if '.' in filename else ''
     
-    # Get file content if not provided
-    if not file_content:
-        file_obj = s3.get_object(Bucket=bucket, Key=key)
-        file_content = file_obj['Body'].read()
-        response = s3.head_object(Bucket=bucket, Key=key)
-        file_size = response['ContentLength']
-        content_type = response.get('ContentType', 'unknown')
-    else:
-        file_size = len(file_content)
-        content_type = 'image/jpeg' if extension in ['jpg', 'jpeg'] else 'unknown'
+    # Get object metadata (including any checksum S3 stored at upload)
+    if head is None:
+        head = s3.head_object(Bucket=bucket, Key=key, ChecksumMode='ENABLED')
+    file_size = head['ContentLength']
+    content_type = head.get('ContentType', 'unknown')
+    
+    # Calculate hash without loading the file into memory
+    file_hash = compute_file_hash(bucket, key, head)
     
-    # Calculate hash
-    file_hash = hashlib.sha256(file_content).hexdigest()
+    # Camera, GPS and capture date from the file's own metadata (ranged reads only)
+    if embedded is None:
+        embedded = read_embedded_metadata(bucket, key, head)
+    if actual_date is None:
+        actual_date = embedded.get('capture_date')
     
     # Determine media type (improved detection)
     image_extensions = ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'tiff', 'tif']
@@ -203,7 +695,6 @@ def process_organized_file(bucket, key, file_content=None, actual_date=None):
     ai_analysis = {}
     if media_type == 'image':
         try:
-            print("Starting AI analysis...")
             labels_response = rekognition.detect_labels(
                 Image={'S3Object': {'Bucket': bucket, 'Name': key}},
                 MaxLabels=20, MinConfidence=70
@@ -216,14 +707,14 @@ def process_organized_file(bucket, key, file_content=None, actual_date=None):
                 Attributes=['ALL']
             )
             ai_analysis['faces_count'] = len(faces_response['FaceDetails'])
-            print(f"AI analysis completed: {len(ai_analysis.get('labels', []))} labels, {ai_analysis.get('faces_count', 0)} faces")
+            current_request().set(labels=len(ai_analysis['labels']), faces=ai_analysis['faces_count'])
         except Exception as ai_error:
-            print(f"AI analysis failed: {str(ai_error)}")
+            logger.warning("AI analysis failed", key=key, error=str(ai_error))
             ai_analysis = {}
     
     # Generate file paths
     upload_date = actual_date or datetime.now()
-    file_paths = get_file_paths(user_id, file_id, extension, upload_date)
+    file_paths = get_file_paths(user_id, file_id, extension, key)
     
     # Store metadata
     table = dynamodb.Table('gildarck-media-metadata-dev')
@@ -232,12 +723,15 @@ def process_organized_file(bucket, key, file_content=None, actual_date=None):
         'file_id': file_id,
         'user_id': user_id,
         'original_filename': filename,
+        # Canonical location of the original (S3KeyIndex maps it back to this item)
+        's3_key': key,
         's3_paths': file_paths,
         'file_hash': file_hash,
         'file_size': file_size,
         'content_type': content_type,
         'media_type': media_type,
         'upload_date': upload_date.isoformat(),
+        'created_date': build_created_date(upload_date, file_id),
         'processing_status': 'completed',
         'ai_analysis': ai_analysis,
         'file_info': {
@@ -255,16 +749,12 @@ def process_organized_file(bucket, key, file_content=None, actual_date=None):
             'archived': False
         },
         'location': {
-            'gps_coordinates': None,
+            'gps_coordinates': format_gps_coordinates(embedded.get('gps')),
             'address': None,
             'city': None,
             'country': None
         },
-        'camera_data': {
-            'make': None,
-            'model': None,
-            'settings': {}
-        },
+        'camera_data': format_camera_data(embedded.get('camera')),
         'thumbnails': {
             'small': file_paths['thumbnails']['small'],
             'medium': file_paths['thumbnails']['medium'],
@@ -272,22 +762,47 @@ def process_organized_file(bucket, key, file_content=None, actual_date=None):
         }
     }
     
+    if embedded.get('gps'):
+        metadata_item['location_lat_lng'] = "{:.4f},{:.4f}".format(*embedded['gps'])
+    
     table.put_item(Item=metadata_item)
-    print(f"Successfully stored metadata for file {file_id}")
+    dynamodb.Table(FILE_HASH_TABLE).put_item(Item={
+        'user_hash': f"{user_id}#{file_hash}",
+        'user_id': user_id,
+        'file_hash': file_hash,
+        'file_id': file_id,
+        'updated_at': datetime.utcnow().isoformat()
+    })
+    current_request().set(file_id=file_id, media_type=media_type, file_size=file_size)
     
-    # Trigger thumbnail generation for images
-    if media_type == 'image':
+    # Trigger thumbnail generation for images and video poster frames
+    if media_type in ('image', 'video'):
         trigger_thumbnail_generation(user_id, key, file_id)
     
     return {'statusCode': 200, 'body': 'Media processed and organized successfully'}
 
-def get_file_paths(user_id, file_id, extension, upload_date):
-    """Generate Google Photos-like file paths"""
-    year = upload_date.year
-    month = f"{upload_date.month:02d}"
+def compute_file_hash(bucket, key, head):
+    """Hex SHA-256 of an object: S3's stored checksum when available, otherwise streamed"""
+    if USE_S3_CHECKSUMS:
+        checksum = head.get('ChecksumSHA256')
+        # Multipart uploads may store a checksum of part checksums ("<b64>-<parts>"), not the file hash
+        if checksum and '-' not in checksum and head.get('ChecksumType', 'FULL_OBJECT') == 'FULL_OBJECT':
+            current_request().set(hash_source='s3-checksum')
+            return base64.b64decode(checksum).hex()
     
+    hasher = hashlib.sha256()
+    body = s3.get_object(Bucket=bucket, Key=key)['Body']
+    try:
+        for chunk in body.iter_chunks(chunk_size=HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+    finally:
+        body.close()
+    return hasher.hexdigest()
+
+def get_file_paths(user_id, file_id, extension, original_key):
+    """Generate Google Photos-like file paths"""
     return {
-        'original': f"{user_id}/originals/{year}/{month}/{file_id}.{extension}",
+        'original': original_key,
         'thumbnails': {
             'small': f"{user_id}/thumbnails/small/{file_id}_s.webp",
             'medium': f"{user_id}/thumbnails/medium/{file_id}_m.webp", 
@@ -296,6 +811,108 @@ def get_file_paths(user_id, file_id, extension, upload_date):
         'compressed': f"{user_id}/compressed/{file_id}_compressed.{extension}"
     }
 
+def format_gps_coordinates(gps):
+    if not gps:
+        return None
+    return {
+        'latitude': Decimal(str(round(gps[0], 6))),
+        'longitude': Decimal(str(round(gps[1], 6)))
+    }
+
+def format_camera_data(camera):
+    """DynamoDB rejects floats, so numeric camera settings are stored as Decimal"""
+    camera = camera or {}
+    settings = {}
+    for name, value in camera.get('settings', {}).items():
+        settings[name] = Decimal(str(round(value, 6))) if isinstance(value, float) else value
+    return {
+        'make': camera.get('make'),
+        'model': camera.get('model'),
+        'settings': settings
+    }
+
+def record_batch_progress(key, stage, size=0):
+    """Count one upload/processed/failed file against its upload batch, once per key and stage"""
+    path_parts = key.split('/')
+    if len(path_parts) < 2 or path_parts[1] != 'originals':
+        return
+    
+    now = datetime.utcnow().isoformat()
+    table = dynamodb.Table(BATCH_TABLE_NAME)
+    try:
+        # Marking the index item both finds the batch and makes redelivered events no-ops
+        index = table.update_item(
+            Key={'batch_id': UPLOAD_INDEX_PREFIX + key},
+            UpdateExpression="SET #stage = :now",
+            ConditionExpression='attribute_exists(batch_id) AND attribute_not_exists(#stage)',
+            ExpressionAttributeNames={'#stage': f"{stage}_at"},
+            ExpressionAttributeValues={':now': now},
+            ReturnValues='ALL_NEW'
+        )['Attributes']
+        
+        if stage == 'upload':
+            update_expression = ("ADD uploaded_files :one, uploaded_bytes :size "
+                                 "SET first_upload_at = if_not_exists(first_upload_at, :now), last_upload_at = :now, updated_at = :now")
+            values = {':one': 1, ':size': int(size), ':now': now}
+        else:
+            update_expression = f"ADD {stage}_files :one SET last_{stage}_at = :now, updated_at = :now"
+            values = {':one': 1, ':now': now}
+        
+        batch = table.update_item(
+            Key={'batch_id': index['upload_batch_id']},
+            UpdateExpression=update_expression,
+            ConditionExpression='attribute_exists(batch_id)',
+            ExpressionAttributeValues=values,
+            # total_files is needed to spot the last file, so the whole item comes back
+            ReturnValues='NONE' if stage == 'upload' else 'ALL_NEW'
+        ).get('Attributes')
+        current_request().set(upload_batch_id=index['upload_batch_id'])
+        
+        if batch is not None:
+            complete_batch_if_finished(table, batch, now)
+        
+    except ClientError as e:
+        # Not issued by a batch, already counted, or the batch expired
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            logger.error("Error recording batch progress", key=key, stage=stage, error=str(e))
+    except Exception as e:
+        logger.error("Error recording batch progress", key=key, stage=stage, error=str(e))
+
+def complete_batch_if_finished(table, batch, now):
+    """Mark a batch completed once every file is processed or failed.
+    
+    Lazy chunked batches have no batch-processor run to close them, so the last file does it.
+    The status condition keeps this to batches still 'processing' and makes it happen once.
+    """
+    total_files = int(batch.get('total_files', 0))
+    finished_files = int(batch.get('processed_files', 0)) + int(batch.get('failed_files', 0))
+    if not total_files or finished_files < total_files or batch.get('status') != 'processing':
+        return
+    
+    update_expression = "SET #status = :completed, updated_at = :now"
+    values = {':completed': 'completed', ':processing': 'processing', ':now': now}
+    if 'total_chunks' in batch:
+        update_expression += ", completed_chunks = :chunks"
+        values[':chunks'] = batch['total_chunks']
+    try:
+        table.update_item(
+            Key={'batch_id': batch['batch_id']},
+            UpdateExpression=update_expression,
+            ConditionExpression='#status = :processing',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues=values
+        )
+        logger.info("Batch completed", batch_id=batch['batch_id'], total_files=total_files,
+                    failed_files=int(batch.get('failed_files', 0)))
+    except ClientError as e:
+        # Another invocation finished the batch first
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+def build_created_date(capture_date, file_id):
+    """Build the DateIndex sort key: capture timestamp plus file_id as tiebreaker"""
+    return f"{capture_date.strftime('%Y-%m-%dT%H:%M:%S')}#{file_id}"
+
 def trigger_thumbnail_generation(user_id, s3_key, file_id):
     """Send message to SQS to trigger thumbnail generation"""
     try:
@@ -321,9 +938,9 @@ def trigger_thumbnail_generation(user_id, s3_key, file_id):
             }
         )
         
-        print(f"Sent thumbnail generation message for {file_id}: {response['MessageId']}")
+        current_request().set(thumbnail_message_id=response['MessageId'])
         return True
         
     except Exception as e:
-        print(f"Error sending thumbnail generation message: {str(e)}")
+        logger.error("Error sending thumbnail generation message", file_id=file_id, error=str(e))
         return False
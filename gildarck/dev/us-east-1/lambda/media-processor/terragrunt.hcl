@@ -39,7 +39,8 @@ inputs = {
         "s3:GetObject",
         "s3:PutObject",
         "s3:CopyObject",
-        "s3:DeleteObject"
+        "s3:DeleteObject",
+        "s3:AbortMultipartUpload"
       ]
       resources = ["arn:aws:s3:::gildarck-media-dev/*"]
     }
@@ -54,6 +55,20 @@ inputs = {
         "arn:aws:dynamodb:us-east-1:496860676881:table/gildarck-media-metadata-dev/index/*"
       ]
     }
+    file_hash_access = {
+      effect = "Allow"
+      actions = [
+        "dynamodb:PutItem"
+      ]
+      resources = ["arn:aws:dynamodb:us-east-1:496860676881:table/gildarck-media-hashes-dev"]
+    }
+    batch_progress_access = {
+      effect = "Allow"
+      actions = [
+        "dynamodb:UpdateItem"
+      ]
+      resources = ["arn:aws:dynamodb:us-east-1:496860676881:table/gildarck-batch-uploads-dev"]
+    }
     rekognition_access = {
       effect = "Allow"
       actions = [
@@ -82,6 +97,17 @@ inputs = {
     S3_BUCKET      = "gildarck-media-dev"
     DYNAMODB_TABLE = "gildarck-media-metadata-dev"
     REGION         = "us-east-1"
+    USE_S3_CHECKSUMS = "true"
+    HASH_CHUNK_SIZE  = "8388608"
+    MULTIPART_COPY_THRESHOLD   = "536870912"
+    MULTIPART_COPY_PART_SIZE   = "268435456"
+    MULTIPART_COPY_CONCURRENCY = "8"
+    METADATA_PROBE_BYTES       = "262144"
+    BATCH_TABLE_NAME           = "gildarck-batch-uploads-dev"
+    FILE_HASH_TABLE            = "gildarck-media-hashes-dev"
+    LOG_LEVEL                  = "INFO"
+    LOG_SAMPLE_RATE            = "0.01"
+    LOG_DEBUG_DETAIL           = "false"
   }
 
   tags = local.tags
@@ -1,8 +1,13 @@
 import json
+import base64
 import boto3
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Key, Attr
 from botocore.exceptions import ClientError
 from decimal import Decimal
+from structured_logging import current_request, get_logger, logged_handler
+
+# Structured JSON logging (bundled structured_logging.py): one summary line per request
+logger = get_logger(__name__)
 
 # Custom JSON encoder for Decimal values
 class DecimalEncoder(json.JSONEncoder):
@@ -15,6 +20,13 @@ dynamodb = boto3.resource('dynamodb')
 s3 = boto3.client('s3')
 table = dynamodb.Table('gildarck-media-metadata-dev')
 
+# Timeline pagination
+TIMELINE_DEFAULT_LIMIT = 50
+TIMELINE_MAX_LIMIT = 200
+TIMELINE_CURSOR_KEYS = {'user_id', 'file_id', 'created_date'}
+# Items with a trash_date (media-delete), newest first
+TRASH_INDEX = 'TrashIndex'
+
 def extract_cognito_sub(event):
     """Extract cognito sub from API Gateway authorizer context"""
     try:
@@ -34,12 +46,13 @@ def extract_cognito_sub(event):
             if 'principalId' in authorizer:
                 return authorizer['principalId']
         
-        print(f"DEBUG: Full event context: {event.get('requestContext', {})}")
+        logger.debug("No Cognito sub in request context", request_context=event.get('requestContext', {}))
         raise ValueError("Cognito sub not found in request context")
     except Exception as e:
-        print(f"Error extracting Cognito sub: {str(e)}")
+        logger.warning("Error extracting Cognito sub", error=str(e))
         raise ValueError("Cognito sub not found in request context")
 
+@logged_handler
 def lambda_handler(event, context):
     try:
         # Extract user_id (Cognito sub) consistently with other functions
@@ -70,9 +83,7 @@ def lambda_handler(event, context):
         
         method = event['httpMethod']
         
-        print(f"Processing: {method} {path} for user {user_id}")
-        print(f"Resource path: {resource_path}")
-        print(f"Path parameters: {event.get('pathParameters', {})}")
+        current_request().set(method=method, path=path, resource=resource_path, user_id=user_id)
         
         if method == 'GET':
             if path == 'list':
@@ -93,7 +104,7 @@ def lambda_handler(event, context):
         }
         
     except Exception as e:
-        print(f"Error in media-retrieval: {str(e)}")
+        logger.exception("Error in media-retrieval", error=str(e))
         return {
             'statusCode': 500,
             'headers': cors_headers(),
@@ -107,76 +118,113 @@ def cors_headers():
         'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
     }
 
+def encode_cursor(last_evaluated_key):
+    """Turn a DynamoDB LastEvaluatedKey into an opaque continuation token"""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, cls=DecimalEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, user_id):
+    """Turn a continuation token back into an ExclusiveStartKey for this user"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        start_key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    
+    # A cursor must point into the caller's own partition of the DateIndex
+    if not isinstance(start_key, dict) or start_key.get('user_id') != user_id or set(start_key) != TIMELINE_CURSOR_KEYS:
+        raise ValueError('Invalid cursor')
+    return start_key
+
+def format_media_item(item):
+    """Format a metadata item for frontend consumption (Google Photos style)"""
+    # Safely get ai_analysis data
+    ai_analysis = item.get('ai_analysis') or {}
+    labels = ai_analysis.get('labels') or []
+    
+    # Generate presigned URL for thumbnail
+    thumbnail_url = None
+    thumbnail_paths = item.get('thumbnails', {})
+    if thumbnail_paths.get('medium'):
+        try:
+            thumbnail_url = s3.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': 'gildarck-media-dev', 'Key': thumbnail_paths['medium']},
+                ExpiresIn=3600
+            )
+        except Exception as e:
+            logger.warning("Error generating thumbnail URL", file_id=item.get('file_id'), error=str(e))
+            current_request().incr('thumbnail_url_errors')
+    
+    return {
+        'file_id': item.get('file_id'),
+        'upload_date': item.get('upload_date'),
+        'created_date': item.get('created_date'),
+        'original_filename': item.get('original_filename'),
+        'content_type': item.get('content_type'),
+        'file_size': item.get('file_size'),
+        'thumbnails': thumbnail_paths,
+        'thumbnail_url': thumbnail_url,  # Ready-to-use presigned URL
+        'ai_analysis': {
+            'labels': [label.get('name') for label in labels if label and isinstance(label, dict)],
+            'faces_count': ai_analysis.get('faces_count', 0)
+        },
+        'processing_status': item.get('processing_status'),
+        'organization': item.get('organization', {}),
+        'file_info': item.get('file_info', {})
+    }
+
 def list_media_chronological(user_id, params):
-    """List media chronologically like Google Photos - newest first"""
+    """List media chronologically like Google Photos - newest first
+    
+    Keyset pagination over the DateIndex GSI (user_id + created_date): each call
+    reads only the page it returns and hands back an opaque `cursor` for the next one.
+    """
     try:
         # Ensure params is a dict
         if params is None:
             params = {}
         
-        limit = int(params.get('limit', 50))
-        offset = int(params.get('offset', 0))
-        
-        # Query all user media
-        response = table.query(
-            KeyConditionExpression=Key('user_id').eq(user_id)
-        )
-        
-        items = response.get('Items', [])
-        
-        # Sort chronologically (newest first) by EXIF date or upload_date
-        def get_sort_date(item):
-            file_info = item.get('file_info', {})
-            if file_info.get('year') and file_info.get('month'):
-                return f"{file_info['year']}-{str(file_info['month']).zfill(2)}-01"
-            return item.get('upload_date', '1970-01-01')
-        
-        sorted_items = sorted(items, key=get_sort_date, reverse=True)
-        
-        # Apply pagination
-        total_count = len(sorted_items)
-        paginated_items = sorted_items[offset:offset + limit]
-        
-        # Filter out trashed items (only show active media)
-        active_items = [item for item in paginated_items if item.get('processing_status') != 'trashed']
-        
-        # Format for frontend consumption (Google Photos style)
-        formatted_items = []
-        for item in active_items:
-            # Safely get ai_analysis data
-            ai_analysis = item.get('ai_analysis') or {}
-            labels = ai_analysis.get('labels') or []
-            
-            # Generate presigned URL for thumbnail
-            thumbnail_url = None
-            thumbnail_paths = item.get('thumbnails', {})
-            if thumbnail_paths.get('medium'):
-                try:
-                    thumbnail_url = s3.generate_presigned_url(
-                        'get_object',
-                        Params={'Bucket': 'gildarck-media-dev', 'Key': thumbnail_paths['medium']},
-                        ExpiresIn=3600
-                    )
-                except Exception as e:
-                    print(f"Error generating presigned URL for {item.get('file_id')}: {str(e)}")
-            
-            formatted_item = {
-                'file_id': item.get('file_id'),
-                'upload_date': item.get('upload_date'),
-                'original_filename': item.get('original_filename'),
-                'content_type': item.get('content_type'),
-                'file_size': item.get('file_size'),
-                'thumbnails': thumbnail_paths,
-                'thumbnail_url': thumbnail_url,  # Ready-to-use presigned URL
-                'ai_analysis': {
-                    'labels': [label.get('name') for label in labels if label and isinstance(label, dict)],
-                    'faces_count': ai_analysis.get('faces_count', 0)
-                },
-                'processing_status': item.get('processing_status'),
-                'organization': item.get('organization', {}),
-                'file_info': item.get('file_info', {})
+        try:
+            limit = int(params.get('limit', TIMELINE_DEFAULT_LIMIT))
+            start_key = decode_cursor(params.get('cursor'), user_id)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': cors_headers(),
+                'body': json.dumps({'error': str(e)})
             }
-            formatted_items.append(formatted_item)
+        limit = max(1, min(limit, TIMELINE_MAX_LIMIT))
+        
+        query_kwargs = {
+            'IndexName': 'DateIndex',
+            'KeyConditionExpression': Key('user_id').eq(user_id),
+            # Metadata-mode trash removes created_date, so those items are not in DateIndex at all;
+            # the filter still drops items trashed by the legacy move, which kept their created_date
+            'FilterExpression': Attr('processing_status').not_exists() | Attr('processing_status').ne('trashed'),
+            'ScanIndexForward': False
+        }
+        
+        # The filter is applied after Limit, so keep reading until the page is full
+        # or the index is exhausted; each read is bounded by what is still missing.
+        items = []
+        last_key = start_key
+        while True:
+            if last_key:
+                query_kwargs['ExclusiveStartKey'] = last_key
+            query_kwargs['Limit'] = limit - len(items)
+            response = table.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key or len(items) >= limit:
+                break
+        
+        formatted_items = [format_media_item(item) for item in items]
+        next_cursor = encode_cursor(last_key)
         
         return {
             'statusCode': 200,
@@ -184,15 +232,14 @@ def list_media_chronological(user_id, params):
             'body': json.dumps({
                 'items': formatted_items,
                 'count': len(formatted_items),
-                'total_count': len(active_items),  # Only count active items
-                'offset': offset,
                 'limit': limit,
-                'has_more': offset + limit < len(active_items),
+                'cursor': next_cursor,
+                'has_more': next_cursor is not None,
                 'sorted_by': 'chronological_desc'
             }, cls=DecimalEncoder)
         }
     except Exception as e:
-        print(f"Error listing media chronologically for user {user_id}: {str(e)}")
+        logger.exception("Error listing media chronologically", user_id=user_id, error=str(e))
         return {
             'statusCode': 500,
             'headers': cors_headers(),
@@ -232,7 +279,7 @@ def get_thumbnail(user_id, file_id):
             })
         }
     except Exception as e:
-        print(f"Error getting thumbnail for {file_id}: {str(e)}")
+        logger.exception("Error getting thumbnail", file_id=file_id, error=str(e))
         return {
             'statusCode': 500,
             'headers': cors_headers(),
@@ -241,12 +288,12 @@ def get_thumbnail(user_id, file_id):
 
 def get_file_details(user_id, file_id):
     try:
-        print(f"Looking up file: user_id={user_id}, file_id={file_id}")
+        current_request().set(file_id=file_id)
         
         response = table.get_item(Key={'user_id': user_id, 'file_id': file_id})
         
         if 'Item' not in response:
-            print(f"File not found in DynamoDB: {file_id}")
+            logger.info("File not found in DynamoDB, searching for a match", file_id=file_id)
             
             # Try to find the file by searching for partial matches
             # This handles cases where the frontend might have stale file IDs
@@ -256,7 +303,7 @@ def get_file_details(user_id, file_id):
                 )
                 
                 items = query_response.get('Items', [])
-                print(f"Found {len(items)} total files for user")
+                current_request().set(searched_files=len(items))
                 
                 # Look for files that contain the requested file_id as a substring
                 # This handles cases where the file_id might have UUID prefixes
@@ -270,12 +317,12 @@ def get_file_details(user_id, file_id):
                         file_id in original_filename or
                         item_file_id.endswith(file_id.split('_', 1)[-1] if '_' in file_id else file_id)):
                         matching_files.append(item)
-                        print(f"Found potential match: {item_file_id}")
+                        logger.detail("Found potential match", file_id=item_file_id)
                 
                 if matching_files:
                     # Use the first match
                     item = matching_files[0]
-                    print(f"Using matched file: {item.get('file_id')}")
+                    logger.info("Using matched file", file_id=file_id, matched_file_id=item.get('file_id'))
                 else:
                     return {
                         'statusCode': 404,
@@ -288,7 +335,7 @@ def get_file_details(user_id, file_id):
                         })
                     }
             except Exception as search_error:
-                print(f"Error during file search: {str(search_error)}")
+                logger.error("Error during file search", file_id=file_id, error=str(search_error))
                 return {
                     'statusCode': 404,
                     'headers': cors_headers(),
@@ -304,8 +351,7 @@ def get_file_details(user_id, file_id):
             original_path = item.get('s3_key', '')
         
         if not original_path:
-            print(f"No S3 path found for file {file_id}")
-            print(f"Item s3_paths: {item.get('s3_paths', {})}")
+            logger.warning("No S3 path found for file", file_id=file_id, s3_paths=item.get('s3_paths', {}))
             return {
                 'statusCode': 404,
                 'headers': cors_headers(),
@@ -316,8 +362,6 @@ def get_file_details(user_id, file_id):
                 })
             }
         
-        print(f"Generating presigned URL for: {original_path}")
-        
         download_url = s3.generate_presigned_url(
             'get_object',
             Params={'Bucket': 'gildarck-media-dev', 'Key': original_path},
@@ -335,7 +379,7 @@ def get_file_details(user_id, file_id):
             }, default=str)
         }
     except Exception as e:
-        print(f"Error getting file details for {file_id}: {str(e)}")
+        logger.exception("Error getting file details", file_id=file_id, error=str(e))
         return {
             'statusCode': 500,
             'headers': cors_headers(),
@@ -345,12 +389,20 @@ def get_file_details(user_id, file_id):
 def list_trash_items(user_id):
     """List all items in trash for user - Google Photos style"""
     try:
-        # Query all user items and filter trashed ones
-        response = table.query(
-            KeyConditionExpression=Key('user_id').eq(user_id)
-        )
+        # Only the user's trash, newest first, instead of the whole partition
+        query_kwargs = {
+            'IndexName': TRASH_INDEX,
+            'KeyConditionExpression': Key('user_id').eq(user_id),
+            'ScanIndexForward': False
+        }
+        items = []
+        while True:
+            response = table.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
         
-        items = response.get('Items', [])
         trash_items = []
         
         for item in items:
@@ -379,9 +431,6 @@ def list_trash_items(user_id):
                 }
                 trash_items.append(trash_item)
         
-        # Sort by trash date (newest first)
-        trash_items.sort(key=lambda x: x.get('trash_date', ''), reverse=True)
-        
         return {
             'statusCode': 200,
             'headers': cors_headers(),
@@ -393,7 +442,7 @@ def list_trash_items(user_id):
         }
         
     except Exception as e:
-        print(f"Error listing trash items for user {user_id}: {str(e)}")
+        logger.exception("Error listing trash items", user_id=user_id, error=str(e))
         return {
             'statusCode': 500,
             'headers': cors_headers(),
@@ -54,9 +54,12 @@ inputs = {
   }
   
   environment_variables = {
-    DYNAMODB_TABLE = "gildarck-media-metadata-dev"
-    S3_BUCKET      = "gildarck-media-dev"
-    REGION         = "us-east-1"
+    DYNAMODB_TABLE   = "gildarck-media-metadata-dev"
+    S3_BUCKET        = "gildarck-media-dev"
+    REGION           = "us-east-1"
+    LOG_LEVEL        = "INFO"
+    LOG_SAMPLE_RATE  = "0.01"
+    LOG_DEBUG_DETAIL = "false"
   }
 
   tags = local.tags
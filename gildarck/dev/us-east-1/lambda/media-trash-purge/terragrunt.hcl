@@ -0,0 +1,87 @@
+terraform {
+  source = "${include.envcommon.locals.base_source_url}"
+}
+
+include "root" {
+  path = find_in_parent_folders()
+}
+
+include "envcommon" {
+  path   = "${dirname(find_in_parent_folders())}/_envcommon/aws/lambda/function.hcl"
+  expose = true
+}
+
+locals {
+  vars         = read_terragrunt_config(find_in_parent_folders("env.hcl")).locals
+  name         = "gildarck-media-trash-purge"
+  service_vars = read_terragrunt_config(find_in_parent_folders("service.hcl"))
+  tags         = merge(local.service_vars.locals.tags, { name = local.name })
+}
+
+inputs = {
+  function_name  = "${local.name}"
+  description    = "Scheduled purge of media trash older than 30 days"
+  # Same package as media-delete (bulk delete engine), different entry point
+  handler        = "index.purge_handler"
+  runtime        = "python3.12"
+  architectures  = ["arm64"]
+  timeout        = 900
+  memory_size    = 512
+  create_package = false
+  publish        = true
+
+  local_existing_package = "${get_terragrunt_dir()}/../media-delete/lambda.zip"
+  
+  attach_policy_statements = true
+  policy_statements = {
+    s3_access = {
+      effect = "Allow"
+      actions = [
+        "s3:DeleteObject"
+      ]
+      resources = ["arn:aws:s3:::gildarck-media-dev/*"]
+    }
+    dynamodb_access = {
+      effect = "Allow"
+      actions = [
+        "dynamodb:Query",
+        "dynamodb:BatchGetItem",
+        "dynamodb:BatchWriteItem"
+      ]
+      resources = [
+        "arn:aws:dynamodb:us-east-1:496860676881:table/gildarck-media-metadata-dev",
+        "arn:aws:dynamodb:us-east-1:496860676881:table/gildarck-media-metadata-dev/index/TrashExpiryIndex"
+      ]
+    }
+    checkpoint_access = {
+      effect = "Allow"
+      actions = [
+        "dynamodb:GetItem",
+        "dynamodb:PutItem"
+      ]
+      resources = [
+        "arn:aws:dynamodb:us-east-1:496860676881:table/GlobalConfigurationTable"
+      ]
+    }
+  }
+  
+  environment_variables = {
+    BUCKET_NAME                  = "gildarck-media-dev"
+    TABLE_NAME                   = "gildarck-media-metadata-dev"
+    CHECKPOINT_TABLE_NAME        = "GlobalConfigurationTable"
+    S3_CONCURRENCY               = "32"
+    TRASH_RETENTION_DAYS         = "30"
+    PURGE_MAX_DELETES_PER_SECOND = "50"
+    PURGE_SHARD_CONCURRENCY      = "4"
+    METRICS_NAMESPACE            = "Gildarck/Media"
+  }
+
+  tags = local.tags
+
+  allowed_triggers = {
+    PurgeSchedule = {
+      principal  = "events.amazonaws.com"
+      source_arn = "arn:aws:events:us-east-1:496860676881:rule/gildarck-media-trash-purge-schedule"
+    }
+  }
+}
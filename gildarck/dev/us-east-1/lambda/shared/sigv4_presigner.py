@@ -0,0 +1,121 @@
+"""
+SigV4 presigned S3 URLs without botocore's request pipeline.
+
+Produces the same URLs as botocore's generate_presigned_url with signature_version='s3v4'
+and virtual-hosted addressing, but derives the signing key once per day/region/service and
+builds the canonical request from string templates.
+
+This file is bundled into the lambda.zip of every function that imports it
+(upload-handler-v2, batch-processor-v2).
+"""
+
+import hashlib
+import hmac
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import quote
+
+ALGORITHM = 'AWS4-HMAC-SHA256'
+SERVICE = 's3'
+UNSIGNED_PAYLOAD = 'UNSIGNED-PAYLOAD'
+MAX_EXPIRES_IN = 604800  # SigV4 presigned URLs are valid for at most 7 days
+
+CANONICAL_REQUEST_TEMPLATE = '{method}\n{path}\n{query}\n{headers}\n\n{signed_headers}\n' + UNSIGNED_PAYLOAD
+STRING_TO_SIGN_TEMPLATE = ALGORITHM + '\n{amz_date}\n{scope}\n{request_hash}'
+URL_TEMPLATE = 'https://{host}{path}?{query}&X-Amz-Signature={signature}'
+
+def uri_encode(value: str, safe: str = '') -> str:
+    """RFC 3986 encoding used by SigV4 (unreserved characters plus `safe` are kept)"""
+    return quote(value, safe='-_.~' + safe)
+
+class S3Presigner:
+    """Presigns S3 object requests for one region using a botocore credentials object"""
+
+    def __init__(self, credentials, region: str = 'us-east-1'):
+        # botocore Credentials (possibly refreshable); frozen once per URL
+        self.credentials = credentials
+        self.region = region
+        self._signing_keys = {}
+        self._lock = threading.Lock()
+
+    def presign_put_object(self, bucket: str, key: str, expires_in: int = 3600,
+                           content_type: Optional[str] = None, now: Optional[datetime] = None) -> str:
+        headers = {'content-type': content_type} if content_type else {}
+        return self.presign('PUT', bucket, key, expires_in, headers, now)
+
+    def presign_get_object(self, bucket: str, key: str, expires_in: int = 3600,
+                           now: Optional[datetime] = None) -> str:
+        return self.presign('GET', bucket, key, expires_in, {}, now)
+
+    def presign_upload_part(self, bucket: str, key: str, upload_id: str, part_number: int,
+                            expires_in: int = 3600, now: Optional[datetime] = None) -> str:
+        query = [('uploadId', upload_id), ('partNumber', str(part_number))]
+        return self.presign('PUT', bucket, key, expires_in, {}, now, query)
+
+    def presign(self, method: str, bucket: str, key: str, expires_in: int, headers: dict,
+                now: Optional[datetime] = None, query: Optional[list] = None) -> str:
+        if not 1 <= expires_in <= MAX_EXPIRES_IN:
+            raise ValueError(f"expires_in must be between 1 and {MAX_EXPIRES_IN} seconds")
+        if bucket != bucket.lower() or '.' in bucket:
+            raise ValueError(f"Bucket {bucket} is not usable with virtual-hosted addressing")
+
+        credentials = self.credentials.get_frozen_credentials()
+        now = now or datetime.now(timezone.utc)
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date_stamp = amz_date[:8]
+        scope = f"{date_stamp}/{self.region}/{SERVICE}/aws4_request"
+        host = f"{bucket}.s3.amazonaws.com"
+        path = '/' + uri_encode(key, safe='/')
+
+        canonical_headers = dict(headers, host=host)
+        signed_headers = ';'.join(sorted(canonical_headers))
+
+        # URL order matches botocore (operation parameters first); the canonical query string is sorted
+        params = list(query or []) + [
+            ('X-Amz-Algorithm', ALGORITHM),
+            ('X-Amz-Credential', f"{credentials.access_key}/{scope}"),
+            ('X-Amz-Date', amz_date),
+            ('X-Amz-Expires', str(expires_in)),
+            ('X-Amz-SignedHeaders', signed_headers)
+        ]
+        if credentials.token:
+            params.append(('X-Amz-Security-Token', credentials.token))
+        encoded = [(name, uri_encode(value)) for name, value in params]
+
+        canonical_request = CANONICAL_REQUEST_TEMPLATE.format(
+            method=method,
+            path=path,
+            query='&'.join(f"{name}={value}" for name, value in sorted(encoded)),
+            headers='\n'.join(f"{name}:{' '.join(str(value).split())}" for name, value in sorted(canonical_headers.items())),
+            signed_headers=signed_headers
+        )
+        string_to_sign = STRING_TO_SIGN_TEMPLATE.format(
+            amz_date=amz_date,
+            scope=scope,
+            request_hash=hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+        )
+        signing_key = self.get_signing_key(credentials.secret_key, date_stamp)
+        signature = hmac.new(signing_key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+        return URL_TEMPLATE.format(
+            host=host,
+            path=path,
+            query='&'.join(f"{name}={value}" for name, value in encoded),
+            signature=signature
+        )
+
+    def get_signing_key(self, secret_key: str, date_stamp: str) -> bytes:
+        """kSigning = HMAC chain over date, region, service; valid for the whole UTC day"""
+        cache_key = (secret_key, date_stamp)
+        signing_key = self._signing_keys.get(cache_key)
+        if signing_key is None:
+            signing_key = ('AWS4' + secret_key).encode('utf-8')
+            for part in (date_stamp, self.region, SERVICE, 'aws4_request'):
+                signing_key = hmac.new(signing_key, part.encode('utf-8'), hashlib.sha256).digest()
+            with self._lock:
+                # Rotated credentials or a new day make older keys useless
+                if len(self._signing_keys) >= 4:
+                    self._signing_keys.clear()
+                self._signing_keys[cache_key] = signing_key
+        return signing_key
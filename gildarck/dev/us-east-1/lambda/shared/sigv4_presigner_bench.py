@@ -0,0 +1,57 @@
+"""
+Throughput benchmark: presigned PUT URLs per second, S3Presigner vs botocore.
+
+    python sigv4_presigner_bench.py [--urls 5000] [--repeat 3]
+
+Reports the best of `repeat` runs for each signer. Needs boto3; not bundled into any lambda.zip.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import boto3
+from botocore.config import Config
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sigv4_presigner import S3Presigner
+
+BUCKET = 'gildarck-media-dev'
+CONTENT_TYPE = 'image/jpeg'
+EXPIRES_IN = 3600
+
+def best_rate(sign, urls, repeat):
+    """Highest URLs/s over `repeat` runs of `urls` distinct keys"""
+    keys = [f"user-1/originals/2026/10/IMG_{i:05d}.jpg" for i in range(urls)]
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for key in keys:
+            sign(key)
+        best = min(best, time.perf_counter() - start)
+    return urls / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--urls', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    session = boto3.session.Session(aws_access_key_id='AKIAEXAMPLE', aws_secret_access_key='wJalr/XUtnFEMI+K7MDENG',
+                                    aws_session_token='FwoGZXIvYXdzE+/=example', region_name='us-east-1')
+    client = session.client('s3', config=Config(signature_version='s3v4'))
+    presigner = S3Presigner(session.get_credentials())
+
+    signers = {
+        'botocore': lambda key: client.generate_presigned_url(
+            'put_object', Params={'Bucket': BUCKET, 'Key': key, 'ContentType': CONTENT_TYPE}, ExpiresIn=EXPIRES_IN),
+        'local': lambda key: presigner.presign_put_object(BUCKET, key, EXPIRES_IN, CONTENT_TYPE)
+    }
+    rates = {name: best_rate(sign, args.urls, args.repeat) for name, sign in signers.items()}
+    for name, rate in rates.items():
+        print(f"{name:>8}: {rate:,.0f} URLs/s")
+    print(f"speedup: {rates['local'] / rates['botocore']:.1f}x")
+
+if __name__ == '__main__':
+    main()
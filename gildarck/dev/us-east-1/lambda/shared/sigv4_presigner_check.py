@@ -0,0 +1,95 @@
+"""
+Differential check: S3Presigner against botocore's generate_presigned_url.
+
+Signs random keys (spaces, reserved and non-ASCII characters) for PUT, GET and UploadPart
+across regions, with and without a session token, at a fixed clock and compares the URLs
+byte for byte. Exits with status 1 on any difference.
+
+    python sigv4_presigner_check.py [--count 500] [--seed 7]
+
+Needs boto3; not bundled into any lambda.zip.
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+from datetime import datetime, timezone
+
+import boto3
+import botocore.auth
+from botocore.config import Config
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sigv4_presigner import S3Presigner
+
+BUCKET = 'gildarck-media-dev'
+REGIONS = ('us-east-1', 'us-west-2', 'eu-west-1')
+SESSION_TOKENS = (None, 'FwoGZXIvYXdzE+/=example')
+CONTENT_TYPES = (None, 'image/jpeg', 'application/octet-stream', 'video/quicktime')
+EXPIRIES = (60, 900, 3600, 604800)
+KEY_ALPHABET = string.ascii_letters + string.digits + " -_.~!*'()+=,;:@&$/?#[]%ü漢😀"
+UPLOAD_ID_ALPHABET = string.ascii_letters + string.digits + '._-~+/='
+FIXED_NOW = datetime(2026, 10, 17, 12, 34, 56, tzinfo=timezone.utc)
+
+def random_text(rng, alphabet, min_length, max_length):
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randint(min_length, max_length)))
+
+def compare(region, token, count, rng):
+    """Mismatching (expected, actual) URL pairs for `count` random requests per operation"""
+    session = boto3.session.Session(aws_access_key_id='AKIAEXAMPLE', aws_secret_access_key='wJalr/XUtnFEMI+K7MDENG',
+                                    aws_session_token=token, region_name=region)
+    client = session.client('s3', config=Config(signature_version='s3v4'))
+    presigner = S3Presigner(session.get_credentials(), region)
+
+    mismatches = []
+    for _ in range(count):
+        key = 'user-1/originals/' + random_text(rng, KEY_ALPHABET, 1, 40)
+        content_type = rng.choice(CONTENT_TYPES)
+        expires_in = rng.choice(EXPIRIES)
+
+        params = {'Bucket': BUCKET, 'Key': key}
+        if content_type:
+            params['ContentType'] = content_type
+        pairs = [
+            (client.generate_presigned_url('put_object', Params=params, ExpiresIn=expires_in),
+             presigner.presign_put_object(BUCKET, key, expires_in, content_type, now=FIXED_NOW)),
+            (client.generate_presigned_url('get_object', Params={'Bucket': BUCKET, 'Key': key}, ExpiresIn=expires_in),
+             presigner.presign_get_object(BUCKET, key, expires_in, now=FIXED_NOW))
+        ]
+
+        upload_id = random_text(rng, UPLOAD_ID_ALPHABET, 60, 60)
+        part_number = rng.randint(1, 10000)
+        pairs.append((
+            client.generate_presigned_url('upload_part', ExpiresIn=expires_in, Params={
+                'Bucket': BUCKET, 'Key': key, 'UploadId': upload_id, 'PartNumber': part_number}),
+            presigner.presign_upload_part(BUCKET, key, upload_id, part_number, expires_in, now=FIXED_NOW)
+        ))
+        mismatches.extend((expected, actual) for expected, actual in pairs if expected != actual)
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=500, help='random keys per region and token')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    # botocore signs with the current time; pin it so both sides use the same X-Amz-Date
+    botocore.auth.get_current_datetime = lambda *args, **kwargs: FIXED_NOW.replace(tzinfo=None)
+    rng = random.Random(args.seed)
+
+    compared = 0
+    mismatches = []
+    for region in REGIONS:
+        for token in SESSION_TOKENS:
+            mismatches.extend(compare(region, token, args.count, rng))
+            compared += args.count * 3
+
+    for expected, actual in mismatches[:3]:
+        print(f"botocore: {expected}\nlocal:    {actual}\n")
+    print(f"{compared} URLs compared, {len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Structured, sampled logging for the media Lambdas.
+
+Every record is one JSON line (message plus fields) so CloudWatch Logs Insights can filter
+on fields instead of parsing text. Formatting is deferred until a record passes the level
+check, hot loops report through a per-request summary instead of a line per file, and
+per-item detail is only written with LOG_DEBUG_DETAIL=true or in a sampled request.
+
+This file is bundled into the lambda.zip of every function that imports it
+(batch-processor-v2, media-processor, media-retrieval).
+"""
+
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# Fraction of requests logged at DEBUG (with per-item detail) to keep a trickle of full traces
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '0'))
+LOG_DEBUG_DETAIL = os.environ.get('LOG_DEBUG_DETAIL', 'false').lower() == 'true'
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: level, message, request id and the record's fields"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if _request is not None:
+            entry['request_id'] = _request.request_id
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class StructuredLogger:
+    """logging.Logger wrapper taking keyword fields; nothing is formatted for disabled levels"""
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(name)
+
+    def is_enabled_for(self, level: int) -> bool:
+        return (_request is not None and _request.sampled) or self._logger.isEnabledFor(level)
+
+    def debug(self, message: str, *args, **fields):
+        self._log(logging.DEBUG, message, args, fields)
+
+    def info(self, message: str, *args, **fields):
+        self._log(logging.INFO, message, args, fields)
+
+    def warning(self, message: str, *args, **fields):
+        self._log(logging.WARNING, message, args, fields)
+
+    def error(self, message: str, *args, **fields):
+        self._log(logging.ERROR, message, args, fields)
+
+    def exception(self, message: str, *args, **fields):
+        self._log(logging.ERROR, message, args, fields, exc_info=True)
+
+    def detail(self, message: str, *args, **fields):
+        """Per-item detail (one line per file/URL): only with LOG_DEBUG_DETAIL or in a sampled request"""
+        if LOG_DEBUG_DETAIL or (_request is not None and _request.sampled):
+            self._log(logging.DEBUG, message, args, fields, force=True)
+
+    def _log(self, level: int, message: str, args: tuple, fields: dict, exc_info: bool = False, force: bool = False):
+        # A sampled request logs DEBUG from our loggers only; botocore stays at the configured level
+        sampled = _request is not None and _request.sampled
+        if not (force or sampled or self._logger.isEnabledFor(level)):
+            return
+        # %-style args are only interpolated by the formatter, after the level check
+        record = self._logger.makeRecord(self._logger.name, level, '(structured)', 0, message, args,
+                                         sys.exc_info() if exc_info else None, extra={'fields': fields})
+        self._logger.handle(record)
+
+class RequestLog:
+    """Counters and fields for one invocation, written as a single summary line when it ends"""
+
+    def __init__(self, request_id: str, sampled: bool):
+        self.request_id = request_id
+        self.sampled = sampled
+        self.started = time.monotonic()
+        self.counters = {}
+        self.fields = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                **self.fields,
+                **self.counters,
+                'duration_ms': round((time.monotonic() - self.started) * 1000, 1),
+                'sampled': self.sampled
+            }
+
+_request = None
+_configured = False
+_summary_logger = StructuredLogger('request')
+
+def get_logger(name: str) -> StructuredLogger:
+    configure()
+    return StructuredLogger(name)
+
+def configure():
+    """Switch the root logger (including the Lambda runtime's handler) to JSON lines"""
+    global _configured
+    if _configured:
+        return
+    root = logging.getLogger()
+    if not root.handlers:
+        root.addHandler(logging.StreamHandler(sys.stdout))
+    for handler in root.handlers:
+        handler.setFormatter(JsonFormatter())
+    root.setLevel(LOG_LEVEL)
+    _configured = True
+
+def current_request() -> RequestLog:
+    """The running invocation's RequestLog (a detached one outside logged_handler)"""
+    return _request if _request is not None else RequestLog('-', False)
+
+def logged_handler(handler):
+    """Wrap a Lambda handler: pick the sampling decision, then write one summary line per invocation"""
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global _request
+        configure()
+        sampled = LOG_SAMPLE_RATE > 0 and random.random() < LOG_SAMPLE_RATE
+        _request = RequestLog(getattr(context, 'aws_request_id', '-'), sampled)
+        try:
+            result = handler(event, context)
+            if isinstance(result, dict) and 'statusCode' in result:
+                _request.set(status_code=result['statusCode'])
+            return result
+        except Exception:
+            _request.set(status_code=500, unhandled_error=True)
+            raise
+        finally:
+            _summary_logger.info('request summary', **_request.summary())
+            _request = None
+    return wrapper
@@ -4,63 +4,86 @@ import os
 import sys
 import io
 import logging
+import struct
+import subprocess
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 
 # Pillow will be available via Lambda Layer
-from PIL import Image, ImageOps
+from PIL import Image, ImageCms, ImageOps
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-s3 = boto3.client('s3')
+# Records are processed concurrently: downloads/uploads wait on the network and Pillow
+# releases the GIL while decoding, resizing and encoding
+MAX_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', '4'))
+
+s3 = boto3.client('s3', config=Config(max_pool_connections=MAX_WORKERS * 4))
 BUCKET_NAME = os.environ['S3_BUCKET']
+SRGB_PROFILE = ImageCms.createProfile('sRGB')
+
+# Video poster frames: one keyframe is read from the MP4/MOV index and decoded by ffmpeg (layer binary)
+FFMPEG_PATH = os.environ.get('FFMPEG_PATH', '/opt/bin/ffmpeg')
+# Checked once per container: without the binary no S3 reads are spent on the video index
+FFMPEG_AVAILABLE = os.path.exists(FFMPEG_PATH)
+if not FFMPEG_AVAILABLE:
+    logger.warning(f"ffmpeg not found at {FFMPEG_PATH}; videos get placeholder thumbnails")
+FFMPEG_TIMEOUT_SECONDS = 30
+POSTER_FRAME_SECONDS = float(os.environ.get('POSTER_FRAME_SECONDS', '1.0'))
+MAX_MOOV_BYTES = 16 * 1024 * 1024
 
 def lambda_handler(event, context):
+    records = event.get('Records', [])
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(records)))) as pool:
+            results = list(pool.map(process_record, records))
+    except Exception as e:
+        logger.error(f"Error processing thumbnails: {str(e)}")
+        results = [False] * len(records)
+    
+    # Only failed messages go back to the queue (ReportBatchItemFailures)
+    failures = [{'itemIdentifier': record['messageId']} for record, success in zip(records, results) if not success]
+    logger.info(f"Processed {len(records) - len(failures)}/{len(records)} thumbnail messages")
+    
+    return {'batchItemFailures': failures}
+
+def process_record(record):
+    """Generate thumbnails for one SQS message; returns False when the message should be retried"""
     try:
-        processed_count = 0
+        message = json.loads(record['body'])
         
-        for record in event['Records']:
-            message = json.loads(record['body'])
-            
-            user_id = message['user_id']
-            s3_key = message['s3_key']
-            file_id = message['file_id']
-            
-            logger.info(f"Processing thumbnails for: {s3_key}")
-            
-            # Check if it's an image or video file
-            if is_image_file(s3_key):
-                success = create_image_thumbnails(user_id, s3_key, file_id)
-                if success:
-                    processed_count += 1
-                    logger.info(f"Successfully created image thumbnails for {s3_key}")
-                else:
-                    logger.error(f"Failed to create image thumbnails for {s3_key}")
-            elif is_video_file(s3_key):
-                success = create_video_thumbnails(user_id, s3_key, file_id)
-                if success:
-                    processed_count += 1
-                    logger.info(f"Successfully created video thumbnails for {s3_key}")
-                else:
-                    logger.error(f"Failed to create video thumbnails for {s3_key}")
+        user_id = message['user_id']
+        s3_key = message['s3_key']
+        file_id = message['file_id']
+        
+        logger.info(f"Processing thumbnails for: {s3_key}")
+        
+        # Check if it's an image or video file
+        if is_image_file(s3_key):
+            success = create_image_thumbnails(user_id, s3_key, file_id)
+            if success:
+                logger.info(f"Successfully created image thumbnails for {s3_key}")
             else:
-                logger.info(f"Skipping unsupported file: {s3_key}")
-        
-        return {
-            'statusCode': 200,
-            'body': json.dumps({
-                'processed': processed_count,
-                'total': len(event['Records']),
-                'message': 'Thumbnails generated successfully'
-            })
-        }
+                logger.error(f"Failed to create image thumbnails for {s3_key}")
+            return success
+        elif is_video_file(s3_key):
+            success = create_video_thumbnails(user_id, s3_key, file_id)
+            if success:
+                logger.info(f"Successfully created video thumbnails for {s3_key}")
+            else:
+                logger.error(f"Failed to create video thumbnails for {s3_key}")
+            return success
+        else:
+            logger.info(f"Skipping unsupported file: {s3_key}")
+            return True
         
     except Exception as e:
-        logger.error(f"Error processing thumbnails: {str(e)}")
-        return {
-            'statusCode': 500,
-            'body': json.dumps({'error': str(e)})
-        }
+        logger.error(f"Error processing message {record.get('messageId')}: {str(e)}")
+        return False
 
 def is_image_file(s3_key):
     """Check if file is a supported image format"""
@@ -72,152 +95,461 @@ def is_video_file(s3_key):
     video_extensions = ['.mp4', '.mov', '.avi', '.mkv', '.webm', '.m4v']
     return any(s3_key.lower().endswith(ext) for ext in video_extensions)
 
+def get_thumbnail_configs(user_id, file_id):
+    """Largest first: each size is resized from the previous one instead of the original"""
+    return {
+        'large': {'size': (800, 800), 'path': f"{user_id}/thumbnails/large/{file_id}_l.webp"},
+        'medium': {'size': (300, 300), 'path': f"{user_id}/thumbnails/medium/{file_id}_m.webp"},
+        'small': {'size': (150, 150), 'path': f"{user_id}/thumbnails/small/{file_id}_s.webp"}
+    }
+
 def create_image_thumbnails(user_id, s3_key, file_id):
     """Create actual thumbnails using Pillow"""
     try:
+        timings = {}
+        stage_start = time.perf_counter()
+        
         # Download original image
         response = s3.get_object(Bucket=BUCKET_NAME, Key=s3_key)
         image_data = response['Body'].read()
+        stage_start = record_stage(timings, 'download', stage_start)
+        
+        thumbnail_configs = get_thumbnail_configs(user_id, file_id)
         
         # Open image with Pillow
         with Image.open(io.BytesIO(image_data)) as img:
-            # Convert to RGB if necessary
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
+            largest = thumbnail_configs['large']['size'][0]
+            
+            # JPEG: let the decoder scale down by 1/2, 1/4 or 1/8 while the square crop
+            # still covers the largest thumbnail
+            img_width, img_height = img.size
+            if img.format == 'JPEG' and min(img_width, img_height) > largest:
+                scale = largest / min(img_width, img_height)
+                img.draft(img.mode if img.mode == 'CMYK' else 'RGB',
+                          (int(img_width * scale) + 1, int(img_height * scale) + 1))
+            img.load()
+            stage_start = record_stage(timings, 'decode', stage_start)
             
-            # Thumbnail configurations
-            thumbnail_configs = {
-                'small': {'size': (150, 150), 'path': f"{user_id}/thumbnails/small/{file_id}_s.webp"},
-                'medium': {'size': (300, 300), 'path': f"{user_id}/thumbnails/medium/{file_id}_m.webp"},
-                'large': {'size': (800, 800), 'path': f"{user_id}/thumbnails/large/{file_id}_l.webp"}
-            }
+            # Orientation is applied to the reduced-scale decode, then colors go to sRGB once
+            icc_profile = img.info.get('icc_profile')
+            img = ImageOps.exif_transpose(img)
+            img = to_srgb(img, icc_profile)
             
-            # Generate each thumbnail
-            for size_name, config in thumbnail_configs.items():
-                # Create thumbnail with crop to fill (like Google Photos)
-                thumbnail = img.copy()
-                
-                # Calculate crop dimensions to maintain aspect ratio and fill square
-                img_width, img_height = thumbnail.size
-                target_size = config['size'][0]  # Square thumbnails
-                
-                # Calculate crop box to center the image
-                if img_width > img_height:
-                    # Landscape: crop width
-                    new_width = int(img_height)
-                    left = (img_width - new_width) // 2
-                    crop_box = (left, 0, left + new_width, img_height)
-                else:
-                    # Portrait or square: crop height
-                    new_height = int(img_width)
-                    top = (img_height - new_height) // 2
-                    crop_box = (0, top, img_width, top + new_height)
-                
-                # Crop to square and resize
-                thumbnail = thumbnail.crop(crop_box)
-                thumbnail = thumbnail.resize(config['size'], Image.Resampling.LANCZOS)
-                
-                # Save as WebP directly (no white canvas)
-                output_buffer = io.BytesIO()
-                thumbnail.save(output_buffer, format='WEBP', quality=85, optimize=True)
-                output_buffer.seek(0)
-                
-                # Upload to S3
-                s3.put_object(
-                    Bucket=BUCKET_NAME,
-                    Key=config['path'],
-                    Body=output_buffer.getvalue(),
-                    ContentType='image/webp',
-                    Metadata={
-                        'original-file': s3_key,
-                        'thumbnail-size': size_name,
-                        'dimensions': f"{config['size'][0]}x{config['size'][1]}",
-                        'user-id': user_id,
-                        'file-id': file_id,
-                        'format': 'webp'
-                    }
-                )
-                
-                logger.info(f"Created {size_name} thumbnail: {config['path']}")
+            thumbnails = build_thumbnails(img, thumbnail_configs)
+            stage_start = record_stage(timings, 'transform', stage_start)
         
+        encoded = {size_name: encode_webp(thumbnail) for size_name, thumbnail in thumbnails.items()}
+        stage_start = record_stage(timings, 'encode', stage_start)
+        
+        upload_thumbnails(s3_key, user_id, file_id, thumbnail_configs, encoded)
+        record_stage(timings, 'upload', stage_start)
+        
+        logger.info(f"Thumbnail timings for {s3_key} (ms): " + ", ".join(f"{stage}={ms}" for stage, ms in timings.items()))
         return True
         
     except Exception as e:
         logger.error(f"Error creating image thumbnails for {s3_key}: {str(e)}")
         return False
 
+def build_thumbnails(img, thumbnail_configs):
+    """Crop to a centered square once (like Google Photos), then cascade the resizes"""
+    img_width, img_height = img.size
+    if img_width > img_height:
+        # Landscape: crop width
+        left = (img_width - img_height) // 2
+        crop_box = (left, 0, left + img_height, img_height)
+    else:
+        # Portrait or square: crop height
+        top = (img_height - img_width) // 2
+        crop_box = (0, top, img_width, top + img_width)
+    thumbnail = img.crop(crop_box)
+    
+    # Generate each thumbnail from the previous (larger) one
+    thumbnails = {}
+    for size_name, config in thumbnail_configs.items():
+        thumbnail = thumbnail.resize(config['size'], Image.Resampling.LANCZOS)
+        thumbnails[size_name] = thumbnail
+    return thumbnails
+
+def encode_webp(thumbnail):
+    # Save as WebP directly (no white canvas)
+    output_buffer = io.BytesIO()
+    thumbnail.save(output_buffer, format='WEBP', quality=85, optimize=True)
+    return output_buffer.getvalue()
+
+def upload_thumbnails(s3_key, user_id, file_id, thumbnail_configs, encoded, thumbnail_type=None):
+    for size_name, config in thumbnail_configs.items():
+        metadata = {
+            'original-file': s3_key,
+            'thumbnail-size': size_name,
+            'dimensions': f"{config['size'][0]}x{config['size'][1]}",
+            'user-id': user_id,
+            'file-id': file_id,
+            'format': 'webp'
+        }
+        if thumbnail_type:
+            metadata['type'] = thumbnail_type
+        
+        # Upload to S3
+        s3.put_object(
+            Bucket=BUCKET_NAME,
+            Key=config['path'],
+            Body=encoded[size_name],
+            ContentType='image/webp',
+            Metadata=metadata
+        )
+        
+        logger.info(f"Created {size_name} thumbnail: {config['path']}")
+
+def record_stage(timings, stage, stage_start):
+    """Store the elapsed milliseconds of a pipeline stage and return the next stage's start"""
+    now = time.perf_counter()
+    timings[stage] = round((now - stage_start) * 1000, 1)
+    return now
+
+@lru_cache(maxsize=16)
+def get_srgb_transform(icc_profile, input_mode, output_mode):
+    """ICC -> sRGB transforms are expensive to build, and most uploads share a few profiles"""
+    source = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+    return ImageCms.buildTransform(source, SRGB_PROFILE, input_mode, output_mode)
+
+def to_srgb(img, icc_profile=None):
+    """Normalize any Pillow mode to 8-bit sRGB (RGBA when the image has transparency)"""
+    if img.mode == 'P':
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    elif img.mode.startswith('I') or img.mode == 'F':
+        img = to_8bit(img)
+    
+    has_alpha = img.mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La') or 'transparency' in img.info
+    output_mode = 'RGBA' if has_alpha else 'RGB'
+    
+    if icc_profile and img.mode in ('RGB', 'RGBA', 'CMYK', 'L'):
+        try:
+            transform_mode = 'RGBA' if img.mode == 'RGBA' else 'RGB'
+            return ImageCms.applyTransform(img, get_srgb_transform(icc_profile, img.mode, transform_mode))
+        except (ImageCms.PyCMSError, OSError, ValueError) as e:
+            logger.warning(f"Ignoring unusable ICC profile: {str(e)}")
+    
+    if img.mode == 'LAB':
+        return ImageCms.applyTransform(img, get_lab_transform())
+    
+    return img if img.mode == output_mode else img.convert(output_mode)
+
+@lru_cache(maxsize=1)
+def get_lab_transform():
+    return ImageCms.buildTransform(ImageCms.createProfile('LAB'), SRGB_PROFILE, 'LAB', 'RGB')
+
+def to_8bit(img):
+    """Scale 16/32-bit integer and float images into 'L' instead of clipping at 255"""
+    if img.mode != 'F':
+        img = img.convert('I')
+    low, high = img.getextrema()
+    if img.mode == 'F' and high <= 1.0:
+        scale = 255.0
+    elif high <= 255:
+        scale = 1.0
+    elif high <= 65535:
+        scale = 255.0 / 65535
+    else:
+        scale = 255.0 / high
+    return img.point(lambda value: value * scale).convert('L')
+
 def create_video_thumbnails(user_id, s3_key, file_id):
-    """Create better video thumbnails with gradient and play icon"""
+    """Thumbnails from a keyframe read out of the MP4/MOV index, or a cached placeholder"""
     try:
-        from PIL import ImageDraw
+        timings = {}
+        stage_start = time.perf_counter()
+        thumbnail_configs = get_thumbnail_configs(user_id, file_id)
         
-        thumbnail_configs = {
-            'small': {'size': (150, 150), 'path': f"{user_id}/thumbnails/small/{file_id}_s.webp"},
-            'medium': {'size': (300, 300), 'path': f"{user_id}/thumbnails/medium/{file_id}_m.webp"},
-            'large': {'size': (800, 800), 'path': f"{user_id}/thumbnails/large/{file_id}_l.webp"}
-        }
+        frame = None
+        if FFMPEG_AVAILABLE:
+            try:
+                frame = extract_poster_frame(s3_key)
+            except Exception as e:
+                logger.warning(f"Poster frame extraction failed for {s3_key}: {str(e)}")
+        stage_start = record_stage(timings, 'decode', stage_start)
         
-        for size_name, config in thumbnail_configs.items():
-            # Create a gradient background
-            img = Image.new('RGB', config['size'], (20, 20, 20))
-            draw = ImageDraw.Draw(img)
-            
-            # Create gradient effect
-            width, height = config['size']
-            for y in range(height):
-                # Gradient from dark to slightly lighter
-                color_value = int(20 + (y / height) * 30)
-                color = (color_value, color_value, color_value)
-                draw.line([(0, y), (width, y)], fill=color)
-            
-            # Draw play button circle
-            center_x, center_y = width // 2, height // 2
-            circle_radius = min(width, height) // 6
-            
-            # Draw circle background
-            circle_bbox = [
-                center_x - circle_radius,
-                center_y - circle_radius,
-                center_x + circle_radius,
-                center_y + circle_radius
-            ]
-            draw.ellipse(circle_bbox, fill=(80, 80, 80), outline=(120, 120, 120), width=2)
-            
-            # Draw play triangle
-            triangle_size = circle_radius // 2
-            triangle_points = [
-                (center_x - triangle_size//2, center_y - triangle_size),
-                (center_x - triangle_size//2, center_y + triangle_size),
-                (center_x + triangle_size, center_y)
-            ]
-            draw.polygon(triangle_points, fill=(200, 200, 200))
-            
-            # Save as WebP
-            output_buffer = io.BytesIO()
-            img.save(output_buffer, format='WEBP', quality=85, optimize=True)
-            output_buffer.seek(0)
-            
-            # Upload to S3
-            s3.put_object(
-                Bucket=BUCKET_NAME,
-                Key=config['path'],
-                Body=output_buffer.getvalue(),
-                ContentType='image/webp',
-                Metadata={
-                    'original-file': s3_key,
-                    'thumbnail-size': size_name,
-                    'dimensions': f"{config['size'][0]}x{config['size'][1]}",
-                    'user-id': user_id,
-                    'file-id': file_id,
-                    'format': 'webp',
-                    'type': 'video-thumbnail'
-                }
-            )
-            
-            logger.info(f"Created {size_name} video thumbnail: {config['path']}")
+        if frame is None:
+            encoded = {size_name: render_video_placeholder(config['size'])
+                       for size_name, config in thumbnail_configs.items()}
+            upload_thumbnails(s3_key, user_id, file_id, thumbnail_configs, encoded, 'video-thumbnail')
+            return True
+        
+        thumbnails = build_thumbnails(to_srgb(frame), thumbnail_configs)
+        stage_start = record_stage(timings, 'transform', stage_start)
+        
+        encoded = {size_name: encode_webp(thumbnail) for size_name, thumbnail in thumbnails.items()}
+        stage_start = record_stage(timings, 'encode', stage_start)
         
+        upload_thumbnails(s3_key, user_id, file_id, thumbnail_configs, encoded, 'video-frame')
+        record_stage(timings, 'upload', stage_start)
+        
+        logger.info(f"Thumbnail timings for {s3_key} (ms): " + ", ".join(f"{stage}={ms}" for stage, ms in timings.items()))
         return True
         
     except Exception as e:
         logger.error(f"Error creating video thumbnails for {s3_key}: {str(e)}")
         return False
+
+def read_range(s3_key, start, length):
+    response = s3.get_object(Bucket=BUCKET_NAME, Key=s3_key, Range=f"bytes={start}-{start + length - 1}")
+    return response['Body'].read()
+
+def iter_boxes(data, start=0, end=None):
+    """Yield (type, payload_start, box_end) for ISOBMFF/QuickTime boxes laid out in data[start:end]"""
+    end = len(data) if end is None else min(end, len(data))
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack('>I4s', data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', data[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield box_type, pos + header, pos + size
+        pos += size
+
+def child_boxes(data, start, end):
+    return {box_type: (payload, box_end) for box_type, payload, box_end in iter_boxes(data, start, end)}
+
+def read_moov(s3_key):
+    """Hop over top-level box headers (ftyp, mdat, ...) with small ranged reads to fetch moov"""
+    object_size = s3.head_object(Bucket=BUCKET_NAME, Key=s3_key)['ContentLength']
+    pos = 0
+    while pos + 8 <= object_size:
+        header = read_range(s3_key, pos, 16)
+        size, box_type = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = object_size - pos
+        if size < header_size:
+            return None
+        if box_type == b'moov':
+            if size > MAX_MOOV_BYTES:
+                raise ValueError(f"moov box too large ({size} bytes)")
+            return read_range(s3_key, pos, size)[header_size:]
+        pos += size
+    return None
+
+def extract_poster_frame(s3_key):
+    """Decode one representative keyframe, fetching only the index and that sample's bytes"""
+    moov = read_moov(s3_key)
+    if moov is None:
+        return None
+    
+    track = find_video_track(moov)
+    if track is None:
+        return None
+    
+    sample_number = pick_keyframe(track)
+    offset, size = locate_sample(track, sample_number)
+    sample = read_range(s3_key, offset, size)
+    
+    # Length-prefixed NAL units -> Annex B stream with the parameter sets in front
+    start_code = b'\x00\x00\x00\x01'
+    stream = b''.join(start_code + nal for nal in track['parameter_sets'])
+    pos = 0
+    length_size = track['nal_length_size']
+    while pos + length_size <= len(sample):
+        nal_length = int.from_bytes(sample[pos:pos + length_size], 'big')
+        stream += start_code + sample[pos + length_size:pos + length_size + nal_length]
+        pos += length_size + nal_length
+    
+    result = subprocess.run(
+        [FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-f', track['codec'], '-i', 'pipe:0',
+         '-frames:v', '1', '-f', 'image2pipe', '-c:v', 'ppm', 'pipe:1'],
+        input=stream, capture_output=True, timeout=FFMPEG_TIMEOUT_SECONDS
+    )
+    if result.returncode != 0 or not result.stdout:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode('utf-8', 'ignore')[-500:]}")
+    
+    frame = Image.open(io.BytesIO(result.stdout))
+    frame.load()
+    
+    # Phones record in sensor orientation and store the display rotation in the track matrix
+    if track['rotation']:
+        frame = frame.transpose(track['rotation'])
+    return frame
+
+def find_video_track(moov):
+    """Sample tables, decoder config and display rotation of the first H.264/HEVC video track"""
+    for box_type, trak_payload, trak_end in iter_boxes(moov):
+        if box_type != b'trak':
+            continue
+        trak = child_boxes(moov, trak_payload, trak_end)
+        if b'mdia' not in trak:
+            continue
+        mdia = child_boxes(moov, *trak[b'mdia'])
+        if b'hdlr' not in mdia or b'minf' not in mdia or b'mdhd' not in mdia:
+            continue
+        hdlr_payload = mdia[b'hdlr'][0]
+        if moov[hdlr_payload + 8:hdlr_payload + 12] != b'vide':
+            continue
+        
+        minf = child_boxes(moov, *mdia[b'minf'])
+        if b'stbl' not in minf:
+            continue
+        stbl = child_boxes(moov, *minf[b'stbl'])
+        
+        track = parse_sample_description(moov, *stbl[b'stsd'])
+        if track is None:
+            continue
+        
+        mdhd_payload = mdia[b'mdhd'][0]
+        timescale_offset = mdhd_payload + (20 if moov[mdhd_payload] == 1 else 12)
+        track['timescale'] = struct.unpack('>I', moov[timescale_offset:timescale_offset + 4])[0]
+        track['rotation'] = parse_rotation(moov, trak[b'tkhd'][0]) if b'tkhd' in trak else None
+        track['stts'] = read_table(moov, stbl[b'stts'][0], 2)
+        track['stsc'] = read_table(moov, stbl[b'stsc'][0], 3)
+        track['stss'] = [row[0] for row in read_table(moov, stbl[b'stss'][0], 1)] if b'stss' in stbl else None
+        
+        stsz_payload = stbl[b'stsz'][0]
+        sample_size, sample_count = struct.unpack('>II', moov[stsz_payload + 4:stsz_payload + 12])
+        track['sample_count'] = sample_count
+        track['sample_sizes'] = (None if sample_size else
+                                 struct.unpack(f'>{sample_count}I', moov[stsz_payload + 12:stsz_payload + 12 + 4 * sample_count]))
+        track['sample_size'] = sample_size
+        
+        if b'stco' in stbl:
+            track['chunk_offsets'] = [row[0] for row in read_table(moov, stbl[b'stco'][0], 1)]
+        else:
+            co64_payload = stbl[b'co64'][0]
+            count = struct.unpack('>I', moov[co64_payload + 4:co64_payload + 8])[0]
+            track['chunk_offsets'] = struct.unpack(f'>{count}Q', moov[co64_payload + 8:co64_payload + 8 + 8 * count])
+        return track
+    return None
+
+def read_table(data, payload, columns):
+    """Full-box table of 32-bit rows: version/flags, entry count, then entries"""
+    count = struct.unpack('>I', data[payload + 4:payload + 8])[0]
+    values = struct.unpack(f'>{count * columns}I', data[payload + 8:payload + 8 + 4 * count * columns])
+    return [values[i:i + columns] for i in range(0, len(values), columns)]
+
+def parse_sample_description(moov, payload, end):
+    """avcC/hvcC from the first sample entry: NAL length size and parameter sets"""
+    entry_start = payload + 8  # version/flags + entry count
+    for entry_type, entry_payload, entry_end in iter_boxes(moov, entry_start, end):
+        # Visual sample entry: 8 bytes of SampleEntry + 70 bytes of VisualSampleEntry fields
+        config = child_boxes(moov, entry_payload + 78, entry_end)
+        if entry_type in (b'avc1', b'avc3') and b'avcC' in config:
+            start, config_end = config[b'avcC']
+            avcc = moov[start:config_end]
+            # SPS count lives in the low 5 bits of byte 5; the PPS count byte follows the SPS list
+            sps, pos = read_parameter_sets(avcc, 6, avcc[5] & 0x1F)
+            pps, pos = read_parameter_sets(avcc, pos + 1, avcc[pos])
+            parameter_sets = sps + pps
+            return {'codec': 'h264', 'nal_length_size': (avcc[4] & 0x03) + 1, 'parameter_sets': parameter_sets}
+        if entry_type in (b'hvc1', b'hev1') and b'hvcC' in config:
+            start, config_end = config[b'hvcC']
+            hvcc = moov[start:config_end]
+            # Arrays of VPS/SPS/PPS: 1 byte NAL type, 2 bytes count, then length-prefixed units
+            parameter_sets = []
+            pos = 23
+            for _ in range(hvcc[22]):
+                units, pos = read_parameter_sets(hvcc, pos + 3, struct.unpack('>H', hvcc[pos + 1:pos + 3])[0])
+                parameter_sets.extend(units)
+            return {'codec': 'hevc', 'nal_length_size': (hvcc[21] & 0x03) + 1, 'parameter_sets': parameter_sets}
+    return None
+
+def read_parameter_sets(config, pos, count):
+    """Read `count` 16-bit length-prefixed NAL units; returns them and the position after them"""
+    units = []
+    for _ in range(count):
+        length = struct.unpack('>H', config[pos:pos + 2])[0]
+        units.append(config[pos + 2:pos + 2 + length])
+        pos += 2 + length
+    return units, pos
+
+def parse_rotation(moov, tkhd_payload):
+    """Display rotation from the tkhd matrix, as a Pillow transpose method"""
+    matrix_offset = tkhd_payload + (52 if moov[tkhd_payload] == 1 else 40)
+    a, b = struct.unpack('>ii', moov[matrix_offset:matrix_offset + 8])
+    if a == 0 and b > 0:
+        return Image.Transpose.ROTATE_270  # 90 degrees clockwise
+    if a == 0 and b < 0:
+        return Image.Transpose.ROTATE_90
+    if a < 0:
+        return Image.Transpose.ROTATE_180
+    return None
+
+def pick_keyframe(track):
+    """Sync sample nearest to POSTER_FRAME_SECONDS (clamped to the clip), 1-based"""
+    # Integer media time, so the sample number stays an int list index (tracks without stss return it as is)
+    target_time = int(POSTER_FRAME_SECONDS * track['timescale'])
+    total_duration = sum(count * delta for count, delta in track['stts'])
+    target_time = min(target_time, total_duration // 2)
+    
+    target_sample = 1
+    elapsed = 0
+    for count, delta in track['stts']:
+        if delta and elapsed + count * delta > target_time:
+            target_sample += (target_time - elapsed) // delta
+            break
+        elapsed += count * delta
+        target_sample += count
+    target_sample = max(1, min(target_sample, track['sample_count']))
+    
+    if not track['stss']:
+        return target_sample
+    return min(track['stss'], key=lambda sample: abs(sample - target_sample))
+
+def locate_sample(track, sample_number):
+    """Byte offset and size of a 1-based sample, via stsc (samples per chunk) and stco/co64"""
+    stsc = track['stsc']
+    first_sample = 1
+    for index, (first_chunk, samples_per_chunk, _) in enumerate(stsc):
+        last_chunk = stsc[index + 1][0] - 1 if index + 1 < len(stsc) else len(track['chunk_offsets'])
+        run_samples = (last_chunk - first_chunk + 1) * samples_per_chunk
+        if sample_number < first_sample + run_samples:
+            chunk = first_chunk + (sample_number - first_sample) // samples_per_chunk
+            first_in_chunk = first_sample + (chunk - first_chunk) * samples_per_chunk
+            break
+        first_sample += run_samples
+    else:
+        raise ValueError(f"Sample {sample_number} not found in sample table")
+    
+    offset = track['chunk_offsets'][chunk - 1]
+    if track['sample_sizes'] is None:
+        return offset + (sample_number - first_in_chunk) * track['sample_size'], track['sample_size']
+    sizes = track['sample_sizes']
+    offset += sum(sizes[first_in_chunk - 1:sample_number - 1])
+    return offset, sizes[sample_number - 1]
+
+@lru_cache(maxsize=None)
+def render_video_placeholder(size):
+    """Gradient + play icon, rendered once per size and reused (encoded WebP bytes)"""
+    from PIL import ImageDraw
+    
+    width, height = size
+    # Vertical gradient from dark to slightly lighter
+    gradient = Image.linear_gradient('L').resize(size).point(lambda value: 20 + value * 30 // 255)
+    img = Image.merge('RGB', (gradient, gradient, gradient))
+    draw = ImageDraw.Draw(img)
+    
+    # Draw play button circle
+    center_x, center_y = width // 2, height // 2
+    circle_radius = min(width, height) // 6
+    circle_bbox = [
+        center_x - circle_radius,
+        center_y - circle_radius,
+        center_x + circle_radius,
+        center_y + circle_radius
+    ]
+    draw.ellipse(circle_bbox, fill=(80, 80, 80), outline=(120, 120, 120), width=2)
+    
+    # Draw play triangle
+    triangle_size = circle_radius // 2
+    triangle_points = [
+        (center_x - triangle_size//2, center_y - triangle_size),
+        (center_x - triangle_size//2, center_y + triangle_size),
+        (center_x + triangle_size, center_y)
+    ]
+    draw.polygon(triangle_points, fill=(200, 200, 200))
+    
+    return encode_webp(img)
@@ -0,0 +1,72 @@
+"""
+Keyframe selection check: pick_keyframe and locate_sample on synthetic sample tables.
+
+Covers tracks with a sync sample table (stss) and without one (every sample is a keyframe,
+as written for intra-only encodes), fixed and per-sample sizes, and NTSC timescales. Exits
+with status 1 on any failure.
+
+    python poster_frame_check.py
+
+Needs Pillow and boto3 (index.py creates its client at import); not bundled into lambda.zip.
+"""
+
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('S3_BUCKET', 'poster-frame-check')
+import index
+
+def make_track(timescale, delta, sample_count, samples_per_chunk, stss=None, sample_size=0):
+    """Sample tables for a constant frame rate track stored in equal chunks"""
+    chunk_count = -(-sample_count // samples_per_chunk)
+    return {
+        'timescale': timescale,
+        'stts': [(sample_count, delta)],
+        'stsc': [(1, samples_per_chunk, 1)],
+        'stss': stss,
+        'sample_count': sample_count,
+        'sample_size': sample_size,
+        'sample_sizes': None if sample_size else tuple(1000 + n for n in range(sample_count)),
+        'chunk_offsets': [100000 * chunk for chunk in range(1, chunk_count + 1)]
+    }
+
+CASES = [
+    # name, track, expected sample number (POSTER_FRAME_SECONDS = 1.0)
+    ('30 fps, no stss', make_track(15360, 512, 90, 10), 31),
+    ('29.97 fps, no stss', make_track(30000, 1001, 90, 7), 30),
+    ('30 fps, keyframe every 2 s', make_track(15360, 512, 180, 10, stss=[1, 61, 121]), 1),
+    ('30 fps, keyframe every 0.5 s', make_track(15360, 512, 180, 10, stss=[1, 16, 31, 46]), 31),
+    ('short clip clamps to the middle', make_track(600, 20, 20, 5, sample_size=4096), 11),
+    ('fixed sample size, no stss', make_track(90000, 3000, 60, 4, sample_size=2048), 31)
+]
+
+def expected_location(track, sample_number):
+    """Offset and size by walking every sample, the slow way"""
+    samples_per_chunk = track['stsc'][0][1]
+    chunk, position = divmod(sample_number - 1, samples_per_chunk)
+    first_in_chunk = chunk * samples_per_chunk
+    if track['sample_sizes'] is None:
+        return track['chunk_offsets'][chunk] + position * track['sample_size'], track['sample_size']
+    sizes = track['sample_sizes']
+    return track['chunk_offsets'][chunk] + sum(sizes[first_in_chunk:sample_number - 1]), sizes[sample_number - 1]
+
+def main():
+    index.POSTER_FRAME_SECONDS = 1.0
+    failures = 0
+    for name, track, expected_sample in CASES:
+        sample_number = index.pick_keyframe(track)
+        try:
+            location = index.locate_sample(track, sample_number)
+        except Exception as e:
+            location = f"{type(e).__name__}: {e}"
+        ok = (type(sample_number) is int and sample_number == expected_sample
+              and location == expected_location(track, expected_sample))
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: sample {sample_number!r}, location {location}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,10 @@
 terraform {
   source = "git@github.com:jhoammoralesc/infrastructure-terraform-modules.git//aws-lambda"
+  # Publishes the gildarck-ffmpeg layer (layer/template.yaml); the static binary is downloaded once
+  before_hook "publish_ffmpeg_layer" {
+    commands = ["apply"]
+    execute  = ["bash", "-c", "cd ${get_terragrunt_dir()}/layer && (test -x ffmpeg/bin/ffmpeg || (mkdir -p ffmpeg/bin && curl -fsSL https://johnvansickle.com/ffmpeg/releases/ffmpeg-release-amd64-static.tar.xz | tar -xJ --strip-components=1 --wildcards -C ffmpeg/bin '*/ffmpeg')) && sam deploy --template-file template.yaml --stack-name gildarck-ffmpeg-layer --capabilities CAPABILITY_NAMED_IAM --resolve-s3 --profile ${local.aws_profile} || true"]
+  }
 }
 
 include "root" {
@@ -18,25 +23,29 @@ locals {
   vars           = read_terragrunt_config(find_in_parent_folders("env.hcl")).locals
   name           = "gildarck-thumbnail-generator"
   aws_account_id = read_terragrunt_config(find_in_parent_folders("account.hcl")).locals.aws_account_id
+  aws_profile    = read_terragrunt_config(find_in_parent_folders("account.hcl")).locals.aws_profile
   service_vars   = read_terragrunt_config(find_in_parent_folders("service.hcl"))
   tags           = merge(local.service_vars.locals.tags, { name = local.name })
 }
 
 inputs = {
   function_name  = local.name
-  description    = "Generate thumbnails for uploaded images"
+  description    = "Generate thumbnails for uploaded images and video poster frames"
   handler        = "index.lambda_handler"
   runtime        = "python3.12"
   timeout        = 300
-  memory_size    = 512
+  memory_size    = 1024
   publish        = true
   create_role    = true
   create_package = false
 
-  local_existing_package = "lambda-simple-layer.zip"
+  local_existing_package = "lambda.zip"
   
-  # Use public Pillow layer only
-  layers = ["arn:aws:lambda:us-east-1:770693421928:layer:Klayers-p312-pillow:1"]
+  # Public Pillow layer, plus our ffmpeg layer (published by the before_hook) for video poster frames
+  layers = [
+    "arn:aws:lambda:us-east-1:770693421928:layer:Klayers-p312-pillow:1",
+    "arn:aws:lambda:us-east-1:${local.aws_account_id}:layer:gildarck-ffmpeg:1"
+  ]
 
   attach_policy_statements = true
   policy_statements = {
@@ -62,13 +71,20 @@ inputs = {
   event_source_mapping = {
     sqs = {
       event_source_arn = dependency.sqs.outputs.queue_arn
-      batch_size       = 1
+      batch_size       = 10
+      maximum_batching_window_in_seconds = 5
+      # Failed messages are reported individually instead of retrying the whole batch
+      function_response_types = ["ReportBatchItemFailures"]
     }
   }
 
   environment_variables = {
     S3_BUCKET      = dependency.s3.outputs.s3_bucket_id
     SQS_QUEUE_URL  = dependency.sqs.outputs.queue_url
+    THUMBNAIL_WORKERS = "4"
+    # Video poster frames are decoded by the gildarck-ffmpeg layer binary; without it a placeholder is used
+    FFMPEG_PATH          = "/opt/bin/ffmpeg"
+    POSTER_FRAME_SECONDS = "1.0"
   }
 
   tags = local.tags
@@ -6,37 +6,145 @@ Handles individual and batch uploads with intelligent routing
 import json
 import boto3
 import os
+import random
+import time
 import uuid
 import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import logging
+import threading
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from sigv4_presigner import S3Presigner
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# AWS clients - Create fresh clients on each request
+# AWS clients - one registry per execution environment. Building a client resolves endpoints
+# and credentials (tens of ms), so handlers and per-file loops share these instead.
+CLIENT_CONFIG = Config(
+    max_pool_connections=int(os.environ.get('CLIENT_MAX_POOL_CONNECTIONS', '50')),
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'max_attempts': int(os.environ.get('CLIENT_MAX_ATTEMPTS', '5'))}
+)
+EXPIRED_CREDENTIAL_CODES = {'ExpiredToken', 'ExpiredTokenException', 'RequestExpired', 'InvalidClientTokenId'}
+
+# Own session: botocore caches resolved credentials per session, so a refresh needs a new one
+_session = boto3.session.Session()
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+_credentials_expired = False
+
+def get_client(service_name: str):
+    client = _clients.get(service_name)
+    if client is None:
+        # A boto3 session is not safe to build clients from concurrently
+        with _clients_lock:
+            client = _clients.get(service_name)
+            if client is None:
+                client = _session.client(service_name, config=CLIENT_CONFIG)
+                client.meta.events.register('after-call', flag_expired_credentials)
+                _clients[service_name] = client
+    return client
+
 def get_s3_client():
-    return boto3.client('s3')
+    return get_client('s3')
 
 def get_dynamodb():
-    return boto3.resource('dynamodb')
+    """The DynamoDB resource, built once per execution environment (Table helpers on the request thread)"""
+    resource = _clients.get('dynamodb_resource')
+    if resource is None:
+        with _clients_lock:
+            resource = _clients.get('dynamodb_resource')
+            if resource is None:
+                resource = _session.resource('dynamodb', config=CLIENT_CONFIG)
+                resource.meta.client.meta.events.register('after-call', flag_expired_credentials)
+                _clients['dynamodb_resource'] = resource
+    return resource
+
+def get_dynamodb_client():
+    """Low-level client of the shared resource: thread-safe, and still takes plain Python values.
+    Worker threads use this instead of building a resource (and a client) per pool thread."""
+    return get_dynamodb().meta.client
 
 def get_sqs_client():
-    return boto3.client('sqs')
+    return get_client('sqs')
+
+def get_presigner() -> S3Presigner:
+    """Local SigV4 presigner (bundled sigv4_presigner.py) sharing the registry's credentials"""
+    presigner = _clients.get('presigner')
+    if presigner is None:
+        with _clients_lock:
+            presigner = _clients.get('presigner')
+            if presigner is None:
+                presigner = S3Presigner(_session.get_credentials(), _session.region_name or 'us-east-1')
+                _clients['presigner'] = presigner
+    return presigner
+
+def reset_clients():
+    """Drop cached clients so the next call rebuilds them with freshly resolved credentials"""
+    global _session, _credentials_expired
+    with _clients_lock:
+        _session = boto3.session.Session()
+        _clients.clear()
+        _credentials_expired = False
+
+def flag_expired_credentials(parsed=None, **kwargs):
+    """botocore after-call hook: remember that AWS rejected our credentials as expired"""
+    global _credentials_expired
+    if isinstance(parsed, dict) and parsed.get('Error', {}).get('Code') in EXPIRED_CREDENTIAL_CODES:
+        _credentials_expired = True
 
 # Environment variables
 BUCKET_NAME = os.environ['BUCKET_NAME']
 BATCH_TABLE_NAME = os.environ['BATCH_TABLE_NAME']
 SQS_QUEUE_URL = os.environ['SQS_QUEUE_URL']
 DEDUPLICATION_TABLE = os.environ.get('DEDUPLICATION_TABLE', 'gildarck-media-metadata-dev')
+# user_id#file_hash -> file_id, written by media-processor; read in batches instead of FileHashIndex queries
+FILE_HASH_TABLE = os.environ.get('FILE_HASH_TABLE', 'gildarck-media-hashes-dev')
 MAX_PARALLEL_STREAMS = int(os.environ.get('MAX_PARALLEL_STREAMS', '10'))
 BATCH_THRESHOLD = int(os.environ.get('BATCH_THRESHOLD', '10'))
 CHUNK_SIZE = int(os.environ.get('CHUNK_SIZE', '50'))
+# 'lazy': chunks are a manifest and URLs are signed per chunk on request (/batch-chunk-urls).
+# 'queued': chunks also go through SQS to batch-processor-v2 (previous behaviour).
+CHUNK_MODE = os.environ.get('CHUNK_MODE', 'lazy').lower()
+
+# Upload progress: every issued S3 key gets a 'key#<s3_key>' item in the batch table pointing at its
+# batch, so media-processor can count S3 object-created events against the batch that issued the URL
+UPLOAD_INDEX_PREFIX = 'key#'
+
+# Long-polled /batch-status: API Gateway cuts integrations off at 29s, so holds stay below that
+BATCH_STATUS_MAX_WAIT = int(os.environ.get('BATCH_STATUS_MAX_WAIT', '25'))
+BATCH_STATUS_POLL_INTERVAL = 0.5
+BATCH_STATUS_MAX_POLL_INTERVAL = 4.0
+BATCH_STATUS_MAX_IDS = 100  # batch_get_item limit
 
-# DynamoDB tables - Get fresh connections
+# Chunk dispatch: DynamoDB and SQS batch APIs, retried with exponential backoff
+DYNAMODB_BATCH_WRITE_SIZE = 25
+DYNAMODB_BATCH_GET_SIZE = 100
+SQS_BATCH_SIZE = 10
+SQS_BATCH_MAX_BYTES = 256 * 1024
+DISPATCH_MAX_ATTEMPTS = int(os.environ.get('DISPATCH_MAX_ATTEMPTS', '8'))
+DISPATCH_BASE_BACKOFF = 0.05
+DISPATCH_MAX_BACKOFF = 2.0
+
+# Multipart uploads: large files go up in parallel, resumable parts (S3 limits: 5 MiB-5 GiB parts,
+# 10,000 parts, 5 TiB objects)
+MULTIPART_PART_SIZE = int(os.environ.get('MULTIPART_PART_SIZE', str(16 * 1024 * 1024)))
+MULTIPART_URL_WINDOW = int(os.environ.get('MULTIPART_URL_WINDOW', '50'))
+MULTIPART_URL_EXPIRES_IN = int(os.environ.get('MULTIPART_URL_EXPIRES_IN', '3600'))
+MULTIPART_MIN_PART_SIZE = 5 * 1024 * 1024
+MULTIPART_MAX_PARTS = 10000
+MULTIPART_MAX_OBJECT_SIZE = 5 * 1024 ** 4
+
+# Client-supplied content hashes must be hex SHA-256, like media-processor's file_hash
+SHA256_HEX_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# DynamoDB tables - Table objects are cheap; the underlying resource is cached
 def get_batch_table():
     return get_dynamodb().Table(BATCH_TABLE_NAME)
 
@@ -45,6 +153,11 @@ def get_dedup_table():
 
 def lambda_handler(event, context):
     """Main Lambda handler"""
+    # Clients are only rebuilt between requests, never under a running worker pool
+    if _credentials_expired:
+        logger.warning("Credentials expired on a previous request, rebuilding AWS clients")
+        reset_clients()
+    
     try:
         # Extract HTTP method and path
         http_method = event.get('httpMethod', 'POST')
@@ -75,6 +188,18 @@ def lambda_handler(event, context):
             return handle_batch_chunk_urls(event, cors_headers)
         elif path.endswith('/upload-simple') or path.endswith('/upload-simple/'):
             return handle_simple_upload(event, cors_headers)
+        elif path.endswith('/check-duplicate') or path.endswith('/check-duplicate/'):
+            return handle_check_duplicate(event, cors_headers)
+        elif path.endswith('/multipart-initiate') or path.endswith('/multipart-initiate/'):
+            return handle_multipart_initiate(event, cors_headers)
+        elif path.endswith('/multipart-part-urls') or path.endswith('/multipart-part-urls/'):
+            return handle_multipart_part_urls(event, cors_headers)
+        elif path.endswith('/multipart-parts') or path.endswith('/multipart-parts/'):
+            return handle_multipart_list_parts(event, cors_headers)
+        elif path.endswith('/multipart-complete') or path.endswith('/multipart-complete/'):
+            return handle_multipart_complete(event, cors_headers)
+        elif path.endswith('/multipart-abort') or path.endswith('/multipart-abort/'):
+            return handle_multipart_abort(event, cors_headers)
         else:
             return {
                 'statusCode': 404,
@@ -107,13 +232,29 @@ def handle_batch_initiate(event, cors_headers):
         
         logger.info(f"Initiating batch upload for {len(files)} files, user: {user_id}")
         
+        # Skip files whose content the user already has (client-supplied file_hash)
+        files, duplicates = filter_duplicate_files(files, user_id)
+        
+        if not files:
+            logger.info(f"All {len(duplicates)} files already uploaded for user: {user_id}")
+            return {
+                'statusCode': 200,
+                'headers': cors_headers,
+                'body': json.dumps({
+                    'status': 'completed',
+                    'upload_urls': [],
+                    'duplicates': duplicates,
+                    'strategy': 'deduplicated'
+                })
+            }
+        
         # Determine strategy based on file count
         if len(files) < BATCH_THRESHOLD:
             # Simple batch - process immediately
-            return process_simple_batch(files, user_id, cors_headers)
+            return process_simple_batch(files, user_id, cors_headers, duplicates)
         else:
             # Large batch - use SQS chunking
-            return process_chunked_batch(files, user_id, cors_headers)
+            return process_chunked_batch(files, user_id, cors_headers, duplicates)
             
     except Exception as e:
         logger.error(f"Error in batch initiate: {str(e)}")
@@ -124,47 +265,81 @@ def handle_batch_initiate(event, cors_headers):
         }
 
 def handle_batch_status(event, cors_headers):
-    """Handle batch status check"""
+    """Handle batch status check, optionally long-polling until the batch counters change"""
     try:
-        # Get batch_id from query parameters
+        # batch_id for one batch, batch_ids (comma-separated) for several in one request
         query_params = event.get('queryStringParameters') or {}
         batch_id = query_params.get('batch_id')
+        batch_ids = list(dict.fromkeys(b for b in (query_params.get('batch_ids') or '').split(',') if b))
         
-        if not batch_id:
+        if not batch_id and not batch_ids:
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
                 'body': json.dumps({'error': 'batch_id required'})
             }
+        if len(batch_ids) > BATCH_STATUS_MAX_IDS:
+            return {
+                'statusCode': 400,
+                'headers': cors_headers,
+                'body': json.dumps({'error': f'At most {BATCH_STATUS_MAX_IDS} batch_ids per request'})
+            }
+        try:
+            wait = min(max(int(query_params.get('wait') or 0), 0), BATCH_STATUS_MAX_WAIT)
+        except ValueError:
+            return {
+                'statusCode': 400,
+                'headers': cors_headers,
+                'body': json.dumps({'error': 'wait must be a number of seconds'})
+            }
         
-        # Get batch status from DynamoDB
-        response = get_batch_table().get_item(Key={'batch_id': batch_id})
+        user_id = extract_user_id(event)
+        ids = batch_ids or [batch_id]
+        batch_items = read_batch_items(ids, user_id)
+        change_token = get_change_token(ids, batch_items)
         
-        if 'Item' not in response:
+        # Long poll: hold the request until the counters move away from `since` (or from the first
+        # read), re-reading with growing intervals. Finished batches never change, so they return now.
+        baseline = query_params.get('since') or change_token
+        deadline = time.monotonic() + wait
+        interval = BATCH_STATUS_POLL_INTERVAL
+        while change_token == baseline and not batches_finished(ids, batch_items):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, BATCH_STATUS_MAX_POLL_INTERVAL)
+            batch_items = read_batch_items(ids, user_id)
+            change_token = get_change_token(ids, batch_items)
+        
+        changed = change_token != baseline
+        
+        if batch_ids:
+            return {
+                'statusCode': 200,
+                'headers': cors_headers,
+                'body': json.dumps({
+                    'batches': [build_batch_status(b, batch_items[b]) for b in batch_ids if b in batch_items],
+                    'missing': [b for b in batch_ids if b not in batch_items],
+                    'change_token': change_token,
+                    'changed': changed
+                })
+            }
+        
+        if batch_id not in batch_items:
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
                 'body': json.dumps({'error': 'Batch not found'})
             }
         
-        batch_item = response['Item']
-        
-        # Calculate progress
-        total_files = int(batch_item.get('total_files', 0))
-        processed_files = int(batch_item.get('processed_files', 0))
-        progress = (processed_files / total_files * 100) if total_files > 0 else 0
-        
         return {
             'statusCode': 200,
             'headers': cors_headers,
             'body': json.dumps({
-                'batch_id': batch_id,
-                'status': batch_item.get('status', 'unknown'),
-                'progress': round(progress, 2),
-                'total_files': total_files,
-                'processed_files': processed_files,
-                'created_at': batch_item.get('created_at'),
-                'updated_at': batch_item.get('updated_at')
+                **build_batch_status(batch_id, batch_items[batch_id]),
+                'change_token': change_token,
+                'changed': changed
             })
         }
         
@@ -176,6 +351,115 @@ def handle_batch_status(event, cors_headers):
             'body': json.dumps({'error': str(e)})
         }
 
+def read_batch_items(batch_ids: List[str], user_id: str) -> Dict[str, Dict]:
+    """One get_item for a single batch, batch_get_item (retrying UnprocessedKeys) for several.
+    
+    Items not owned by user_id (other users' batches, key#<s3_key> index items) are left out,
+    so callers report them exactly like batches that do not exist.
+    """
+    if len(batch_ids) == 1:
+        item = get_batch_table().get_item(Key={'batch_id': batch_ids[0]}).get('Item')
+        return {batch_ids[0]: item} if item and item.get('user_id') == user_id else {}
+    
+    items = {}
+    request = {BATCH_TABLE_NAME: {'Keys': [{'batch_id': b} for b in batch_ids]}}
+    for attempt in range(DISPATCH_MAX_ATTEMPTS):
+        response = get_dynamodb().batch_get_item(RequestItems=request)
+        for item in response['Responses'].get(BATCH_TABLE_NAME, []):
+            if item.get('user_id') == user_id:
+                items[item['batch_id']] = item
+        request = response.get('UnprocessedKeys')
+        if not request:
+            return items
+        backoff(attempt)
+    raise RuntimeError(f"{len(request[BATCH_TABLE_NAME]['Keys'])} batch status reads still unprocessed")
+
+def get_change_token(batch_ids: List[str], batch_items: Dict[str, Dict]) -> str:
+    """Short digest of the fields that move while a batch uploads; equal tokens mean nothing changed"""
+    state = []
+    for b in batch_ids:
+        item = batch_items.get(b) or {}
+        state.append(':'.join(str(item.get(field, '')) for field in (
+            'status', 'urls_generated', 'uploaded_files', 'processed_files', 'failed_files')))
+    return hashlib.sha256('|'.join(state).encode('utf-8')).hexdigest()[:16]
+
+def batches_finished(batch_ids: List[str], batch_items: Dict[str, Dict]) -> bool:
+    for b in batch_ids:
+        item = batch_items.get(b)
+        if item is not None and not is_batch_finished(item):
+            return False
+    return True
+
+def is_batch_finished(batch_item: Dict) -> bool:
+    total_files = int(batch_item.get('total_files', 0))
+    finished_files = int(batch_item.get('processed_files', 0)) + int(batch_item.get('failed_files', 0))
+    return total_files > 0 and finished_files >= total_files
+
+def build_batch_status(batch_id: str, batch_item: Dict) -> Dict:
+    """Status payload for one batch"""
+    # Calculate progress from files that actually arrived in S3 (counted by media-processor)
+    total_files = int(batch_item.get('total_files', 0))
+    total_bytes = int(batch_item.get('total_bytes', 0))
+    uploaded_files = int(batch_item.get('uploaded_files', 0))
+    uploaded_bytes = int(batch_item.get('uploaded_bytes', 0))
+    processed_files = int(batch_item.get('processed_files', 0))
+    failed_files = int(batch_item.get('failed_files', 0))
+    finished_files = processed_files + failed_files
+    progress = (finished_files / total_files * 100) if total_files > 0 else 0
+    
+    return {
+        'batch_id': batch_id,
+        'status': batch_item.get('status', 'unknown'),
+        'upload_status': get_upload_status(total_files, uploaded_files, finished_files, failed_files),
+        'progress': round(progress, 2),
+        'total_files': total_files,
+        'total_bytes': total_bytes,
+        'urls_generated': int(batch_item.get('urls_generated', 0)),
+        'uploaded_files': uploaded_files,
+        'uploaded_bytes': uploaded_bytes,
+        'processed_files': processed_files,
+        'failed_files': failed_files,
+        **get_upload_rates(batch_item, total_files, total_bytes),
+        'created_at': batch_item.get('created_at'),
+        'updated_at': batch_item.get('updated_at')
+    }
+
+def get_upload_status(total_files: int, uploaded_files: int, finished_files: int, failed_files: int) -> str:
+    if total_files and finished_files >= total_files:
+        return 'completed_with_errors' if failed_files else 'completed'
+    if uploaded_files >= total_files > 0:
+        return 'processing'
+    return 'uploading' if uploaded_files else 'waiting'
+
+def get_upload_rates(batch_item: Dict, total_files: int, total_bytes: int) -> Dict:
+    """Upload throughput since the first file landed and the ETA for the rest of the batch"""
+    uploaded_files = int(batch_item.get('uploaded_files', 0))
+    uploaded_bytes = int(batch_item.get('uploaded_bytes', 0))
+    first_upload_at = batch_item.get('first_upload_at')
+    if not first_upload_at or not uploaded_files:
+        return {'files_per_second': 0, 'bytes_per_second': 0, 'eta_seconds': None}
+    
+    # A finished upload phase is measured up to its last file, not up to now
+    done = uploaded_files >= total_files
+    end = datetime.fromisoformat(batch_item['last_upload_at']) if done else datetime.utcnow()
+    elapsed = max((end - datetime.fromisoformat(first_upload_at)).total_seconds(), 1.0)
+    files_per_second = uploaded_files / elapsed
+    bytes_per_second = uploaded_bytes / elapsed
+    
+    # Bytes predict better than file counts when the client declared sizes
+    if done:
+        eta_seconds = 0
+    elif total_bytes > uploaded_bytes and bytes_per_second > 0:
+        eta_seconds = (total_bytes - uploaded_bytes) / bytes_per_second
+    else:
+        eta_seconds = (total_files - uploaded_files) / files_per_second
+    
+    return {
+        'files_per_second': round(files_per_second, 3),
+        'bytes_per_second': round(bytes_per_second),
+        'eta_seconds': round(eta_seconds)
+    }
+
 def handle_batch_chunk_urls(event, cors_headers):
     """Generate presigned URLs for specific chunk - Google Photos style"""
     try:
@@ -239,14 +523,11 @@ def handle_batch_chunk_urls(event, cors_headers):
         for filename in file_names:
             s3_key = generate_s3_key(user_id, filename)
             
-            presigned_url = get_s3_client().generate_presigned_url(
-                'put_object',
-                Params={
-                    'Bucket': BUCKET_NAME,
-                    'Key': s3_key,
-                    'ContentType': 'application/octet-stream'
-                },
-                ExpiresIn=900  # 15 minutes - Google Photos style
+            presigned_url = get_presigner().presign_put_object(
+                BUCKET_NAME,
+                s3_key,
+                expires_in=900,  # 15 minutes - Google Photos style
+                content_type='application/octet-stream'
             )
             
             upload_urls.append({
@@ -255,6 +536,22 @@ def handle_batch_chunk_urls(event, cors_headers):
                 's3_key': s3_key
             })
         
+        # Index the chunk's keys once (again only if the keys moved to a new month folder)
+        key_prefix = upload_urls[0]['s3_key'].rsplit('/', 1)[0] if upload_urls else None
+        if key_prefix and chunk.get('indexed_key_prefix') != key_prefix:
+            index_upload_keys(batch_id, [url['s3_key'] for url in upload_urls])
+            get_batch_table().update_item(
+                Key={'batch_id': chunk_batch_id},
+                UpdateExpression="SET indexed_key_prefix = :prefix",
+                ExpressionAttributeValues={':prefix': key_prefix}
+            )
+            if 'indexed_key_prefix' not in chunk:
+                get_batch_table().update_item(
+                    Key={'batch_id': batch_id},
+                    UpdateExpression="ADD urls_generated :count",
+                    ExpressionAttributeValues={':count': len(upload_urls)}
+                )
+        
         return {
             'statusCode': 200,
             'headers': cors_headers,
@@ -295,14 +592,11 @@ def handle_simple_upload(event, cors_headers):
         s3_key = generate_s3_key(user_id, filename)
         
         # Generate presigned URL
-        presigned_url = get_s3_client().generate_presigned_url(
-            'put_object',
-            Params={
-                'Bucket': BUCKET_NAME,
-                'Key': s3_key,
-                'ContentType': content_type
-            },
-            ExpiresIn=3600
+        presigned_url = get_presigner().presign_put_object(
+            BUCKET_NAME,
+            s3_key,
+            expires_in=3600,
+            content_type=content_type
         )
         
         return {
@@ -323,7 +617,291 @@ def handle_simple_upload(event, cors_headers):
             'body': json.dumps({'error': str(e)})
         }
 
-def process_simple_batch(files: List[Dict], user_id: str, cors_headers: Dict) -> Dict:
+def handle_multipart_initiate(event, cors_headers):
+    """Start a multipart upload for a large file and hand out the first window of part URLs"""
+    try:
+        body = json.loads(event.get('body', '{}'))
+        filename = body.get('filename')
+        content_type = body.get('contentType', 'application/octet-stream')
+        user_id = extract_user_id(event)
+        
+        try:
+            file_size = int(body.get('fileSize', 0))
+        except (TypeError, ValueError):
+            file_size = 0
+        if not filename or file_size <= 0:
+            return {
+                'statusCode': 400,
+                'headers': cors_headers,
+                'body': json.dumps({'error': 'filename and fileSize required'})
+            }
+        if file_size > MULTIPART_MAX_OBJECT_SIZE:
+            return {
+                'statusCode': 400,
+                'headers': cors_headers,
+                'body': json.dumps({'error': f'fileSize exceeds {MULTIPART_MAX_OBJECT_SIZE} bytes'})
+            }
+        
+        part_size = get_multipart_part_size(file_size)
+        part_count = -(-file_size // part_size)
+        s3_key = generate_s3_key(user_id, filename)
+        
+        response = get_s3_client().create_multipart_upload(
+            Bucket=BUCKET_NAME,
+            Key=s3_key,
+            ContentType=content_type
+        )
+        upload_id = response['UploadId']
+        
+        return {
+            'statusCode': 200,
+            'headers': cors_headers,
+            'body': json.dumps({
+                'upload_id': upload_id,
+                's3_key': s3_key,
+                'part_size': part_size,
+                'part_count': part_count,
+                'part_urls': generate_part_urls(s3_key, upload_id, 1, part_count),
+                'expires_in': MULTIPART_URL_EXPIRES_IN
+            })
+        }
+        
+    except Exception as e:
+        logger.error(f"Error initiating multipart upload: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def handle_multipart_part_urls(event, cors_headers):
+    """Next window of upload_part URLs, starting at start_part"""
+    try:
+        body = json.loads(event.get('body', '{}'))
+        s3_key, upload_id = get_multipart_target(body, extract_user_id(event))
+        start_part = int(body.get('start_part', 1))
+        part_count = int(body.get('part_count', MULTIPART_MAX_PARTS))
+        if not 1 <= start_part <= part_count <= MULTIPART_MAX_PARTS:
+            raise ValueError('start_part must be between 1 and part_count')
+        
+        return {
+            'statusCode': 200,
+            'headers': cors_headers,
+            'body': json.dumps({
+                'upload_id': upload_id,
+                's3_key': s3_key,
+                'part_urls': generate_part_urls(s3_key, upload_id, start_part, part_count),
+                'expires_in': MULTIPART_URL_EXPIRES_IN
+            })
+        }
+        
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        logger.error(f"Error generating part URLs: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def handle_multipart_list_parts(event, cors_headers):
+    """Parts S3 already holds for an upload, so an interrupted client can resume"""
+    try:
+        body = json.loads(event.get('body', '{}'))
+        s3_key, upload_id = get_multipart_target(body, extract_user_id(event))
+        parts = list_uploaded_parts(s3_key, upload_id)
+        
+        return {
+            'statusCode': 200,
+            'headers': cors_headers,
+            'body': json.dumps({
+                'upload_id': upload_id,
+                's3_key': s3_key,
+                'parts': [
+                    {'part_number': p['PartNumber'], 'etag': p['ETag'], 'size': p['Size']}
+                    for p in parts
+                ],
+                'uploaded_bytes': sum(p['Size'] for p in parts)
+            })
+        }
+        
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': json.dumps({'error': str(e)})
+        }
+    except ClientError as e:
+        return multipart_client_error(e, 'listing parts', cors_headers)
+    except Exception as e:
+        logger.error(f"Error listing parts: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def handle_multipart_complete(event, cors_headers):
+    """Assemble the uploaded parts into the final object"""
+    try:
+        body = json.loads(event.get('body', '{}'))
+        s3_key, upload_id = get_multipart_target(body, extract_user_id(event))
+        
+        # Parts reported by the client, or whatever S3 has received when the client lost track
+        if body.get('parts'):
+            parts = [
+                {'PartNumber': int(p['part_number']), 'ETag': p['etag']}
+                for p in body['parts']
+            ]
+        else:
+            parts = [
+                {'PartNumber': p['PartNumber'], 'ETag': p['ETag']}
+                for p in list_uploaded_parts(s3_key, upload_id)
+            ]
+        if not parts:
+            raise ValueError('no parts uploaded')
+        
+        response = get_s3_client().complete_multipart_upload(
+            Bucket=BUCKET_NAME,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': sorted(parts, key=lambda p: p['PartNumber'])}
+        )
+        
+        return {
+            'statusCode': 200,
+            'headers': cors_headers,
+            'body': json.dumps({
+                's3_key': s3_key,
+                'etag': response.get('ETag'),
+                'part_count': len(parts),
+                'status': 'completed'
+            })
+        }
+        
+    except (ValueError, KeyError, TypeError) as e:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': json.dumps({'error': f'Invalid request: {str(e)}'})
+        }
+    except ClientError as e:
+        return multipart_client_error(e, 'completing multipart upload', cors_headers)
+    except Exception as e:
+        logger.error(f"Error completing multipart upload: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def handle_multipart_abort(event, cors_headers):
+    """Abort an upload so S3 discards the parts received so far"""
+    try:
+        body = json.loads(event.get('body', '{}'))
+        s3_key, upload_id = get_multipart_target(body, extract_user_id(event))
+        
+        get_s3_client().abort_multipart_upload(
+            Bucket=BUCKET_NAME,
+            Key=s3_key,
+            UploadId=upload_id
+        )
+        
+        return {
+            'statusCode': 200,
+            'headers': cors_headers,
+            'body': json.dumps({'s3_key': s3_key, 'status': 'aborted'})
+        }
+        
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': json.dumps({'error': str(e)})
+        }
+    except ClientError as e:
+        return multipart_client_error(e, 'aborting multipart upload', cors_headers)
+    except Exception as e:
+        logger.error(f"Error aborting multipart upload: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def get_multipart_part_size(file_size: int) -> int:
+    """Configured part size, grown (in whole MiB) when the file would need more than 10,000 parts"""
+    part_size = max(MULTIPART_PART_SIZE, MULTIPART_MIN_PART_SIZE)
+    if -(-file_size // part_size) > MULTIPART_MAX_PARTS:
+        mib = 1024 * 1024
+        part_size = -(-file_size // MULTIPART_MAX_PARTS // mib) * mib
+    return part_size
+
+def get_multipart_target(body: Dict, user_id: str) -> Tuple[str, str]:
+    """s3_key/upload_id from the request; the key must live under the caller's own prefix"""
+    s3_key = body.get('s3_key')
+    upload_id = body.get('upload_id')
+    if not s3_key or not upload_id:
+        raise ValueError('s3_key and upload_id required')
+    if not s3_key.startswith(f"{user_id}/originals/"):
+        raise ValueError('s3_key does not belong to this user')
+    return s3_key, upload_id
+
+def generate_part_urls(s3_key: str, upload_id: str, start_part: int, part_count: int) -> List[Dict]:
+    """Presigned upload_part URLs for one window of parts"""
+    presigner = get_presigner()
+    end_part = min(part_count, start_part + MULTIPART_URL_WINDOW - 1)
+    return [
+        {
+            'part_number': part_number,
+            'upload_url': presigner.presign_upload_part(
+                BUCKET_NAME,
+                s3_key,
+                upload_id,
+                part_number,
+                expires_in=MULTIPART_URL_EXPIRES_IN
+            )
+        }
+        for part_number in range(start_part, end_part + 1)
+    ]
+
+def list_uploaded_parts(s3_key: str, upload_id: str) -> List[Dict]:
+    parts = []
+    kwargs = {'Bucket': BUCKET_NAME, 'Key': s3_key, 'UploadId': upload_id}
+    while True:
+        response = get_s3_client().list_parts(**kwargs)
+        parts.extend(response.get('Parts', []))
+        if not response.get('IsTruncated'):
+            return parts
+        kwargs['PartNumberMarker'] = response['NextPartNumberMarker']
+
+def multipart_client_error(error: ClientError, action: str, cors_headers: Dict) -> Dict:
+    code = error.response.get('Error', {}).get('Code')
+    if code == 'NoSuchUpload':
+        return {
+            'statusCode': 404,
+            'headers': cors_headers,
+            'body': json.dumps({'error': 'Upload not found (already completed or aborted)'})
+        }
+    if code in ('InvalidPart', 'InvalidPartOrder', 'EntityTooSmall'):
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': json.dumps({'error': str(error)})
+        }
+    logger.error(f"Error {action}: {str(error)}")
+    return {
+        'statusCode': 500,
+        'headers': cors_headers,
+        'body': json.dumps({'error': str(error)})
+    }
+
+def process_simple_batch(files: List[Dict], user_id: str, cors_headers: Dict, duplicates: Optional[List[Dict]] = None) -> Dict:
     """Process small batch immediately"""
     try:
         batch_id = str(uuid.uuid4())
@@ -336,14 +914,11 @@ def process_simple_batch(files: List[Dict], user_id: str, cors_headers: Dict) ->
             
             s3_key = generate_s3_key(user_id, filename)
             
-            presigned_url = get_s3_client().generate_presigned_url(
-                'put_object',
-                Params={
-                    'Bucket': BUCKET_NAME,
-                    'Key': s3_key,
-                    'ContentType': content_type
-                },
-                ExpiresIn=3600
+            presigned_url = get_presigner().presign_put_object(
+                BUCKET_NAME,
+                s3_key,
+                expires_in=3600,
+                content_type=content_type
             )
             
             upload_urls.append({
@@ -360,7 +935,9 @@ def process_simple_batch(files: List[Dict], user_id: str, cors_headers: Dict) ->
                 'user_id': user_id,
                 'status': 'completed',
                 'total_files': len(files),
-                'processed_files': len(files),
+                'total_bytes': get_declared_bytes(files),
+                'urls_generated': len(upload_urls),
+                'processed_files': 0,
                 'file_names': [f['filename'] for f in files],
                 'strategy': {'type': 'simple'},
                 'created_at': datetime.utcnow().isoformat(),
@@ -369,6 +946,8 @@ def process_simple_batch(files: List[Dict], user_id: str, cors_headers: Dict) ->
             }
         )
         
+        index_upload_keys(batch_id, [url['s3_key'] for url in upload_urls])
+        
         logger.info(f"Simple batch {batch_id} completed with {len(upload_urls)} URLs")
         
         return {
@@ -378,6 +957,7 @@ def process_simple_batch(files: List[Dict], user_id: str, cors_headers: Dict) ->
                 'batch_id': batch_id,
                 'status': 'completed',
                 'upload_urls': upload_urls,
+                'duplicates': duplicates or [],
                 'strategy': 'simple'
             })
         }
@@ -386,74 +966,75 @@ def process_simple_batch(files: List[Dict], user_id: str, cors_headers: Dict) ->
         logger.error(f"Error processing simple batch: {str(e)}")
         raise
 
-def process_chunked_batch(files: List[Dict], user_id: str, cors_headers: Dict) -> Dict:
-    """Process large batch using SQS chunks"""
+def process_chunked_batch(files: List[Dict], user_id: str, cors_headers: Dict, duplicates: Optional[List[Dict]] = None) -> Dict:
+    """Process large batch as chunks: a manifest signed on demand (lazy) or SQS chunks (queued)"""
     try:
+        lazy = CHUNK_MODE == 'lazy'
         master_batch_id = str(uuid.uuid4())
         
         # Split files into chunks
         file_chunks = [files[i:i + CHUNK_SIZE] for i in range(0, len(files), CHUNK_SIZE)]
         
-        queued_batches = []
-        
-        # Send each chunk to SQS
-        for i, chunk in enumerate(file_chunks):
-            chunk_batch_id = str(uuid.uuid4())
-            
-            # Send to SQS
-            message = {
-                'batch_id': chunk_batch_id,
-                'master_batch_id': master_batch_id,
-                'user_id': user_id,
-                'files': chunk,
-                'chunk_index': i,
-                'total_chunks': len(file_chunks),
-                'strategy': {'type': 'chunked'}
-            }
-            
-            get_sqs_client().send_message(
-                QueueUrl=SQS_QUEUE_URL,
-                MessageBody=json.dumps(message)
-            )
-            
-            # Store chunk metadata
-            get_batch_table().put_item(
-                Item={
-                    'batch_id': chunk_batch_id,
-                    'master_batch_id': master_batch_id,
-                    'user_id': user_id,
-                    'status': 'queued',
-                    'total_files': len(chunk),
-                    'processed_files': 0,
-                    'file_names': [f['filename'] for f in chunk],
-                    'strategy': {'type': 'chunked'},
-                    'chunk_index': i,
-                    'total_chunks': len(file_chunks),
-                    'created_at': datetime.utcnow().isoformat(),
-                    'ttl': int((datetime.utcnow() + timedelta(hours=24)).timestamp())
-                }
-            )
-            
-            queued_batches.append(chunk_batch_id)
+        queued_batches = [str(uuid.uuid4()) for _ in file_chunks]
         
-        # Store master batch metadata
+        # Store master batch metadata first so chunk completions always find it
         get_batch_table().put_item(
             Item={
                 'batch_id': master_batch_id,
                 'user_id': user_id,
                 'status': 'processing',
                 'total_files': len(files),
+                'total_bytes': get_declared_bytes(files),
                 'processed_files': 0,
                 'total_chunks': len(file_chunks),
                 'completed_chunks': 0,
                 'queued_batches': queued_batches,
                 'strategy': 'chunked',
+                'chunk_mode': CHUNK_MODE,
                 'created_at': datetime.utcnow().isoformat(),
                 'ttl': int((datetime.utcnow() + timedelta(hours=24)).timestamp())
             }
         )
         
-        logger.info(f"Chunked batch {master_batch_id} queued with {len(file_chunks)} chunks")
+        created_at = datetime.utcnow().isoformat()
+        ttl = int((datetime.utcnow() + timedelta(hours=24)).timestamp())
+        chunk_items = []
+        messages = []
+        for i, chunk in enumerate(file_chunks):
+            chunk_batch_id = queued_batches[i]
+            chunk_items.append({
+                'batch_id': chunk_batch_id,
+                'master_batch_id': master_batch_id,
+                'user_id': user_id,
+                # Lazy chunks are complete as stored: URLs are signed when the client asks for them
+                'status': 'ready' if lazy else 'queued',
+                'total_files': len(chunk),
+                'processed_files': 0,
+                'file_names': [f['filename'] for f in chunk],
+                'strategy': {'type': 'chunked'},
+                'chunk_index': i,
+                'total_chunks': len(file_chunks),
+                'created_at': created_at,
+                'ttl': ttl
+            })
+            if lazy:
+                continue
+            messages.append({
+                'batch_id': chunk_batch_id,
+                'master_batch_id': master_batch_id,
+                'user_id': user_id,
+                'files': chunk,
+                'chunk_index': i,
+                'total_chunks': len(file_chunks),
+                'strategy': {'type': 'chunked'}
+            })
+        
+        # Chunk metadata is stored before any chunk is queued; both go out in batches, concurrently
+        put_items_batched(BATCH_TABLE_NAME, chunk_items)
+        if messages:
+            send_messages_batched(SQS_QUEUE_URL, [json.dumps(message) for message in messages])
+        
+        logger.info(f"Chunked batch {master_batch_id} ({CHUNK_MODE}) created with {len(file_chunks)} chunks")
         
         return {
             'statusCode': 200,
@@ -463,7 +1044,9 @@ def process_chunked_batch(files: List[Dict], user_id: str, cors_headers: Dict) -
                 'status': 'processing',
                 'total_chunks': len(file_chunks),
                 'queued_batches': queued_batches,
-                'strategy': 'chunked'
+                'duplicates': duplicates or [],
+                'strategy': 'chunked',
+                'chunk_mode': CHUNK_MODE
             })
         }
         
@@ -471,6 +1054,198 @@ def process_chunked_batch(files: List[Dict], user_id: str, cors_headers: Dict) -
         logger.error(f"Error processing chunked batch: {str(e)}")
         raise
 
+def get_declared_bytes(files: List[Dict]) -> int:
+    """Sum of client-declared file sizes (0 when the client did not send them)"""
+    total = 0
+    for file_info in files:
+        try:
+            total += max(int(file_info.get('size', file_info.get('fileSize', 0))), 0)
+        except (TypeError, ValueError):
+            continue
+    return total
+
+def index_upload_keys(batch_id: str, s3_keys: List[str]):
+    """Point each issued S3 key at its batch so media-processor can count the upload against it"""
+    ttl = int((datetime.utcnow() + timedelta(hours=24)).timestamp())
+    # batch_write_item rejects duplicate keys in one request (same filename twice in a batch)
+    put_items_batched(BATCH_TABLE_NAME, [
+        {'batch_id': UPLOAD_INDEX_PREFIX + s3_key, 'upload_batch_id': batch_id, 'ttl': ttl}
+        for s3_key in dict.fromkeys(s3_keys)
+    ])
+
+def put_items_batched(table_name: str, items: List[Dict]):
+    """batch_write_item in groups of 25, issued concurrently, retrying UnprocessedItems with backoff"""
+    groups = [items[i:i + DYNAMODB_BATCH_WRITE_SIZE] for i in range(0, len(items), DYNAMODB_BATCH_WRITE_SIZE)]
+    
+    def write_group(group: List[Dict]):
+        request_items = {table_name: [{'PutRequest': {'Item': item}} for item in group]}
+        for attempt in range(DISPATCH_MAX_ATTEMPTS):
+            response = get_dynamodb_client().batch_write_item(RequestItems=request_items)
+            request_items = response.get('UnprocessedItems') or {}
+            if not request_items:
+                return
+            backoff(attempt)
+        raise RuntimeError(f"{len(request_items.get(table_name, []))} items still unprocessed after {DISPATCH_MAX_ATTEMPTS} attempts")
+    
+    run_concurrently(write_group, groups)
+
+def send_messages_batched(queue_url: str, bodies: List[str]):
+    """send_message_batch in groups of up to 10 messages / 256 KiB, issued concurrently, retrying failed entries"""
+    groups = []
+    group, group_bytes = [], 0
+    for body in bodies:
+        body_bytes = len(body.encode('utf-8'))
+        if group and (len(group) == SQS_BATCH_SIZE or group_bytes + body_bytes > SQS_BATCH_MAX_BYTES):
+            groups.append(group)
+            group, group_bytes = [], 0
+        group.append(body)
+        group_bytes += body_bytes
+    if group:
+        groups.append(group)
+    
+    def send_group(group: List[str]):
+        entries = [{'Id': str(i), 'MessageBody': body} for i, body in enumerate(group)]
+        for attempt in range(DISPATCH_MAX_ATTEMPTS):
+            response = get_sqs_client().send_message_batch(QueueUrl=queue_url, Entries=entries)
+            failed = response.get('Failed', [])
+            if not failed:
+                return
+            sender_faults = [f for f in failed if f.get('SenderFault')]
+            if sender_faults:
+                raise RuntimeError(f"SQS rejected messages: {sender_faults}")
+            failed_ids = {f['Id'] for f in failed}
+            entries = [entry for entry in entries if entry['Id'] in failed_ids]
+            backoff(attempt)
+        raise RuntimeError(f"{len(entries)} messages still failing after {DISPATCH_MAX_ATTEMPTS} attempts")
+    
+    run_concurrently(send_group, groups)
+
+def run_concurrently(func, groups: List[Any]) -> List[Any]:
+    if not groups:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_STREAMS, len(groups))) as pool:
+        # list() re-raises the first failure from any group
+        return list(pool.map(func, groups))
+
+def backoff(attempt: int):
+    """Exponential backoff with full jitter"""
+    time.sleep(random.uniform(0, min(DISPATCH_MAX_BACKOFF, DISPATCH_BASE_BACKOFF * (2 ** attempt))))
+
+def handle_check_duplicate(event, cors_headers):
+    """Tell the client which of its file hashes are already stored for this user"""
+    try:
+        body = json.loads(event.get('body', '{}'))
+        hashes = body.get('hashes', [])
+        user_id = extract_user_id(event)
+        
+        if not hashes:
+            return {
+                'statusCode': 400,
+                'headers': cors_headers,
+                'body': json.dumps({'error': 'hashes required'})
+            }
+        
+        existing = find_existing_hashes(user_id, [normalize_file_hash(h) for h in hashes])
+        
+        return {
+            'statusCode': 200,
+            'headers': cors_headers,
+            'body': json.dumps({
+                'duplicates': [
+                    {'file_hash': file_hash, 'existing_file_id': file_id}
+                    for file_hash, file_id in existing.items()
+                ]
+            })
+        }
+        
+    except Exception as e:
+        logger.error(f"Error checking duplicates: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def normalize_file_hash(file_hash: Any) -> Optional[str]:
+    """Return a lowercase hex SHA-256, or None if the client sent something else"""
+    if not isinstance(file_hash, str):
+        return None
+    file_hash = file_hash.strip().lower()
+    return file_hash if SHA256_HEX_PATTERN.match(file_hash) else None
+
+def find_existing_hashes(user_id: str, hashes: List[Optional[str]]) -> Dict[str, str]:
+    """Map each of the user's stored hashes to its file_id: batch reads of user_id#file_hash entries"""
+    unique_hashes = list(dict.fromkeys(h for h in hashes if h))
+    if not unique_hashes:
+        return {}
+    
+    entries = get_items_batched(FILE_HASH_TABLE, [{'user_hash': f"{user_id}#{file_hash}"} for file_hash in unique_hashes])
+    candidates = {entry['file_hash']: entry['file_id'] for entry in entries}
+    if not candidates:
+        return {}
+    
+    # Entries are not touched on trash or delete: the file must still exist, and trashed copies do not block a re-upload
+    items = get_items_batched(
+        DEDUPLICATION_TABLE,
+        [{'user_id': user_id, 'file_id': file_id} for file_id in dict.fromkeys(candidates.values())],
+        projection='file_id, processing_status'
+    )
+    live = {item['file_id'] for item in items if item.get('processing_status') != 'trashed'}
+    
+    return {file_hash: file_id for file_hash, file_id in candidates.items() if file_id in live}
+
+def get_items_batched(table_name: str, keys: List[Dict], projection: Optional[str] = None) -> List[Dict]:
+    """batch_get_item in groups of 100 keys, issued concurrently, retrying UnprocessedKeys with backoff"""
+    groups = [keys[i:i + DYNAMODB_BATCH_GET_SIZE] for i in range(0, len(keys), DYNAMODB_BATCH_GET_SIZE)]
+    
+    def read_group(group: List[Dict]) -> List[Dict]:
+        request = {'Keys': group}
+        if projection:
+            request['ProjectionExpression'] = projection
+        request_items = {table_name: request}
+        items = []
+        for attempt in range(DISPATCH_MAX_ATTEMPTS):
+            response = get_dynamodb_client().batch_get_item(RequestItems=request_items)
+            items.extend(response.get('Responses', {}).get(table_name, []))
+            request_items = response.get('UnprocessedKeys') or {}
+            if not request_items:
+                return items
+            backoff(attempt)
+        raise RuntimeError(f"{len(request_items[table_name]['Keys'])} keys still unprocessed after {DISPATCH_MAX_ATTEMPTS} attempts")
+    
+    return [item for items in run_concurrently(read_group, groups) for item in items]
+
+def filter_duplicate_files(files: List[Dict], user_id: str) -> Tuple[List[Dict], List[Dict]]:
+    """Split files into (to_upload, duplicates) using client-supplied file_hash values"""
+    hashes = [normalize_file_hash(f.get('file_hash')) if isinstance(f, dict) else None for f in files]
+    existing = find_existing_hashes(user_id, hashes)
+    
+    to_upload = []
+    duplicates = []
+    seen_in_batch = set()
+    for file_info, file_hash in zip(files, hashes):
+        if file_hash and file_hash in existing:
+            duplicates.append({
+                'filename': file_info.get('filename'),
+                'file_hash': file_hash,
+                'existing_file_id': existing[file_hash]
+            })
+        elif file_hash and file_hash in seen_in_batch:
+            duplicates.append({
+                'filename': file_info.get('filename'),
+                'file_hash': file_hash,
+                'existing_file_id': None
+            })
+        else:
+            if file_hash:
+                seen_in_batch.add(file_hash)
+            to_upload.append(file_info)
+    
+    if duplicates:
+        logger.info(f"Skipping {len(duplicates)} duplicate files for user: {user_id}")
+    
+    return to_upload, duplicates
+
 def extract_user_id(event: Dict) -> str:
     """Extract user ID from JWT token"""
     try:
@@ -41,7 +41,9 @@ inputs = {
         "s3:DeleteObject",
         "s3:GetObjectVersion",
         "s3:PutObjectAcl",
-        "s3:GeneratePresignedUrl"
+        "s3:GeneratePresignedUrl",
+        "s3:AbortMultipartUpload",
+        "s3:ListMultipartUploadParts"
       ]
       resources = [
         "arn:aws:s3:::gildarck-media-dev",
@@ -56,7 +58,9 @@ inputs = {
         "dynamodb:UpdateItem",
         "dynamodb:DeleteItem",
         "dynamodb:Query",
-        "dynamodb:Scan"
+        "dynamodb:Scan",
+        "dynamodb:BatchGetItem",
+        "dynamodb:BatchWriteItem"
       ]
       resources = [
         "arn:aws:dynamodb:us-east-1:496860676881:table/gildarck-batch-uploads-dev",
@@ -64,6 +68,17 @@ inputs = {
         "arn:aws:dynamodb:us-east-1:496860676881:table/gildarck-media-metadata-dev/index/*"
       ]
     }
+    # Duplicate check: user_id#file_hash entries, then the matching metadata items
+    dedup_access = {
+      effect = "Allow"
+      actions = [
+        "dynamodb:BatchGetItem"
+      ]
+      resources = [
+        "arn:aws:dynamodb:us-east-1:496860676881:table/gildarck-media-hashes-dev",
+        "arn:aws:dynamodb:us-east-1:496860676881:table/gildarck-media-metadata-dev"
+      ]
+    }
     sqs_access = {
       effect = "Allow"
       actions = [
@@ -89,9 +104,18 @@ inputs = {
     BATCH_TABLE_NAME = "gildarck-batch-uploads-dev"
     SQS_QUEUE_URL = "https://sqs.us-east-1.amazonaws.com/496860676881/gildarck-batch-queue-dev"
     DEDUPLICATION_TABLE = "gildarck-media-metadata-dev"
+    FILE_HASH_TABLE = "gildarck-media-hashes-dev"
     MAX_PARALLEL_STREAMS = "10"
     BATCH_THRESHOLD = "10"
     CHUNK_SIZE = "50"
+    CHUNK_MODE = "lazy"
+    BATCH_STATUS_MAX_WAIT = "25"
+    CLIENT_MAX_POOL_CONNECTIONS = "50"
+    CLIENT_MAX_ATTEMPTS = "5"
+    MULTIPART_PART_SIZE = "16777216"
+    MULTIPART_URL_WINDOW = "50"
+    MULTIPART_URL_EXPIRES_IN = "3600"
+    DISPATCH_MAX_ATTEMPTS = "8"
   }
 
   tags = merge(local.tags, {
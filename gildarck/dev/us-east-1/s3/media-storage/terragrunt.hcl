@@ -51,6 +51,15 @@ inputs = {
         expiration = {
           days = 30
         }
+      },
+      {
+        # Multipart uploads that are never completed or aborted keep billing for their parts
+        id     = "abort_incomplete_multipart_uploads"
+        status = "Enabled"
+        filter = {
+          prefix = ""
+        }
+        abort_incomplete_multipart_upload_days = 7
       }
     ]
   }
@@ -63,6 +72,8 @@ inputs = {
         "https://develop.d1voxl70yl4svu.amplifyapp.com",
         "http://localhost:3000"
       ]
+      # Browsers can only read part ETags (needed to complete multipart uploads) when exposed
+      expose_headers  = ["ETag"]
       max_age_seconds = 3000
     }
   ]